@@ -0,0 +1,48 @@
+"""Общая подготовка для бенчмарков: пути, окружение и подсчёт статистики.
+
+Бенчмарки запускаются из корня репозитория (``python benchmarks/bench_updates.py``),
+а код бота рассчитан на запуск из ``src/`` - здесь это и выравнивается.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SRC = ROOT / "src"
+
+
+def bootstrap() -> None:
+    """Подготовить окружение до первого импорта кода бота (shared читает .env при импорте)."""
+    os.chdir(SRC)
+    if str(SRC) not in sys.path:
+        sys.path.insert(0, str(SRC))
+    os.environ.setdefault("BOT_CONFIG_PATH", "data/config.json5")
+    os.environ.setdefault("LOG_DIR", tempfile.mkdtemp(prefix="rodnulya-bench-"))
+    # Логи на INFO заметно влияют на результат; при необходимости переопределяется через окружение
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def print_table(title: str, rows: list[dict]) -> None:
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = {c: max(len(c), *(len(_fmt(r[c])) for r in rows)) for c in columns}
+    print(f"\n{title}")
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for r in rows:
+        print("  ".join(_fmt(r[c]).ljust(widths[c]) for c in columns))
+
+
+def _fmt(value) -> str:
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
@@ -0,0 +1,301 @@
+"""Нагрузочный прогон HTTP-сервера: webapi, вебхуки платежей и статика.
+
+Поднимает ``HTTPServer`` в этом же процессе с той же сборкой маршрутов, что и в
+``main._init_http`` (middleware, lifecycle, webapi, платёжные пути), и гоняет по
+нему запросы из локального клиента с заданной конкурентностью. Вебхуки YooKassa
+шлёт фейковый отправитель: уведомления ``payment.succeeded`` / ``payment.canceled``
+по заранее заведённым PENDING-платежам, плюс повторы (YooKassa ретраит), битые тела
+и поддельные ``payment.succeeded`` по неоплаченным платежам. Вебхук перечитывает
+платёж из API - его отвечает локальный фейк API YooKassa; поддельные не должны провестись.
+
+По каждому классу маршрутов печатаются RPS, p50/p95/p99, доля ошибок (5xx и
+сетевые) и прирост RSS процесса за прогон класса.
+
+Примеры:
+    python benchmarks/bench_http.py
+    python benchmarks/bench_http.py --requests 20000 --concurrency 128
+    python benchmarks/bench_http.py --only webhook --duplicates 0.3 --forged 0.2
+"""
+import argparse
+import asyncio
+import gc
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Optional
+
+from _common import bootstrap, percentile, print_table
+
+bootstrap()
+
+import aiohttp  # noqa: E402
+from aiohttp import web  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+
+from database import DatabaseManager, Payment, Transaction, User  # noqa: E402
+from database.enum import TransactionStatus  # noqa: E402
+from shared import config, storage  # noqa: E402
+
+ID_BASE = 9_100_000_000
+
+
+def rss_bytes() -> int:
+    """Текущий RSS процесса (Linux), иначе пиковый из getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@dataclass
+class RouteClass:
+    """Класс маршрутов: генератор запросов и ожидаемые статусы."""
+    name: str
+    make: Callable[[], tuple[str, str, Optional[dict]]]  # -> (method, path, json)
+    ok: tuple[int, ...] = (200,)
+
+
+@dataclass
+class Result:
+    latencies: list[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    failures: int = 0  # 5xx и сетевые ошибки
+    unexpected: int = 0  # прочие статусы вне ok
+    elapsed: float = 0.0
+    rss_growth: int = 0
+
+
+class FakeYooKassa:
+    """Локальный отправитель уведомлений YooKassa по заведённым платежам.
+
+    Каждый платёж получает одно финальное событие; с вероятностью ``duplicates``
+    уведомление повторяется, с вероятностью ``malformed`` отправляется битое тело,
+    с вероятностью ``forged`` - ``payment.succeeded`` по платежу, который API считает
+    неоплаченным. ``api`` - приложение, которое отвечает ``GET /payments/{id}`` по
+    тем же данным.
+    """
+
+    def __init__(self, payment_ids: list[str], *, duplicates: float, malformed: float, forged: float, seed: int):
+        self._ids = iter(payment_ids)
+        self._sent: list[str] = []
+        self._rnd = random.Random(seed)
+        self.duplicates = duplicates
+        self.malformed = malformed
+        self.forged_share = forged
+        self.events: dict[str, str] = {}  # payment_id -> настоящее событие
+        self.forged: set[str] = set()  # платежи, по которым слали только подделки
+
+    def api(self) -> web.Application:
+        async def get_payment(request: web.Request) -> web.Response:
+            payment_id = request.match_info["payment_id"]
+            event = self.events.get(payment_id)
+            if event is None and payment_id not in self.forged:
+                return web.json_response({"type": "error", "code": "not_found"}, status=404)
+            status = {"payment.succeeded": "succeeded", "payment.canceled": "canceled"}.get(event, "pending")
+            return web.json_response({
+                "id": payment_id,
+                "status": status,
+                "paid": status == "succeeded",
+                "amount": {"value": "199.00", "currency": "RUB"},
+            })
+
+        app = web.Application()
+        app.router.add_get("/v3/payments/{payment_id}", get_payment)
+        return app
+
+    def notification(self) -> dict:
+        roll = self._rnd.random()
+        if roll < self.malformed:
+            return {"type": "notification", "event": "payment.succeeded"}  # без object
+        payment_id = None
+        if self._sent and roll < self.malformed + self.duplicates:
+            payment_id = self._rnd.choice(self._sent)
+        if payment_id is None and roll < self.malformed + self.duplicates + self.forged_share:
+            payment_id = next(self._ids, None)
+            if payment_id is not None:
+                self.forged.add(payment_id)
+                return self._body(payment_id, "payment.succeeded")
+        if payment_id is None:
+            payment_id = next(self._ids, None) or self._rnd.choice(self._sent)
+            self._sent.append(payment_id)
+        if payment_id not in self.events:
+            self.events[payment_id] = "payment.canceled" if self._rnd.random() < 0.1 else "payment.succeeded"
+        return self._body(payment_id, self.events[payment_id])
+
+    @staticmethod
+    def _body(payment_id: str, event: str) -> dict:
+        return {
+            "type": "notification",
+            "event": event,
+            "object": {
+                "id": payment_id,
+                "status": "succeeded" if event == "payment.succeeded" else "canceled",
+                "paid": event == "payment.succeeded",
+                "amount": {"value": "199.00", "currency": "RUB"},
+                "metadata": {},
+            },
+        }
+
+
+async def seed_payments(db_manager: DatabaseManager, count: int) -> list[str]:
+    users = max(1, count // 10)
+    async with db_manager.session_factory() as session:
+        session.add_all([User(telegram_id=ID_BASE + i, first_name="Bench", locale="ru") for i in range(users)])
+        await session.flush()
+        rows = (await session.execute(select(User.id, User.telegram_id).where(User.telegram_id >= ID_BASE))).all()
+        payment_ids = [f"bench-{i:08d}" for i in range(count)]
+        session.add_all([
+            Payment(
+                user_id=rows[i % len(rows)].id, telegram_id=rows[i % len(rows)].telegram_id,
+                platform="yookassa", amount=Decimal("199.00"), payment_id=pid,
+            )
+            for i, pid in enumerate(payment_ids)
+        ])
+        await session.commit()
+    return payment_ids
+
+
+async def drive(base_url: str, route: RouteClass, total: int, concurrency: int) -> Result:
+    result = Result()
+    counter = itertools.count()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(base_url, connector=connector) as client:
+        async def runner():
+            while next(counter) < total:
+                method, path, body = route.make()
+                start = time.perf_counter()
+                try:
+                    async with client.request(method, path, json=body) as resp:
+                        await resp.read()
+                        status = resp.status
+                except aiohttp.ClientError:
+                    status = 0
+                result.latencies.append(time.perf_counter() - start)
+                result.statuses[status] += 1
+                if status == 0 or status >= 500:
+                    result.failures += 1
+                elif status not in route.ok:
+                    result.unexpected += 1
+
+        gc.collect()
+        rss_before = rss_bytes()
+        started = time.perf_counter()
+        await asyncio.gather(*(runner() for _ in range(concurrency)))
+        result.elapsed = time.perf_counter() - started
+        gc.collect()
+        result.rss_growth = rss_bytes() - rss_before
+    return result
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="запросов на класс маршрутов")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duplicates", type=float, default=0.1, help="доля повторных уведомлений YooKassa")
+    parser.add_argument("--malformed", type=float, default=0.01, help="доля битых уведомлений")
+    parser.add_argument("--forged", type=float, default=0.05, help="доля поддельных уведомлений по неоплаченным платежам")
+    parser.add_argument("--only", action="append", help="прогнать только указанные классы (можно несколько)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    from database import SettlementBatcher
+    from main import _init_http
+
+    # Вебхук YooKassa нужен всегда; статика - только если фронтенд собран
+    config.payments.yookassa.enabled = True
+    config.payments.yookassa.allowed_ips = ["127.0.0.0/8", "::1"]  # фильтр по IP включён, но пускает локальный клиент
+    config.webapi.fronted.serve = Path("data/frontend/routes.json").is_file()
+
+    tmp = tempfile.TemporaryDirectory(prefix="rodnulya-bench-", dir="/dev/shm" if Path("/dev/shm").is_dir() else None)
+    db_manager = DatabaseManager(f"sqlite+aiosqlite:///{Path(tmp.name) / 'bench.db'}")
+    await db_manager.init_db()
+    storage['db_manager'] = db_manager
+    settlement = storage['settlement'] = SettlementBatcher(
+        db_manager,
+        max_batch=config.payments.settlement.batch_size,
+        max_delay=config.payments.settlement.max_delay_ms / 1000,
+    )
+    settlement.start()
+
+    payment_ids = await seed_payments(db_manager, args.requests)
+    yookassa = FakeYooKassa(payment_ids, duplicates=args.duplicates, malformed=args.malformed,
+                            forged=args.forged, seed=args.seed)
+    webhook_path = config.payments.yookassa.webhook_path
+    api_runner = web.AppRunner(yookassa.api(), access_log=None)
+    await api_runner.setup()
+    api_site = web.TCPSite(api_runner, "127.0.0.1", 0)
+    await api_site.start()
+    from modules.payments import yookassa_api
+    yookassa_api.api_url = f"http://127.0.0.1:{api_runner.addresses[0][1]}/v3"
+
+    http_server = _init_http()
+    http_server.host, http_server.port = "127.0.0.1", 0
+    await http_server.start()
+    port = http_server.runner.addresses[0][1]
+    base_url = f"http://127.0.0.1:{port}"
+
+    classes = [
+        RouteClass("health", lambda: ("GET", "/api/health", None)),
+        RouteClass("webhook", lambda: ("POST", webhook_path, yookassa.notification()), ok=(200, 400)),
+        RouteClass("webhook_probe", lambda: ("GET", webhook_path, None)),
+        RouteClass("auth_reject", lambda: ("GET", "/api/admin/users", None), ok=(401,)),
+        RouteClass("not_found", lambda: ("GET", "/missing", None), ok=(404,)),
+    ]
+    if config.webapi.fronted.serve:
+        classes.append(RouteClass("static", lambda: ("GET", "/", None)))
+    else:
+        print("static: data/frontend/routes.json not found, skipping", file=sys.stderr)
+    if args.only:
+        classes = [c for c in classes if c.name in args.only]
+
+    rows = []
+    try:
+        for route in classes:
+            res = await drive(base_url, route, args.requests, args.concurrency)
+            rows.append({
+                "route": route.name,
+                "requests": len(res.latencies),
+                "rps": len(res.latencies) / res.elapsed if res.elapsed else 0.0,
+                "p50 ms": percentile(res.latencies, 50) * 1000,
+                "p95 ms": percentile(res.latencies, 95) * 1000,
+                "p99 ms": percentile(res.latencies, 99) * 1000,
+                "err %": res.failures / max(1, len(res.latencies)) * 100,
+                "unexpected": res.unexpected,
+                "rss +MiB": res.rss_growth / 2 ** 20,
+                "statuses": " ".join(f"{k}:{v}" for k, v in sorted(res.statuses.items())),
+            })
+        await settlement.stop()
+        async with db_manager.session_factory() as session:
+            settled = await session.scalar(
+                select(func.count()).select_from(Payment).where(Payment.status != TransactionStatus.PENDING)
+            )
+            transactions = await session.scalar(select(func.count()).select_from(Transaction))
+            forged_settled = await session.scalar(
+                select(func.count()).select_from(Payment)
+                .where(Payment.payment_id.in_(yookassa.forged), Payment.status != TransactionStatus.PENDING)
+            )
+    finally:
+        await http_server.stop()
+        await yookassa_api.close()
+        await api_runner.cleanup()
+        await db_manager.dispose()
+        tmp.cleanup()
+
+    print_table(f"HTTP load: {args.requests} requests per class, concurrency={args.concurrency}", rows)
+    if any(r["route"] == "webhook" for r in rows):
+        print(f"\nsettlement: {settled} payment(s) finalized, {transactions} transaction(s) written, "
+              f"{forged_settled} of {len(yookassa.forged)} forged notification(s) settled")
+    return 1 if any(r["err %"] or r["unexpected"] for r in rows) or forged_settled else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
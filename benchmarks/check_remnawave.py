@@ -0,0 +1,158 @@
+"""Проверка ``RemnawaveClient`` против локальной фейковой панели (fake_remnawave.py).
+
+Сценарии:
+- параллельные ``provision`` одного пользователя с разными ``expire_at`` создают одного
+  пользователя панели, а не несколько;
+- одинаковые параллельные ``provision`` склеиваются в один поход в панель;
+- 5xx повторяются с бэкоффом, 4xx - нет;
+- после ``breaker_threshold`` ошибок подряд запросы не уходят в панель;
+- отмена первого из склеенных запросов не отменяет остальных: они получают ``RemnawaveError``;
+- отменённый или получивший битое тело пробный запрос half-open не оставляет breaker
+  разомкнутым навсегда: после cooldown проходит следующий.
+
+Код возврата 1, если хоть одна проверка не прошла.
+
+    python benchmarks/check_remnawave.py
+"""
+import asyncio
+import datetime
+import sys
+import time
+
+from _common import bootstrap, print_table
+
+bootstrap()
+
+from fake_remnawave import FakePanel  # noqa: E402
+from modules.remnawave import CircuitBreaker, CircuitOpenError, RemnawaveClient, RemnawaveError  # noqa: E402
+from modules.remnawave.breaker import BreakerState  # noqa: E402
+
+NOW = datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc)
+BY_TG = "GET /api/users/by-telegram-id/{telegram_id}"
+
+
+def client_for(panel: FakePanel, **kw) -> RemnawaveClient:
+    kw.setdefault("backoff_base", 0.01)
+    kw.setdefault("backoff_max", 0.02)
+    return RemnawaveClient(panel.url, panel.token, **kw)
+
+
+async def provision_race() -> tuple[bool, str]:
+    async with FakePanel(latency=0.02) as panel, client_for(panel) as client:
+        expires = [NOW + datetime.timedelta(days=i) for i in range(20)]
+        await asyncio.gather(*(client.provision(42, expire_at=e, squad_uuids=["sq"]) for e in expires))
+        users = panel.by_telegram_id(42)
+        return len(users) == 1, f"{len(users)} panel user(s) after {len(expires)} concurrent provisions"
+
+
+async def provision_coalesce() -> tuple[bool, str]:
+    async with FakePanel(latency=0.02) as panel, client_for(panel) as client:
+        results = await asyncio.gather(*(client.provision(42, expire_at=NOW, squad_uuids=["sq"]) for _ in range(20)))
+        sent = sum(panel.requests.values())
+        same = all(r == results[0] for r in results)
+        return sent == 2 and same, f"20 identical provisions -> {sent} panel request(s)"
+
+
+async def retries() -> tuple[bool, str]:
+    async with FakePanel() as panel, client_for(panel, retries=3) as client:
+        panel.failures = [503, 502]
+        users = await client.get_users_by_telegram_id(1)
+        retried = panel.requests[BY_TG]
+        panel.failures = [404]
+        try:
+            await client.get_users_by_telegram_id(1)
+            not_retried = False
+        except RemnawaveError as ex:
+            not_retried = ex.status == 404 and panel.requests[BY_TG] == retried + 1
+        ok = users == [] and retried == 3 and not_retried
+        return ok, f"2x5xx -> {retried} request(s); 404 retried: {not not_retried}"
+
+
+async def breaker() -> tuple[bool, str]:
+    async with FakePanel() as panel, client_for(panel, retries=0, breaker=CircuitBreaker(3, 60)) as client:
+        panel.failures = [503] * 3
+        for _ in range(3):
+            try:
+                await client.get_users_by_telegram_id(1)
+            except RemnawaveError:
+                pass
+        sent = panel.requests[BY_TG]
+        try:
+            await client.get_users_by_telegram_id(1)
+            opened = False
+        except CircuitOpenError:
+            opened = panel.requests[BY_TG] == sent
+        return opened, f"{sent} failing request(s), then circuit open without a request: {opened}"
+
+
+async def leader_cancel() -> tuple[bool, str]:
+    async with FakePanel(latency=0.2) as panel, client_for(panel) as client:
+        leader = asyncio.create_task(client.get_user("u"))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(client.get_user("u"))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        try:
+            await follower
+            outcome = "result"
+        except asyncio.CancelledError:
+            outcome = "CancelledError"
+        except RemnawaveError:
+            outcome = "RemnawaveError"
+        return outcome == "RemnawaveError" and not follower.cancelled(), f"follower got {outcome}"
+
+
+def _reopen(breaker: CircuitBreaker) -> None:
+    # Не ждать cooldown: считаем, что он уже прошёл
+    breaker._opened_at = time.monotonic() - breaker.cooldown
+
+
+async def probe_release() -> tuple[bool, str]:
+    async with FakePanel(latency=0.2) as panel, client_for(panel, retries=0, breaker=CircuitBreaker(1, 60)) as client:
+        breaker = client.breaker
+        panel.failures = [503]
+        try:
+            await client.get_user("u")
+        except RemnawaveError:
+            pass
+        _reopen(breaker)
+        probe = asyncio.create_task(client.get_user("u"))
+        await asyncio.sleep(0.05)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+        after_cancel = breaker.state
+        _reopen(breaker)
+        panel.latency = 0
+        panel.garbage = [b"[1, 2]"]
+        try:
+            await client.get_user("u")
+            malformed = "no error"
+        except CircuitOpenError:
+            malformed = "circuit open"
+        except RemnawaveError:
+            malformed = "RemnawaveError"
+        _reopen(breaker)
+        panel.users["u"] = {"uuid": "u", "telegramId": 1}
+        recovered = await client.get_user("u") == panel.users["u"] and breaker.state == BreakerState.CLOSED
+        ok = after_cancel == BreakerState.OPEN and malformed == "RemnawaveError" and recovered
+        return ok, f"after cancelled probe: {after_cancel}, garbage body: {malformed}, recovered: {recovered}"
+
+
+async def main() -> int:
+    rows = []
+    for name, check in [
+        ("provision race", provision_race),
+        ("provision coalesce", provision_coalesce),
+        ("retries", retries),
+        ("circuit breaker", breaker),
+        ("leader cancel", leader_cancel),
+        ("half-open probe", probe_release),
+    ]:
+        ok, details = await check()
+        rows.append({"check": name, "ok": "yes" if ok else "NO", "details": details})
+    print_table("Remnawave client against a fake panel", rows)
+    return 0 if all(r["ok"] == "yes" for r in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,123 @@
+"""Проверка маршрутизации чтений на реплики (database.routing) на файлах SQLite.
+
+Основная БД и две «реплики» - отдельные файлы SQLite с таблицей ``marker``, в которой
+лежит имя файла; по прочитанному значению видно, куда ушёл запрос. Репликации между
+файлами нет - она и не нужна: проверяется только выбор движка.
+
+Сценарии:
+- сессия только для чтения читает с реплики, все её чтения - с одной и той же;
+- разные сессии распределяются по репликам по кругу;
+- обычная сессия читает с основной БД, ``.execution_options(replica=True)`` - с реплики;
+- после записи сессия читает только с основной БД;
+- реплику сессии вывели из ротации - сессия переходит на живую; живых нет - на основную;
+- ``ReplicaSet.stop`` дожидается остановки фоновой проверки.
+
+Код возврата 1, если хоть одна проверка не прошла.
+
+    python benchmarks/check_replicas.py
+"""
+import asyncio
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+from _common import bootstrap, print_table
+
+bootstrap()
+
+from sqlalchemy import Column, MetaData, String, Table, insert, select  # noqa: E402
+
+from database import DatabaseManager  # noqa: E402
+
+marker = Table("marker", MetaData(), Column("name", String))
+READ = select(marker.c.name).limit(1)
+
+
+def make_db(path: Path, name: str) -> str:
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE marker (name TEXT)")
+        conn.execute("INSERT INTO marker VALUES (?)", (name,))
+    return f"sqlite+aiosqlite:///{path}"
+
+
+async def reads(db_manager: DatabaseManager, count: int, *, readonly: bool, **options) -> list[str]:
+    async for session in db_manager.get_session(readonly=readonly):
+        return [(await session.execute(READ.execution_options(**options))).scalar_one() for _ in range(count)]
+
+
+async def pinned(db_manager: DatabaseManager) -> tuple[bool, str]:
+    seen = await reads(db_manager, 10, readonly=True)
+    return set(seen) <= {"replica-1", "replica-2"} and len(set(seen)) == 1, f"one session read from {sorted(set(seen))}"
+
+
+async def round_robin(db_manager: DatabaseManager) -> tuple[bool, str]:
+    seen = [(await reads(db_manager, 1, readonly=True))[0] for _ in range(4)]
+    return set(seen) == {"replica-1", "replica-2"}, f"4 sessions read from {seen}"
+
+
+async def primary_by_default(db_manager: DatabaseManager) -> tuple[bool, str]:
+    plain = set(await reads(db_manager, 3, readonly=False))
+    marked = set(await reads(db_manager, 3, readonly=False, replica=True))
+    ok = plain == {"primary"} and len(marked) == 1 and marked <= {"replica-1", "replica-2"}
+    return ok, f"plain session: {sorted(plain)}, replica=True: {sorted(marked)}"
+
+
+async def sticky_after_write(db_manager: DatabaseManager) -> tuple[bool, str]:
+    async for session in db_manager.get_session(readonly=True):
+        before = (await session.execute(READ)).scalar_one()
+        await session.execute(insert(marker).values(name="written"))
+        await session.commit()
+        after = {(await session.execute(READ)).scalar_one() for _ in range(3)}
+    return before != "primary" and after == {"primary"}, f"before write: {before}, after: {sorted(after)}"
+
+
+async def failover(db_manager: DatabaseManager) -> tuple[bool, str]:
+    replicas = db_manager.replicas
+    async for session in db_manager.get_session(readonly=True):
+        first = (await session.execute(READ)).scalar_one()
+        dead = session.info["replica"]
+        replicas._set_healthy([e for e in replicas.engines if e is not dead])
+        moved = (await session.execute(READ)).scalar_one()
+        replicas._set_healthy([])
+        fallback = (await session.execute(READ)).scalar_one()
+    replicas._set_healthy(list(replicas.engines))
+    ok = first != moved and moved.startswith("replica") and fallback == "primary"
+    return ok, f"{first} down -> {moved}, none healthy -> {fallback}"
+
+
+async def stop_awaits_watcher(db_manager: DatabaseManager) -> tuple[bool, str]:
+    replicas = db_manager.replicas
+    replicas.start_watch(0.01, timeout=0.5)
+    watcher = replicas._watcher
+    await asyncio.sleep(0.05)
+    await replicas.stop()
+    return watcher.done() and replicas._watcher is None, f"watcher done after stop(): {watcher.done()}"
+
+
+async def main() -> int:
+    tmp = Path(tempfile.mkdtemp(prefix="rodnulya-replicas-"))
+    db_manager = DatabaseManager(
+        make_db(tmp / "primary.db", "primary"),
+        [make_db(tmp / f"replica-{i}.db", f"replica-{i}") for i in (1, 2)],
+    )
+    rows = []
+    try:
+        for name, check in [
+            ("pinned per session", pinned),
+            ("round robin", round_robin),
+            ("primary by default", primary_by_default),
+            ("sticky after write", sticky_after_write),
+            ("failover", failover),
+            ("stop awaits watcher", stop_awaits_watcher),
+        ]:
+            ok, details = await check(db_manager)
+            rows.append({"check": name, "ok": "yes" if ok else "NO", "details": details})
+    finally:
+        await db_manager.dispose()
+    print_table("Read replica routing on SQLite files", rows)
+    return 0 if all(r["ok"] == "yes" for r in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,90 @@
+"""Локальная фейковая панель Remnawave для проверок ``RemnawaveClient``.
+
+Держит пользователей в памяти и отвечает на те же пути, что и клиент:
+``GET /api/users/by-telegram-id/{id}``, ``GET /api/users/{uuid}``, ``POST /api/users``,
+``PATCH /api/users``. Задержка ответа и очередь навязанных ошибок настраиваются,
+чтобы воспроизводить гонки, ретраи и размыкание circuit breaker; тела не по схеме
+(``garbage``) - чтобы проверить разбор ответа.
+
+    async with FakePanel(token="t", latency=0.02) as panel:
+        client = RemnawaveClient(panel.url, "t")
+"""
+import asyncio
+import uuid
+from collections import Counter
+from typing import Optional
+
+from aiohttp import web
+
+
+class FakePanel:
+    """Панель в памяти на случайном локальном порту."""
+
+    def __init__(self, *, token: str = "token", latency: float = 0.0):
+        self.token = token
+        self.latency = latency
+        self.users: dict[str, dict] = {}
+        self.requests: Counter = Counter()  # "METHOD путь-шаблон" -> сколько пришло
+        self.failures: list[int] = []  # статусы, которыми ответить на ближайшие запросы
+        self.garbage: list[bytes] = []  # тела 200 не по схеме для ближайших запросов
+        self.url = ""
+        self._runner: Optional[web.AppRunner] = None
+
+    # -- сервер --
+
+    async def __aenter__(self) -> "FakePanel":
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/api/users/by-telegram-id/{telegram_id}", self._by_telegram_id)
+        app.router.add_get("/api/users/{uuid}", self._get)
+        app.router.add_post("/api/users", self._create)
+        app.router.add_patch("/api/users", self._update)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{self._runner.addresses[0][1]}"
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._runner.cleanup()
+
+    def by_telegram_id(self, telegram_id: int) -> list[dict]:
+        return [u for u in self.users.values() if u["telegramId"] == telegram_id]
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.Response:
+        self.requests[f"{request.method} {request.match_info.route.resource.canonical}"] += 1
+        if request.headers.get("Authorization") != f"Bearer {self.token}":
+            return web.json_response({"message": "Unauthorized"}, status=401)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.failures:
+            return web.json_response({"message": "Injected failure"}, status=self.failures.pop(0))
+        if self.garbage:
+            return web.Response(body=self.garbage.pop(0), content_type="application/json")
+        return await handler(request)
+
+    # -- API --
+
+    async def _by_telegram_id(self, request: web.Request) -> web.Response:
+        return web.json_response({"response": self.by_telegram_id(int(request.match_info["telegram_id"]))})
+
+    async def _get(self, request: web.Request) -> web.Response:
+        user = self.users.get(request.match_info["uuid"])
+        if user is None:
+            return web.json_response({"message": "User not found"}, status=404)
+        return web.json_response({"response": user})
+
+    async def _create(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        user = {"uuid": str(uuid.uuid4()), **body}
+        self.users[user["uuid"]] = user
+        return web.json_response({"response": user}, status=201)
+
+    async def _update(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        user = self.users.get(body.get("uuid"))
+        if user is None:
+            return web.json_response({"message": "User not found"}, status=404)
+        user.update(body)
+        return web.json_response({"response": user})
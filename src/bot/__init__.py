@@ -1,5 +1,5 @@
 """Bot package."""
-from .shared import router, dp
+from .shared import router, dp, scheduler
 
 # Импортируем все обработчики, коллбэки и middleware, чтобы они зарегистрировались
 from . import handlers
@@ -8,5 +8,6 @@ from . import middleware
 
 __all__ = [
     'router',
-    'dp'
+    'dp',
+    'scheduler'
 ]
@@ -1,15 +1,14 @@
 from aiogram import F
 from aiogram.types import CallbackQuery
-from sqlalchemy.ext.asyncio import AsyncSession
 
 from bot import router
 from bot.inline.userspace import il_accept
-from database import User
+from database import User, plan_catalog
 from shared import i18n
 
 
 @router.callback_query(F.data.startswith("set_lang:"))
-async def on_set_lang(callback: CallbackQuery, session: AsyncSession, user: User):
+async def on_set_lang(callback: CallbackQuery, user: User):
     lang_code, next_step = callback.data.split(":", 2)[1:]
 
     # Проверяем, что язык поддерживается
@@ -18,7 +17,6 @@ async def on_set_lang(callback: CallbackQuery, session: AsyncSession, user: User
         return
 
     user.update_lang(lang_code)
-    await session.commit()
 
     lang = i18n[lang_code]
 
@@ -30,13 +28,28 @@ async def on_set_lang(callback: CallbackQuery, session: AsyncSession, user: User
             await callback.message.answer(lang.error.internal_error())
 
 @router.callback_query(F.data.startswith("rules:"))
-async def on_set_rules_status(callback: CallbackQuery, session: AsyncSession, user: User, lang):
+async def on_set_rules_status(callback: CallbackQuery, user: User, lang):
     mode = callback.data.split(":", 1)[1]
 
     match mode:
         case "accept":
             user.accept_terms()
-            await session.commit()
             await callback.message.edit_text(lang.commands.start(), reply_markup=None)
         case "decline":
             await callback.message.edit_text(lang.rules.decline, reply_markup=None)
+
+@router.callback_query(F.data.startswith("plan:"))
+async def on_select_plan(callback: CallbackQuery, lang):
+    plan_id = callback.data.split(":", 1)[1]
+    plan = plan_catalog.get(int(plan_id)) if plan_id.isdigit() else None
+    if plan is None or not plan.is_visible:
+        await callback.answer(lang.plans.not_found(), show_alert=True)
+        return
+
+    await callback.message.edit_text(lang.plans.details(
+        name=plan.name,
+        description=plan.description or "",
+        days=plan.duration_days,
+        price=plan.price,
+    ))
+    await callback.answer()
@@ -1,5 +1,6 @@
 from aiogram.types import InlineKeyboardMarkup
 
+from database import plan_catalog
 from shared import i18n
 from .shared import keyboard
 
@@ -29,3 +30,12 @@ def il_accept(callback_class: str, lang) -> InlineKeyboardMarkup:
         [(lang.buttons.accept, f"{callback_class}:accept")],
         [(lang.buttons.decline, f"{callback_class}:decline")]
     )
+
+def il_plans(lang) -> InlineKeyboardMarkup:
+    """Клавиатура тарифов. Кэшируется в каталоге на каждый язык до смены версии."""
+    def build(plans):
+        return keyboard(*[
+            [(lang.plans.button(name=plan.name, price=plan.price, days=plan.duration_days), f"plan:{plan.id}")]
+            for plan in plans
+        ])
+    return plan_catalog.keyboard(lang.lang, build)
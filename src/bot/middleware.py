@@ -1,39 +1,103 @@
+import asyncio
+
+from aiogram.dispatcher.event.bases import UNHANDLED
 from aiogram.types import Update
 from loguru import logger
 from sqlalchemy import select
 
-from database import User
+from database import User, banned_users, has_writes
+from modules.lifecycle import lifecycle
+from modules.logger import Sampler
 from shared import config, storage, i18n
 from .shared import dp
 
+_update_log = logger.bind(module="bot", prefix="updates")
+_update_sampler = Sampler(config.logging.update_sample, config.logging.slow_ms)
+
+
+def _event_user(event):
+    # Пытаемся достать from_user из разных типов апдейтов
+    if isinstance(event, Update):
+        if event.message:
+            return event.message.from_user
+        elif event.callback_query:
+            return event.callback_query.from_user
+        elif event.my_chat_member:
+            return event.my_chat_member.from_user
+        elif event.chat_member:
+            return event.chat_member.from_user
+        elif event.inline_query:
+            return event.inline_query.from_user
+        elif event.chosen_inline_result:
+            return event.chosen_inline_result.from_user
+        elif event.shipping_query:
+            return event.shipping_query.from_user
+        elif event.pre_checkout_query:
+            return event.pre_checkout_query.from_user
+        return None
+    # на всякий случай, если сюда прилетит уже конкретное событие
+    return getattr(event, "from_user", None)
+
+
+async def _drop_banned(event, telegram_id: int) -> None:
+    logger.info(f"[middleware] Banned user {telegram_id} tried to interact with the bot.")
+
+    # Пытаемся удалить сообщение от забаненного пользователя, если это возможно
+    try:
+        if event.message:
+            await event.message.delete()
+        elif event.callback_query and event.callback_query.message:
+            await event.callback_query.message.delete()
+    except Exception:
+        pass
+
+
+@dp.update.outer_middleware()
+async def lifecycle_middleware(handler, event, data):
+    # Апдейт в полёте: при остановке его дождутся, прежде чем закрывать сессии БД
+    async with lifecycle.track("update"):
+        return await handler(event, data)
+
+
+@dp.update.outer_middleware()
+async def update_log_middleware(handler, event, data):
+    # Строка на апдейт: ошибки и медленные - всегда, успешные - с долей logging.update_sample
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    status = "error"
+    try:
+        result = await handler(event, data)
+        status = "unhandled" if result is UNHANDLED else "handled"
+        return result
+    finally:
+        dur_ms = (loop.time() - start) * 1000
+        if _update_sampler.keep(dur_ms, status == "error"):
+            tg_from = _event_user(event)
+            level = "ERROR" if status == "error" else "WARNING" if dur_ms >= _update_sampler.slow_ms else "INFO"
+            _update_log.bind(
+                update_id=event.update_id,
+                event_type=event.event_type,
+                status=status,
+                duration_ms=round(dur_ms, 1),
+                telegram_id=tg_from.id if tg_from is not None else None,
+            ).log(level, f"[Update] {event.update_id} {event.event_type} -> {status} {dur_ms:.0f}ms")
+
+
+@dp.update.outer_middleware()
+async def banned_filter_middleware(handler, event, data):
+    # Забаненных отбрасываем по реестру в памяти, до открытия сессии БД
+    tg_from = _event_user(event)
+    if tg_from is not None and tg_from.id in banned_users:
+        await _drop_banned(event, tg_from.id)
+        return None
+    return await handler(event, data)
+
 
 @dp.update.outer_middleware()
 async def db_session_middleware(handler, event, data):
     async for session in storage['db_manager'].get_session():
 
-        # Пытаемся достать from_user из разных типов апдейтов
-        tg_from = None
-        if isinstance(event, Update):
-            if event.message:
-                tg_from = event.message.from_user
-            elif event.callback_query:
-                tg_from = event.callback_query.from_user
-            elif event.my_chat_member:
-                tg_from = event.my_chat_member.from_user
-            elif event.chat_member:
-                tg_from = event.chat_member.from_user
-            elif event.inline_query:
-                tg_from = event.inline_query.from_user
-            elif event.chosen_inline_result:
-                tg_from = event.chosen_inline_result.from_user
-            elif event.shipping_query:
-                tg_from = event.shipping_query.from_user
-            elif event.pre_checkout_query:
-                tg_from = event.pre_checkout_query.from_user
-        else:
-            # на всякий случай, если сюда прилетит уже конкретное событие
-            tg_from = getattr(event, "from_user", None)
-
+        tg_from = _event_user(event)
         user = None
         lang = None
         if tg_from is not None:
@@ -43,33 +107,24 @@ async def db_session_middleware(handler, event, data):
             user = result.scalar_one_or_none()
             if not user:
                 telegram_id = tg_from.id
-                # Create new user
+                # Create new user; INSERT уйдёт общим коммитом в конце апдейта
                 user = User(
                     telegram_id=telegram_id,
                     first_name=tg_from.first_name,
                     last_name=tg_from.last_name,
                     username=tg_from.username,
                     locale="--",
+                    terms_accepted=False,
+                    banned=False,
                     is_admin=telegram_id in config.bot.admins
                 )
                 session.add(user)
-                await session.commit()
                 logger.info(f"[middleware] New user created: {telegram_id}")
-                await session.flush()  # чтобы у user появился id в текущей сессии
 
             if user.banned:
-                logger.info(f"[middleware] Banned user {user.telegram_id} tried to interact with the bot.")
-
-                # Пытаемся удалить сообщение от забаненного пользователя, если это возможно
-                try:
-                    if event.message:
-                        await event.message.delete()
-                    elif event.callback_query and event.callback_query.message:
-                        await event.callback_query.message.delete()
-                except Exception:
-                    pass
-
-                # Просто игнорируем апдейт от забаненного пользователя
+                # Бан из другого процесса, который реестр ещё не подхватил
+                banned_users.add(user.telegram_id)
+                await _drop_banned(event, user.telegram_id)
                 return None
 
             if user.locale == "--":
@@ -80,5 +135,13 @@ async def db_session_middleware(handler, event, data):
         data["session"] = session
         data["user"] = user
         data["lang"] = lang
-        return await handler(event, data)
+        # Единица работы - апдейт: хендлеры не коммитят сами, изменения уходят одним коммитом
+        try:
+            result = await handler(event, data)
+        except Exception:
+            await session.rollback()
+            raise
+        if has_writes(session):
+            await session.commit()
+        return result
     return None
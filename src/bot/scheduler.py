@@ -0,0 +1,98 @@
+"""Планировщик апдейтов: по порядку внутри пользователя, параллельно между пользователями.
+
+Апдейты в polling обрабатываются отдельными задачами, и без изоляции два быстрых
+нажатия одного пользователя (``set_lang:`` и ``rules:``) выполняются вперемешку и
+гоняются за одну строку ``User``. ``KeyedScheduler`` держит для каждого ключа
+очередь: следующая задача ключа стартует, только когда закончилась предыдущая, в
+порядке поступления. Разные ключи не ждут друг друга, общее число одновременно
+работающих обработчиков ограничено ``concurrency``.
+
+В aiogram планировщик подключается как ``events_isolation`` диспетчера
+(``UserIsolation``): FSM-middleware берёт блокировку до чтения состояния, а до него
+в цепочке нет ни одного ``await``, так что место в очереди пользователя занимается
+в порядке прихода апдейтов. Ключ - telegram_id пользователя (или чата, если
+пользователя у апдейта нет).
+
+Слот глобального лимита берётся уже после очереди ключа: ждущие своей очереди
+апдейты пользователя не занимают места, которые могли бы работать на других.
+Ждущие при этом не ограничены - сколько апдейтов принять, решает источник:
+``tasks_concurrency_limit`` в polling и ``max_pending`` в воркере кластера
+(оба - ``bot.scheduler.max_pending``).
+"""
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable
+
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+
+from modules.lifecycle import lifecycle
+
+
+class _Queue:
+    __slots__ = ("lock", "size")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()  # FIFO: новый захват не обгоняет ждущих
+        self.size = 0  # работающая задача + ждущие
+
+
+class KeyedScheduler:
+    """Последовательно внутри ключа, параллельно между ключами, не больше ``concurrency`` сразу."""
+
+    def __init__(self, concurrency: int = 64):
+        self.concurrency = concurrency
+        self._queues: dict[Hashable, _Queue] = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self.running = 0
+        self.processed = 0
+
+    @property
+    def waiting(self) -> int:
+        """Сколько задач ждут своей очереди или свободного слота."""
+        return sum(q.size for q in self._queues.values()) - self.running
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "waiting": self.waiting,
+            "keys": len(self._queues),
+            "max_depth": max((q.size for q in self._queues.values()), default=0),
+            "processed": self.processed,
+        }
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable) -> AsyncIterator[None]:
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _Queue()
+        queue.size += 1
+        try:
+            async with queue.lock, self._slots:
+                self.running += 1
+                try:
+                    yield
+                finally:
+                    self.running -= 1
+                    self.processed += 1
+        finally:
+            queue.size -= 1
+            if not queue.size:
+                del self._queues[key]
+
+
+class UserIsolation(BaseEventIsolation):
+    """``events_isolation`` для ``Dispatcher``: очередь на пользователя поверх ``KeyedScheduler``."""
+
+    def __init__(self, scheduler: KeyedScheduler):
+        self.scheduler = scheduler
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncIterator[None]:
+        # Апдейт в очереди уже считается работой в полёте: остановка дождётся и его
+        async with lifecycle.track("update"), self.scheduler.slot(key.user_id or key.chat_id):
+            yield
+
+    async def close(self) -> None:
+        pass
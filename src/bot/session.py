@@ -0,0 +1,77 @@
+"""HTTP-сессия клиента Bot API с настройками из ``config.bot.session``.
+
+Стандартная ``AiohttpSession`` держит до 100 соединений, кэширует DNS на час,
+не переиспользует соединения дольше 15 секунд простоя и даёт всем методам один
+таймаут. На рассылках и подтверждениях оплат узкое место - исходящие запросы,
+поэтому всё это вынесено в конфиг:
+
+- ``limit`` / ``limit_per_host`` - размер пула соединений (почти все запросы идут на
+  один хост api.telegram.org, так что ``limit_per_host`` по умолчанию не ограничен);
+- ``keepalive`` - сколько держать простаивающее соединение, чтобы пачки сообщений
+  не платили за TCP+TLS на каждую паузу;
+- ``dns_ttl`` - время жизни кэша DNS (0 - не кэшировать);
+- ``timeout`` и ``method_timeouts`` - общий таймаут и таймауты по имени метода
+  (``sendMessage``, ``sendDocument``...). Явный ``request_timeout`` вызова, как у
+  long polling, важнее обоих.
+
+JSON ответов и вложенных полей (клавиатуры, entities) разбирается orjson.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Mapping, Optional
+
+import orjson
+from aiogram.client.session.aiohttp import AiohttpSession
+
+if TYPE_CHECKING:
+    from aiogram import Bot
+    from aiogram.methods import TelegramMethod
+    from aiogram.methods.base import TelegramType
+
+
+def _dumps(value) -> str:
+    return orjson.dumps(value).decode()
+
+
+class TunedSession(AiohttpSession):
+    """``AiohttpSession`` с настраиваемым пулом соединений и таймаутами по методам."""
+
+    def __init__(
+            self,
+            *,
+            limit: int = 100,
+            limit_per_host: int = 0,
+            keepalive: float = 60,
+            dns_ttl: int = 300,
+            timeout: float = 60,
+            method_timeouts: Optional[Mapping[str, float]] = None,
+    ):
+        super().__init__(limit=limit, timeout=timeout, json_loads=orjson.loads, json_dumps=_dumps)
+        self._connector_init.update(
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive,
+            use_dns_cache=dns_ttl > 0,
+            ttl_dns_cache=dns_ttl or None,
+        )
+        self.method_timeouts = dict(method_timeouts or {})
+
+    @classmethod
+    def from_config(cls, cfg) -> "TunedSession":
+        return cls(
+            limit=cfg.limit,
+            limit_per_host=cfg.limit_per_host,
+            keepalive=cfg.keepalive,
+            dns_ttl=cfg.dns_ttl,
+            timeout=cfg.timeout,
+            method_timeouts=cfg.method_timeouts,
+        )
+
+    async def make_request(
+            self,
+            bot: "Bot",
+            method: "TelegramMethod[TelegramType]",
+            timeout: Optional[int] = None,
+    ) -> "TelegramType":
+        if timeout is None:
+            timeout = self.method_timeouts.get(method.__api_method__)
+        return await super().make_request(bot, method, timeout)
@@ -1,5 +1,17 @@
 from aiogram import Router, Dispatcher
 
-dp = Dispatcher()
+from database.fsm import DatabaseStorage
+from shared import config
+from .scheduler import KeyedScheduler, UserIsolation
+
+# Состояния FSM в БД; к DatabaseManager хранилище подключается при старте (fsm_storage.bind)
+fsm_storage = DatabaseStorage(
+    ttl=config.bot.fsm.ttl,
+    cache_size=config.bot.fsm.cache_size,
+    flush_delay=config.bot.fsm.flush_ms / 1000,
+)
+# Апдейты одного пользователя - строго по очереди, разных - параллельно (см. bot.scheduler)
+scheduler = KeyedScheduler(config.bot.scheduler.concurrency)
+dp = Dispatcher(storage=fsm_storage, events_isolation=UserIsolation(scheduler))
 router = Router()
 dp.include_router(router)
@@ -1,4 +1,23 @@
 """Database package."""
-from .models import Base, DatabaseManager, Payment, User, SubscriptionPlan, Transaction
+from .models import (
+    Base, DatabaseManager, Payment, User, SubscriptionPlan, Transaction, UserBalance, FSMState,
+    ArchivedPayment, ArchivedTransaction,
+)
+from .archive import ARCHIVE, Archiver, archive_batch
+from .balances import BalanceCheck, apply_ledger, get_balance, rebuild_balances
+from .bans import BannedRegistry, banned_users
+from .fsm import DatabaseStorage
+from .catalog import PlanCatalog, PlanView, plan_catalog
+from .settlement import SettlementBatcher, SettlementResult, settle_payments, fail_payments
+from .unit_of_work import has_writes
 
-__all__ = ["Base", "DatabaseManager", "User", "Payment", "SubscriptionPlan", "Transaction"]
+__all__ = [
+    "Base", "DatabaseManager", "User", "Payment", "SubscriptionPlan", "Transaction", "UserBalance", "FSMState",
+    "ArchivedPayment", "ArchivedTransaction", "ARCHIVE", "Archiver", "archive_batch",
+    "BalanceCheck", "apply_ledger", "get_balance", "rebuild_balances",
+    "BannedRegistry", "banned_users",
+    "DatabaseStorage",
+    "PlanCatalog", "PlanView", "plan_catalog",
+    "SettlementBatcher", "SettlementResult", "settle_payments", "fail_payments",
+    "has_writes",
+]
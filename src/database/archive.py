@@ -0,0 +1,120 @@
+"""Архивация старых платежей и записей журнала.
+
+``payments`` и ``transactions`` только растут, а вместе с ними и все их индексы, которые
+обновляет каждая вставка. Фоновая задача ``Archiver`` переносит завершённые строки
+(статус не PENDING) старше горизонта в ``payments_archive`` / ``transactions_archive``
+небольшими пачками: ``INSERT ... SELECT`` и ``DELETE`` по одному списку id в одной
+транзакции, пачка за пачкой с паузой, чтобы не держать блокировки и не забивать пул.
+Горячие таблицы и их индексы остаются размером «горизонт × поток».
+
+Балансы архивация не меняет: ``user_balances`` уже содержит вклад перенесённых записей,
+а удаление из журнала баланс не трогает (см. ``database.balances``). Запросы истории
+читают обе таблицы: ``rebuild_balances`` суммирует журнал вместе с архивом, админские
+списки и выгрузки добавляют архив по ``?archive=1``.
+
+Вместо архивных таблиц можно было бы использовать range-партиции Postgres по
+``created_at``, но SQLite их не умеет. Отдельные таблицы работают на обеих базах.
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime
+from typing import TYPE_CHECKING, Optional
+
+from loguru import logger
+from sqlalchemy import delete, insert, select
+
+from database.enum import TransactionStatus
+from database.models import ArchivedPayment, ArchivedTransaction, Payment, Transaction
+
+if TYPE_CHECKING:
+    from database.models import DatabaseManager
+
+log = logger.bind(module="database", prefix="archive")
+
+# Горячая модель -> архивная; колонки совпадают по именам
+ARCHIVE = {
+    Payment: ArchivedPayment,
+    Transaction: ArchivedTransaction,
+}
+
+
+async def archive_batch(session, model, cutoff: datetime.datetime, limit: int) -> int:
+    """Перенести в архив до ``limit`` самых старых завершённых строк ``model`` до ``cutoff``.
+
+    Коммит за вызывающим кодом. Возвращает число перенесённых строк.
+    """
+    source, target = model.__table__, ARCHIVE[model].__table__
+    ids = (await session.execute(
+        select(source.c.id)
+        .where(source.c.created_at < cutoff, source.c.status != TransactionStatus.PENDING)
+        .order_by(source.c.created_at, source.c.id)
+        .limit(limit)
+    )).scalars().all()
+    if not ids:
+        return 0
+    names = [column.name for column in target.columns]
+    await session.execute(
+        insert(target).from_select(names, select(*(source.c[name] for name in names)).where(source.c.id.in_(ids)))
+    )
+    await session.execute(delete(source).where(source.c.id.in_(ids)))
+    return len(ids)
+
+
+class Archiver:
+    """Периодически переносит строки старше ``horizon_days`` дней в архивные таблицы."""
+
+    def __init__(
+            self,
+            db_manager: "DatabaseManager",
+            *,
+            horizon_days: int = 180,
+            batch_size: int = 500,
+            pause: float = 0.1,
+    ):
+        self.db_manager = db_manager
+        self.horizon = datetime.timedelta(days=horizon_days)
+        self.batch_size = batch_size
+        self.pause = pause
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self) -> dict[str, int]:
+        """Один полный проход: переносить пачками, пока есть что. Возвращает счётчики по таблицам."""
+        cutoff = datetime.datetime.now(datetime.timezone.utc) - self.horizon
+        moved = {}
+        for model in ARCHIVE:
+            total = 0
+            while True:
+                async with self.db_manager.session_factory() as session:
+                    count = await archive_batch(session, model, cutoff, self.batch_size)
+                    await session.commit()
+                total += count
+                if count < self.batch_size:
+                    break
+                await asyncio.sleep(self.pause)
+            moved[model.__tablename__] = total
+        if any(moved.values()):
+            log.info(f"[Archive] Moved rows older than {cutoff:%Y-%m-%d}: {moved}")
+        return moved
+
+    async def _loop(self, interval: float) -> None:
+        while True:
+            try:
+                await self.run()
+            except Exception as ex:
+                log.exception(f"[Archive] Pass failed: {ex}")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(interval), name="archiver")
+
+    async def stop(self) -> None:
+        # Пачка - одна транзакция: отмена посреди неё просто откатывает незакоммиченное
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
@@ -0,0 +1,237 @@
+"""Материализованные балансы пользователей.
+
+Строка ``UserBalance`` на пару (пользователь, валюта) обновляется в той же транзакции БД,
+что и проведённые (COMPLETED) записи журнала ``Transaction``:
+
+* bulk-вставки журнала (settlement) передают свои записи в ``apply_ledger`` явно;
+* записи, добавленные через ORM, подхватывает хук ``after_flush`` ниже - он же учитывает
+  переход статуса существующей записи в COMPLETED и обратно.
+
+Обновление - один upsert ``INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x``
+на всю пачку, поэтому параллельные проведения не теряют друг друга.
+
+``rebuild_balances`` пересчитывает агрегаты по журналу (вместе с архивом) и чинит расхождения
+(админка: ``POST /api/admin/balances/rebuild``). Починка пишет абсолютные значения, поэтому
+строки балансов блокируются до чтения журнала: проведение, которое коммитится параллельно,
+либо уже видно в журнале, либо ждёт блокировки и добавляет свою дельту после починки.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Iterable, Mapping, Optional
+
+from loguru import logger
+from sqlalchemy import event, false, func, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database.enum import TransactionStatus, TransactionType
+from database.models import ArchivedTransaction, Transaction, UserBalance
+
+log = logger.bind(module="balances", prefix="ledger")
+
+# Тип операции -> (колонка агрегата, знак для balance)
+_EFFECT = {
+    TransactionType.DEPOSIT: ("deposited", 1),
+    TransactionType.REFUND: ("refunded", 1),
+    TransactionType.WITHDRAW: ("withdrawn", -1),
+    TransactionType.PAYMENT: ("paid", 0),  # оплата снаружи: баланс не меняется, только "потрачено"
+}
+_COLUMNS = ("balance", "deposited", "withdrawn", "refunded", "paid")
+
+Key = tuple[int, str]  # (user_id, currency)
+
+
+@dataclass
+class BalanceCheck:
+    """Итог сверки балансов с журналом."""
+    checked: int = 0
+    mismatched: list[Key] = field(default_factory=list)
+    fixed: bool = False
+
+
+def _zero() -> dict[str, Decimal]:
+    return dict.fromkeys(_COLUMNS, Decimal(0))
+
+
+def ledger_deltas(entries: Iterable[Mapping], sign: int = 1) -> dict[Key, dict[str, Decimal]]:
+    """Свернуть записи журнала в изменения агрегатов. Учитываются только COMPLETED."""
+    deltas: dict[Key, dict[str, Decimal]] = defaultdict(_zero)
+    for entry in entries:
+        if entry["status"] != TransactionStatus.COMPLETED:
+            continue
+        column, balance_sign = _EFFECT[entry["type"]]
+        amount = Decimal(entry["amount"]) * sign
+        delta = deltas[(entry["user_id"], entry.get("currency") or "RUB")]
+        delta[column] += amount
+        delta["balance"] += amount * balance_sign
+    return deltas
+
+
+def _insert(dialect: str):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _upsert(dialect: str, rows: dict[Key, dict[str, Decimal]], *, absolute: bool = False):
+    insert = _insert(dialect)
+    table = UserBalance.__table__
+    # Порядок ключей фиксирован: одинаковый порядок блокировок строк у параллельных транзакций
+    stmt = insert(table).values([
+        {"user_id": user_id, "currency": currency, **values}
+        for (user_id, currency), values in sorted(rows.items())
+    ])
+    if absolute:
+        changes = {c: stmt.excluded[c] for c in _COLUMNS}
+    else:
+        changes = {c: table.c[c] + stmt.excluded[c] for c in _COLUMNS}
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.currency],
+        set_={**changes, "updated_at": func.now()},
+    )
+
+
+async def apply_ledger(session: AsyncSession, entries: Iterable[Mapping]) -> int:
+    """Применить проведённые записи журнала к балансам. Возвращает число затронутых строк баланса.
+
+    Коммит остаётся за вызывающим кодом - баланс меняется атомарно вместе с журналом.
+    """
+    deltas = ledger_deltas(entries)
+    if not deltas:
+        return 0
+    await session.execute(_upsert(session.get_bind().dialect.name, deltas))
+    return len(deltas)
+
+
+async def get_balance(session: AsyncSession, user_id: int, currency: str = "RUB") -> Optional[UserBalance]:
+    """Баланс пользователя одной строкой по первичному ключу. None - операций ещё не было."""
+    return await session.get(UserBalance, (user_id, currency))
+
+
+async def _ledger_totals(session: AsyncSession, ids: Optional[list[int]]) -> dict[Key, dict[str, Decimal]]:
+    # Журнал целиком - горячая таблица и архив; ledger_deltas складывает суммы по ключу
+    totals = []
+    for model in (Transaction, ArchivedTransaction):
+        ledger = select(
+            model.user_id, model.currency, model.type, func.sum(model.amount).label("amount"),
+        ).where(model.status == TransactionStatus.COMPLETED)
+        if ids is not None:
+            ledger = ledger.where(model.user_id.in_(ids))
+        totals.extend((await session.execute(
+            ledger.group_by(model.user_id, model.currency, model.type)
+        )).all())
+    return ledger_deltas(
+        {"user_id": r.user_id, "currency": r.currency, "type": r.type, "amount": r.amount,
+         "status": TransactionStatus.COMPLETED}
+        for r in totals
+    )
+
+
+async def _lock_balances(session: AsyncSession, ids: Optional[list[int]]) -> None:
+    """Взять блокировки, под которыми журнал и строки балансов не меняются до коммита починки."""
+    dialect = session.get_bind().dialect.name
+    table = UserBalance.__table__
+    if dialect == "sqlite":
+        # Блокировок строк нет: пустой UPDATE берёт блокировку записи всей БД
+        await session.execute(update(table).where(false()))
+    # Строка баланса для каждого ключа журнала: новой нечего было бы блокировать FOR UPDATE
+    if keys := sorted((await _ledger_totals(session, ids)).keys()):
+        insert = _insert(dialect)
+        await session.execute(insert(table).values([
+            {"user_id": user_id, "currency": currency, **_zero()} for user_id, currency in keys
+        ]).on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.currency]))
+
+
+async def rebuild_balances(
+        session: AsyncSession,
+        user_ids: Optional[Iterable[int]] = None,
+        *,
+        fix: bool = True,
+) -> BalanceCheck:
+    """Сверить балансы с журналом и (по умолчанию) перезаписать расходящиеся строки.
+
+    С ``fix`` строки балансов блокируются (``FOR UPDATE``; в SQLite - вся БД на запись) до
+    чтения журнала и держатся до коммита вызывающего кода: параллельное проведение не
+    затирается абсолютной записью. Без ``fix`` - только сверка, без блокировок; проведение
+    посреди неё может показаться расхождением.
+
+    :param session: Сессия основной БД; коммит за вызывающим кодом.
+    :param user_ids: Ограничить сверку пользователями; None - все.
+    :param fix: Записать пересчитанные значения.
+    """
+    ids = list(user_ids) if user_ids is not None else None
+    stored = (
+        select(UserBalance)
+        .order_by(UserBalance.user_id, UserBalance.currency)  # порядок блокировок как у _upsert
+        .execution_options(populate_existing=True)
+    )
+    if ids is not None:
+        stored = stored.where(UserBalance.user_id.in_(ids))
+    if fix:
+        await _lock_balances(session, ids)
+        stored = stored.with_for_update()
+
+    actual = {(b.user_id, b.currency): b for b in (await session.scalars(stored)).all()}
+    expected = await _ledger_totals(session, ids)
+
+    # С fix у каждого ключа журнала уже есть заблокированная строка. Ключ без неё - первая
+    # операция пользователя, проведённая после _lock_balances: строку создал upsert
+    # проведения из нулей, она верна, а переписать её без блокировки было бы нельзя
+    keys = actual.keys() if fix else expected.keys() | actual.keys()
+    result = BalanceCheck(checked=len(keys))
+    wrong: dict[Key, dict[str, Decimal]] = {}
+    for key in keys:
+        want = expected.get(key) or _zero()
+        have = actual.get(key)
+        if have is None or any(Decimal(getattr(have, c)) != want[c] for c in _COLUMNS):
+            wrong[key] = want
+    result.mismatched = sorted(wrong)
+
+    if wrong and fix:
+        await session.execute(_upsert(session.get_bind().dialect.name, wrong, absolute=True))
+        # Строки из identity map иначе останутся со старыми значениями
+        for key in wrong:
+            session.expire(actual[key])
+        result.fixed = True
+    if wrong:
+        log.warning(f"[Balances] {len(wrong)} of {result.checked} balance row(s) differ from the ledger"
+                    f"{', rebuilt' if result.fixed else ''}")
+    return result
+
+
+def _entry(obj: Transaction, status: TransactionStatus) -> dict:
+    return {"user_id": obj.user_id, "currency": obj.currency, "type": obj.type,
+            "amount": obj.amount, "status": status}
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_orm_transactions(session: Session, _flush_context) -> None:
+    applied, reverted = [], []
+    for obj in session.new:
+        if isinstance(obj, Transaction):
+            applied.append(_entry(obj, obj.status))
+    for obj in session.dirty:
+        if not isinstance(obj, Transaction):
+            continue
+        history = inspect(obj).attrs.status.history
+        if not history.has_changes():
+            continue
+        was_completed = TransactionStatus.COMPLETED in (history.deleted or ())
+        if obj.status == TransactionStatus.COMPLETED and not was_completed:
+            applied.append(_entry(obj, obj.status))
+        elif was_completed and obj.status != TransactionStatus.COMPLETED:
+            reverted.append(_entry(obj, TransactionStatus.COMPLETED))
+    # Удаление записи журнала баланс не трогает: журнал неизменяем, удаляют только при архивации
+
+    deltas = ledger_deltas(applied)
+    for key, values in ledger_deltas(reverted, sign=-1).items():
+        for column, amount in values.items():
+            deltas[key][column] += amount
+    if deltas:
+        connection = session.connection()
+        connection.execute(_upsert(connection.dialect.name, deltas))
@@ -0,0 +1,177 @@
+"""In-memory реестр забаненных telegram_id.
+
+Нужен, чтобы отбрасывать апдейты забаненных пользователей до открытия сессии БД
+(см. ``bot.middleware``). Основа - отсортированный ``array('q')`` (8 байт на id,
+поиск бисекцией), поверх него маленькие множества добавленных и снятых с момента
+последнего уплотнения банов. Когда оверлей разрастается, он вливается в массив.
+
+Реестр загружается при старте и обновляется после коммита, в котором у ``User``
+менялся ``banned`` (``User.ban`` / ``User.unban``, см. ``_track_ban_changes``).
+Баны из других процессов подхватывает фоновая сверка дешёвого отпечатка
+(количество и сумма id забаненных, по частичному индексу ``ix_users_banned``).
+"""
+from __future__ import annotations
+
+import asyncio
+from array import array
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from loguru import logger
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from database.models import USER_BANNED, User
+
+if TYPE_CHECKING:
+    from database.models import DatabaseManager
+
+log = logger.bind(module="bans", prefix="registry")
+
+
+class BannedRegistry:
+    """Множество забаненных telegram_id: компактный массив + оверлей изменений."""
+
+    compact_threshold = 4096
+
+    def __init__(self):
+        self._db_manager: Optional["DatabaseManager"] = None
+        self._ids = array("q")
+        self._added: set[int] = set()
+        self._removed: set[int] = set()
+        self._fingerprint: Optional[tuple] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    def __contains__(self, telegram_id: int) -> bool:
+        if telegram_id in self._added:
+            return True
+        if telegram_id in self._removed:
+            return False
+        i = bisect_left(self._ids, telegram_id)
+        return i < len(self._ids) and self._ids[i] == telegram_id
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._added) - len(self._removed)
+
+    def add(self, telegram_id: int) -> None:
+        if telegram_id in self:
+            return
+        if self._in_base(telegram_id):
+            self._removed.discard(telegram_id)
+        else:
+            self._added.add(telegram_id)
+        self._shift_fingerprint(telegram_id, 1)
+        self._maybe_compact()
+
+    def discard(self, telegram_id: int) -> None:
+        if telegram_id not in self:
+            return
+        if self._in_base(telegram_id):
+            self._removed.add(telegram_id)
+        else:
+            self._added.discard(telegram_id)
+        self._shift_fingerprint(telegram_id, -1)
+        self._maybe_compact()
+
+    def replace(self, telegram_ids: Iterable[int]) -> None:
+        """Заменить содержимое целиком (ids могут быть в любом порядке)."""
+        self._ids = array("q", sorted(set(telegram_ids)))
+        self._added.clear()
+        self._removed.clear()
+
+    def _in_base(self, telegram_id: int) -> bool:
+        i = bisect_left(self._ids, telegram_id)
+        return i < len(self._ids) and self._ids[i] == telegram_id
+
+    def _shift_fingerprint(self, telegram_id: int, sign: int) -> None:
+        # Свой бан уже учтён - сверка не должна из-за него перечитывать весь список
+        if self._fingerprint is not None:
+            count, total = self._fingerprint
+            self._fingerprint = (count + sign, total + sign * telegram_id)
+
+    def _maybe_compact(self) -> None:
+        if len(self._added) + len(self._removed) < max(self.compact_threshold, len(self._ids) // 64):
+            return
+        merged = set(self._ids)
+        merged.difference_update(self._removed)
+        merged.update(self._added)
+        self.replace(merged)
+
+    # -- загрузка --
+
+    async def _fetch_fingerprint(self, session) -> tuple:
+        return tuple((await session.execute(
+            select(func.count(), func.coalesce(func.sum(User.telegram_id), 0)).where(USER_BANNED)
+        )).one())
+
+    async def load(self, db_manager: "DatabaseManager") -> None:
+        """Загрузить реестр из БД. Запоминает db_manager для фоновой сверки."""
+        self._db_manager = db_manager
+        async for session in db_manager.get_session():
+            ids = array("q")
+            result = await session.stream_scalars(
+                select(User.telegram_id).where(USER_BANNED).order_by(User.telegram_id)
+                .execution_options(yield_per=10_000)
+            )
+            async for partition in result.partitions():
+                ids.extend(partition)
+            fingerprint = await self._fetch_fingerprint(session)
+
+        # Ключи уже отсортированы индексом - без промежуточного множества
+        self._ids = ids
+        self._added.clear()
+        self._removed.clear()
+        self._fingerprint = fingerprint
+        log.info(f"[Bans] Loaded {len(ids)} banned user(s)")
+
+    async def _watch(self, interval: float) -> None:
+        # Баны из других процессов не проходят через наш after_commit
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async for session in self._db_manager.get_session():
+                    fingerprint = await self._fetch_fingerprint(session)
+                if fingerprint != self._fingerprint:
+                    await self.load(self._db_manager)
+            except Exception as ex:
+                log.warning(f"[Bans] Watch failed: {ex!r}")
+
+    def start_watch(self, interval: float) -> None:
+        if self._watcher is None and interval > 0 and self._db_manager is not None:
+            self._watcher = asyncio.create_task(self._watch(interval), name="bans-watch")
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+
+banned_users = BannedRegistry()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_ban_changes(session: Session, _flush_context) -> None:
+    for obj in session.dirty:
+        if isinstance(obj, User) and inspect(obj).attrs.banned.history.has_changes():
+            session.info.setdefault("bans_changed", {})[obj.telegram_id] = obj.banned
+    for obj in session.new:
+        if isinstance(obj, User) and obj.banned:
+            session.info.setdefault("bans_changed", {})[obj.telegram_id] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_on_commit(session: Session) -> None:
+    for telegram_id, banned in session.info.pop("bans_changed", {}).items():
+        if banned:
+            banned_users.add(telegram_id)
+        else:
+            banned_users.discard(telegram_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_on_rollback(session: Session) -> None:
+    session.info.pop("bans_changed", None)
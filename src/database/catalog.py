@@ -0,0 +1,179 @@
+"""In-memory каталог тарифов.
+
+Тарифы меняются пару раз в месяц, а читаются на каждое нажатие "купить", поэтому
+активные тарифы держатся в памяти и перечитываются из БД только при смене версии.
+Версия увеличивается автоматически после коммита, в котором менялся ``SubscriptionPlan``
+(см. ``_track_plan_changes``), а также вручную через ``bump()``.
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from loguru import logger
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from database.models import SubscriptionPlan
+
+if TYPE_CHECKING:
+    from database.models import DatabaseManager
+
+log = logger.bind(module="catalog", prefix="plans")
+
+
+@dataclass(frozen=True, slots=True)
+class PlanView:
+    """Снимок тарифа, не привязанный к сессии."""
+    id: int
+    name: str
+    description: Optional[str]
+    price: Decimal
+    duration_days: int
+    squad_uuids: tuple[str, ...]
+    is_visible: bool
+
+    @classmethod
+    def from_model(cls, plan: SubscriptionPlan) -> "PlanView":
+        squads = tuple(s.strip() for s in (plan.squad_uuids or "").split(",") if s.strip())
+        return cls(
+            id=plan.id,
+            name=plan.name,
+            description=plan.description,
+            price=Decimal(plan.price),
+            duration_days=plan.duration_days,
+            squad_uuids=squads,
+            is_visible=plan.is_visible,
+        )
+
+
+class PlanCatalog:
+    """Кэш активных тарифов и построенных по ним клавиатур."""
+
+    def __init__(self):
+        self._db_manager: Optional["DatabaseManager"] = None
+        self._plans: dict[int, PlanView] = {}
+        self._visible: tuple[PlanView, ...] = ()
+        self._keyboards: dict[str, Any] = {}
+        self._version = 0
+        self._loaded_version = -1
+        self._fingerprint: Optional[tuple] = None
+        self._reload: Optional[asyncio.Task] = None
+        self._watcher: Optional[asyncio.Task] = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_version >= 0
+
+    def get(self, plan_id: int) -> Optional[PlanView]:
+        """Активный тариф по id (в том числе скрытый)."""
+        return self._plans.get(plan_id)
+
+    def visible(self) -> tuple[PlanView, ...]:
+        """Активные и видимые тарифы, отсортированные по цене."""
+        return self._visible
+
+    def keyboard(self, locale: str, build: Callable[[tuple[PlanView, ...]], Any]) -> Any:
+        """Клавиатура тарифов для языка; строится один раз на версию каталога."""
+        if (markup := self._keyboards.get(locale)) is None:
+            markup = self._keyboards[locale] = build(self._visible)
+        return markup
+
+    # -- загрузка --
+
+    async def _fetch_fingerprint(self, session) -> tuple:
+        return tuple((await session.execute(
+            select(func.count(SubscriptionPlan.id), func.max(SubscriptionPlan.updated_at))
+        )).one())
+
+    async def load(self, db_manager: "DatabaseManager") -> None:
+        """Загрузить каталог из БД. Запоминает db_manager для последующих перезагрузок."""
+        self._db_manager = db_manager
+        version = self._version
+        async for session in db_manager.get_session():
+            plans = (await session.execute(
+                select(SubscriptionPlan)
+                .where(SubscriptionPlan.is_active.is_(True))
+                .order_by(SubscriptionPlan.price, SubscriptionPlan.id)
+            )).scalars().all()
+            fingerprint = await self._fetch_fingerprint(session)
+
+        views = [PlanView.from_model(p) for p in plans]
+        self._plans = {p.id: p for p in views}
+        self._visible = tuple(p for p in views if p.is_visible)
+        self._keyboards = {}
+        self._fingerprint = fingerprint
+        self._loaded_version = version
+        log.info(f"[PlanCatalog] Loaded {len(self._plans)} active plan(s), version {version}")
+
+    def bump(self) -> None:
+        """Пометить каталог устаревшим и перечитать его в фоне."""
+        self._version += 1
+        if self._db_manager is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._reload is None or self._reload.done():
+            self._reload = loop.create_task(self._reload_pending())
+
+    async def _reload_pending(self) -> None:
+        while self._loaded_version != self._version:
+            try:
+                await self.load(self._db_manager)
+            except Exception as ex:
+                log.exception(f"[PlanCatalog] Reload failed: {ex}")
+                return
+
+    async def _watch(self, interval: float) -> None:
+        # Правки из других процессов не проходят через наш after_commit, поэтому
+        # раз в interval сверяем дешёвый отпечаток (count, max(updated_at))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async for session in self._db_manager.get_session():
+                    fingerprint = await self._fetch_fingerprint(session)
+                if fingerprint != self._fingerprint:
+                    self.bump()
+            except Exception as ex:
+                log.warning(f"[PlanCatalog] Watch failed: {ex!r}")
+
+    def start_watch(self, interval: float) -> None:
+        if self._watcher is None and interval > 0 and self._db_manager is not None:
+            self._watcher = asyncio.create_task(self._watch(interval), name="plan-catalog-watch")
+
+    async def stop(self) -> None:
+        tasks = [t for t in (self._watcher, self._reload) if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._watcher = self._reload = None
+
+
+plan_catalog = PlanCatalog()
+
+
+@event.listens_for(Session, "after_flush")
+def _track_plan_changes(session: Session, _flush_context) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, SubscriptionPlan):
+            session.info["plans_changed"] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_on_commit(session: Session) -> None:
+    if session.info.pop("plans_changed", False):
+        plan_catalog.bump()
+
+
+@event.listens_for(Session, "after_rollback")
+def _reset_on_rollback(session: Session) -> None:
+    session.info.pop("plans_changed", None)
@@ -0,0 +1,294 @@
+"""Хранилище FSM aiogram поверх ``DatabaseManager``.
+
+Горячие состояния живут в LRU в памяти (не больше ``cache_size`` ключей), таблица
+``fsm_states`` - источник истины после перезапуска. Отсутствие состояния тоже
+кэшируется, поэтому обычный апдейт (FSM-middleware читает состояние на каждое
+событие) в БД не ходит.
+
+Кроме того, при старте загружается множество ключей, у которых есть строка в БД
+(по одному на незавершённый сценарий, а не на пользователя). Промах по кэшу для
+ключа не из этого множества отвечается без запроса - у большинства пользователей
+состояния нет вовсе.
+
+Записи не идут в БД сразу: изменённые ключи копятся и сбрасываются фоновой задачей
+раз в ``flush_delay`` секунд одним upsert и одним DELETE. Несколько шагов сценария
+подряд дают одну запись. Вытесненный из LRU, но ещё не сброшенный ключ ждёт сброса
+в очереди и при следующем чтении берётся оттуда.
+
+Состояние, которое не менялось ``ttl`` секунд, считается брошенным: в памяти оно
+сбрасывается при чтении, строки удаляются периодической чисткой по ``expires_at``.
+
+В кластере апдейты пользователя всегда попадают в один воркер (см. ``shard_for``),
+поэтому кэш процесса не расходится с другими.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Mapping, Optional
+
+import orjson
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from loguru import logger
+from sqlalchemy import delete, select
+
+from database.models import FSMState
+
+if TYPE_CHECKING:
+    from database.models import DatabaseManager
+
+log = logger.bind(module="fsm", prefix="storage")
+
+# Пачка строк на один upsert: 4 параметра на строку, с запасом до лимита SQLite
+_CHUNK = 500
+
+
+class _Entry:
+    __slots__ = ("state", "data", "raw", "expires_at")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[dict] = None,
+                 raw: Optional[bytes] = None, expires_at: int = 0):
+        self.state = state
+        self.data = data or {}
+        self.raw = raw  # data в JSON, как она уйдёт в БД
+        self.expires_at = expires_at
+
+    @property
+    def empty(self) -> bool:
+        return self.state is None and not self.data
+
+
+def _upsert(dialect: str, rows: list[dict]):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+
+    stmt = insert(FSMState.__table__).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[FSMState.key],
+        set_={c: stmt.excluded[c] for c in ("state", "data", "expires_at")},
+    )
+
+
+class DatabaseStorage(BaseStorage):
+    """FSM-хранилище: LRU с TTL в памяти + отложенный сброс в ``fsm_states``.
+
+    До ``bind`` работает как память с вытеснением (без сохранения).
+    """
+
+    def __init__(self, *, ttl: int = 86400, cache_size: int = 50_000, flush_delay: float = 0.5):
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.flush_delay = flush_delay
+        self.sweep_interval = max(60, min(ttl // 10, 3600))
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True, with_destiny=True)
+
+        self._db_manager: Optional["DatabaseManager"] = None
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._dirty: dict[str, _Entry] = {}
+        self._flushing: dict[str, _Entry] = {}  # пачка, которая пишется прямо сейчас
+        self._persisted: Optional[set[str]] = None  # ключи со строкой в БД; None - ещё не загружены
+        self._loading: dict[str, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self._last_sweep = 0.0
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    @property
+    def cached(self) -> int:
+        return len(self._entries)
+
+    def bind(self, db_manager: "DatabaseManager") -> None:
+        """Подключить БД и запустить фоновый сброс."""
+        self._db_manager = db_manager
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="fsm-flush")
+
+    async def close(self) -> None:
+        """Остановить фоновую задачу и сбросить всё несохранённое. Можно вызывать повторно."""
+        if self._task is not None:
+            # Флагом, а не cancel(): в 3.11 wait_for теряет отмену, если событие пришло одновременно с ней
+            self._closing = True
+            self._wakeup.set()
+            try:
+                await self._task
+            finally:
+                self._task = None
+                self._closing = False
+        await self.flush()
+
+    # -- BaseStorage --
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        name, entry = await self._entry(key)
+        entry.state = state.state if isinstance(state, State) else state
+        self._touch(name, entry)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, entry = await self._entry(key)
+        return entry.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        # Сериализуем сразу: несериализуемые данные - ошибка обработчика, а не фонового сброса
+        raw = orjson.dumps(data) if data else None
+        name, entry = await self._entry(key)
+        entry.data, entry.raw = dict(data), raw
+        self._touch(name, entry)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        _, entry = await self._entry(key)
+        return dict(entry.data)
+
+    # -- кэш --
+
+    async def _entry(self, key: StorageKey) -> tuple[str, _Entry]:
+        name = self.key_builder.build(key)
+        entry = self._entries.get(name)
+        if entry is None:
+            entry = self._unsaved(name)  # вытеснен, но ещё не сброшен
+            if entry is None:
+                entry = await self._load(name)
+            self._remember(name, entry)
+        else:
+            self._entries.move_to_end(name)
+
+        if entry.expires_at <= time.time() and not entry.empty:
+            # Брошенное состояние: строку удалит чистка, здесь просто начинаем с нуля
+            entry = _Entry()
+            self._entries[name] = entry
+        return name, entry
+
+    def _unsaved(self, name: str) -> Optional[_Entry]:
+        return self._dirty.get(name) or self._flushing.get(name)
+
+    def _remember(self, name: str, entry: _Entry) -> None:
+        self._entries[name] = entry
+        while len(self._entries) > self.cache_size:
+            self._entries.popitem(last=False)
+
+    def _touch(self, name: str, entry: _Entry) -> None:
+        entry.expires_at = int(time.time()) + self.ttl
+        if self._db_manager is not None:
+            self._dirty[name] = entry
+            self._wakeup.set()
+
+    async def _load(self, name: str) -> _Entry:
+        if self._db_manager is None or (self._persisted is not None and name not in self._persisted):
+            return _Entry()
+        # Параллельные чтения одного ключа делят один запрос
+        task = self._loading.get(name)
+        if task is None:
+            task = self._loading[name] = asyncio.create_task(self._fetch(name))
+            task.add_done_callback(lambda _: self._loading.pop(name, None))
+        entry = await asyncio.shield(task)
+        # Пока ждали, ключ мог появиться в кэше - берём его, а не снимок из БД
+        return self._entries.get(name) or self._unsaved(name) or entry
+
+    async def _fetch(self, name: str) -> _Entry:
+        async with self._db_manager.session_factory() as session:
+            row = (await session.execute(
+                select(FSMState.state, FSMState.data, FSMState.expires_at)
+                .where(FSMState.key == name, FSMState.expires_at > int(time.time()))
+            )).first()
+        if row is None:
+            return _Entry()
+        raw = row.data.encode() if row.data else None
+        return _Entry(row.state, orjson.loads(raw) if raw else {}, raw, row.expires_at)
+
+    # -- сброс в БД --
+
+    async def flush(self) -> None:
+        """Записать изменённые ключи: upsert непустых состояний, DELETE очищенных."""
+        if not self._dirty or self._db_manager is None:
+            return
+        batch, self._dirty = self._dirty, {}
+        self._flushing = batch
+        rows, cleared = [], []
+        for name in sorted(batch):  # одинаковый порядок блокировок у параллельных сбросов
+            entry = batch[name]
+            if entry.empty:
+                cleared.append(name)
+            else:
+                rows.append({
+                    "key": name,
+                    "state": entry.state,
+                    "data": entry.raw.decode() if entry.raw else None,
+                    "expires_at": entry.expires_at,
+                })
+
+        try:
+            async with self._db_manager.session_factory() as session:
+                dialect = session.get_bind().dialect.name
+                for i in range(0, len(rows), _CHUNK):
+                    await session.execute(_upsert(dialect, rows[i:i + _CHUNK]))
+                for i in range(0, len(cleared), _CHUNK):
+                    await session.execute(delete(FSMState).where(FSMState.key.in_(cleared[i:i + _CHUNK])))
+                await session.commit()
+        except Exception as ex:
+            # Вернуть в очередь, не затирая то, что успело поменяться за время записи
+            for name, entry in batch.items():
+                self._dirty.setdefault(name, entry)
+            log.exception(f"[FSM] Flush of {len(batch)} key(s) failed: {ex}")
+            return
+        finally:
+            self._flushing = {}
+        if self._persisted is not None:
+            self._persisted.update(row["key"] for row in rows)
+            self._persisted.difference_update(cleared)
+        log.debug(f"[FSM] Flushed {len(rows)} state(s), cleared {len(cleared)}")
+
+    async def sweep(self) -> int:
+        """Удалить брошенные состояния из БД и из памяти. Возвращает число удалённых строк."""
+        now = time.time()
+        self._last_sweep = time.monotonic()
+        for name in [n for n, e in self._entries.items() if e.expires_at <= now and not e.empty]:
+            del self._entries[name]
+        if self._db_manager is None:
+            return 0
+        async with self._db_manager.session_factory() as session:
+            expired = (await session.execute(
+                delete(FSMState).where(FSMState.expires_at <= int(now)).returning(FSMState.key)
+            )).scalars().all()
+            await session.commit()
+        if self._persisted is not None:
+            self._persisted.difference_update(expired)
+        if expired:
+            log.info(f"[FSM] Expired {len(expired)} idle state(s)")
+        return len(expired)
+
+    async def _load_keys(self) -> None:
+        async with self._db_manager.session_factory() as session:
+            keys = (await session.execute(
+                select(FSMState.key).where(FSMState.expires_at > int(time.time()))
+            )).scalars().all()
+        self._persisted = set(keys)
+        log.info(f"[FSM] {len(keys)} stored state(s)")
+
+    async def _run(self) -> None:
+        try:
+            await self._load_keys()
+        except Exception as ex:
+            log.exception(f"[FSM] Can't load stored keys, every cache miss will query the database: {ex}")
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.sweep_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self._closing:
+                return  # остаток сбросит close()
+            # Даём шагам сценария накопиться: одна запись на ключ за окно
+            await asyncio.sleep(self.flush_delay)
+            self._wakeup.clear()
+            await self.flush()
+            if time.monotonic() - self._last_sweep >= self.sweep_interval:
+                try:
+                    await self.sweep()
+                except Exception as ex:
+                    log.exception(f"[FSM] Sweep failed: {ex}")
@@ -0,0 +1,129 @@
+"""baseline schema
+
+Схема, которую раньше создавал ``Base.metadata.create_all``. Базы, созданные до
+появления миграций, не прогоняются через неё, а помечаются (stamp), см. ``database.schema``.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+IdType = sa.BigInteger().with_variant(sa.Integer, "sqlite")
+
+TRANSACTION_TYPE = ("DEPOSIT", "WITHDRAW", "REFUND", "PAYMENT")
+TRANSACTION_STATUS = ("PENDING", "COMPLETED", "FAILED", "CANCELLED")
+
+
+def _enum(name: str, values: tuple[str, ...]) -> sa.Enum:
+    # В Postgres тип общий для нескольких таблиц - создаём его один раз вручную
+    if op.get_bind().dialect.name == "postgresql":
+        return postgresql.ENUM(*values, name=name, create_type=False)
+    return sa.Enum(*values, name=name)
+
+
+def _timestamps() -> list[sa.Column]:
+    return [
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        postgresql.ENUM(*TRANSACTION_TYPE, name="transaction_type").create(bind, checkfirst=True)
+        postgresql.ENUM(*TRANSACTION_STATUS, name="transaction_status").create(bind, checkfirst=True)
+
+    # users <-> plans ссылаются друг на друга: FK users.plan_id добавляется после plans
+    op.create_table(
+        "users",
+        sa.Column("id", IdType, primary_key=True),
+        sa.Column("telegram_id", sa.BigInteger(), nullable=False),
+        sa.Column("locale", sa.String(2), nullable=False),
+        sa.Column("username", sa.String(255)),
+        sa.Column("first_name", sa.String(255)),
+        sa.Column("last_name", sa.String(255)),
+        sa.Column("terms_accepted", sa.Boolean(), nullable=False),
+        sa.Column("plan_id", IdType, nullable=True),
+        sa.Column("active_until", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("is_admin", sa.Boolean(), nullable=False),
+        sa.Column("is_moderator", sa.Boolean(), nullable=False),
+        sa.Column("banned", sa.Boolean(), nullable=False),
+        sa.Column("ban_reason", sa.String(512), nullable=True),
+        *_timestamps(),
+    )
+    op.create_index("ix_users_telegram_id", "users", ["telegram_id"], unique=True)
+    op.create_index("ix_users_active_until", "users", ["active_until"])
+
+    op.create_table(
+        "plans",
+        sa.Column("id", IdType, primary_key=True),
+        sa.Column("name", sa.String(255), nullable=False, unique=True),
+        sa.Column("description", sa.String(1024)),
+        sa.Column("price", sa.Numeric(12, 2), nullable=False),
+        sa.Column("duration_days", sa.Integer(), nullable=False),
+        sa.Column("squad_uuids", sa.String(2048)),
+        sa.Column("is_active", sa.Boolean(), nullable=False),
+        sa.Column("is_visible", sa.Boolean(), nullable=False),
+        sa.Column("created_by", IdType, sa.ForeignKey("users.id", ondelete="SET NULL"), nullable=True),
+        *_timestamps(),
+    )
+    op.create_index("ix_plans_is_active", "plans", ["is_active"])
+
+    with op.batch_alter_table("users") as batch:
+        batch.create_foreign_key("fk_users_plan_id_plans", "plans", ["plan_id"], ["id"], ondelete="SET NULL")
+
+    op.create_table(
+        "payments",
+        sa.Column("id", IdType, primary_key=True),
+        sa.Column("user_id", IdType, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("telegram_id", sa.BigInteger(), nullable=False),
+        sa.Column("platform", sa.String(50), nullable=False),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("currency", sa.String(8), nullable=False),
+        sa.Column("payment_id", sa.String(255), nullable=False),
+        sa.Column("status", _enum("transaction_status", TRANSACTION_STATUS), nullable=False),
+        *_timestamps(),
+        sa.CheckConstraint("amount >= 0", name="chk_payments_amount_nonneg"),
+    )
+    op.create_index("ix_payments_telegram_id", "payments", ["telegram_id"])
+    op.create_index("ix_payments_payment_id", "payments", ["payment_id"], unique=True)
+    op.create_index("ix_payments_status", "payments", ["status"])
+    op.create_index("ix_payments_created_at", "payments", ["created_at"])
+
+    op.create_table(
+        "transactions",
+        sa.Column("id", IdType, primary_key=True),
+        sa.Column("user_id", IdType, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("type", _enum("transaction_type", TRANSACTION_TYPE), nullable=False),
+        sa.Column("status", _enum("transaction_status", TRANSACTION_STATUS), nullable=False),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("currency", sa.String(8), nullable=False),
+        sa.Column("description", sa.String(255)),
+        *_timestamps(),
+        sa.CheckConstraint("amount >= 0", name="chk_transactions_amount_nonneg"),
+    )
+    op.create_index("ix_transactions_status", "transactions", ["status"])
+    op.create_index("ix_transactions_type", "transactions", ["type"])
+    op.create_index("ix_transactions_created_at", "transactions", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("transactions")
+    op.drop_table("payments")
+    with op.batch_alter_table("users") as batch:
+        batch.drop_constraint("fk_users_plan_id_plans", type_="foreignkey")
+    op.drop_table("plans")
+    op.drop_table("users")
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        postgresql.ENUM(name="transaction_status").drop(bind, checkfirst=True)
+        postgresql.ENUM(name="transaction_type").drop(bind, checkfirst=True)
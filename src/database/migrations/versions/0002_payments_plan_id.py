@@ -0,0 +1,29 @@
+"""payments.plan_id
+
+Платёж может покупать тариф; NULL - простое пополнение баланса.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+IdType = sa.BigInteger().with_variant(sa.Integer, "sqlite")
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("payments") as batch:
+        batch.add_column(sa.Column("plan_id", IdType, nullable=True))
+        batch.create_foreign_key("fk_payments_plan_id_plans", "plans", ["plan_id"], ["id"], ondelete="SET NULL")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("payments") as batch:
+        batch.drop_constraint("fk_payments_plan_id_plans", type_="foreignkey")
+        batch.drop_column("plan_id")
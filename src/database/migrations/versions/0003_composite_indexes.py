@@ -0,0 +1,35 @@
+"""composite and partial indexes for payments/transactions
+
+* ``ix_payments_user_status_created`` - платежи пользователя по статусу в порядке created_at;
+* ``ix_payments_pending_created`` - частичный, только PENDING (поиск зависших платежей);
+* ``ix_transactions_user_created`` - история пользователя за период.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# Должно совпадать с database.models.PAYMENT_PENDING, иначе SQLite не применит частичный индекс
+PENDING = sa.text("status = 'PENDING'")
+
+
+def upgrade() -> None:
+    op.create_index("ix_payments_user_status_created", "payments", ["user_id", "status", "created_at"])
+    op.create_index(
+        "ix_payments_pending_created", "payments", ["created_at"],
+        sqlite_where=PENDING, postgresql_where=PENDING,
+    )
+    op.create_index("ix_transactions_user_created", "transactions", ["user_id", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_user_created", table_name="transactions")
+    op.drop_index("ix_payments_pending_created", table_name="payments")
+    op.drop_index("ix_payments_user_status_created", table_name="payments")
@@ -0,0 +1,54 @@
+"""user_balances
+
+Материализованные агрегаты журнала по пользователю и валюте. Заполняется из уже
+проведённых транзакций.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+IdType = sa.BigInteger().with_variant(sa.Integer, "sqlite")
+
+
+def _sum(condition: str, value: str = "amount") -> str:
+    return f"COALESCE(SUM(CASE WHEN {condition} THEN {value} ELSE 0 END), 0)"
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_balances",
+        sa.Column("user_id", IdType, sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("currency", sa.String(8), primary_key=True),
+        sa.Column("balance", sa.Numeric(14, 2), nullable=False),
+        sa.Column("deposited", sa.Numeric(14, 2), nullable=False),
+        sa.Column("withdrawn", sa.Numeric(14, 2), nullable=False),
+        sa.Column("refunded", sa.Numeric(14, 2), nullable=False),
+        sa.Column("paid", sa.Numeric(14, 2), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    # Та же формула, что и в database.balances: balance = deposited + refunded - withdrawn
+    op.execute(f"""
+        INSERT INTO user_balances (user_id, currency, balance, deposited, withdrawn, refunded, paid, updated_at)
+        SELECT user_id, currency,
+               {_sum("type IN ('DEPOSIT', 'REFUND')")} - {_sum("type = 'WITHDRAW'")},
+               {_sum("type = 'DEPOSIT'")},
+               {_sum("type = 'WITHDRAW'")},
+               {_sum("type = 'REFUND'")},
+               {_sum("type = 'PAYMENT'")},
+               CURRENT_TIMESTAMP
+        FROM transactions
+        WHERE status = 'COMPLETED'
+        GROUP BY user_id, currency
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table("user_balances")
@@ -0,0 +1,37 @@
+"""keyset pagination indexes
+
+Админские списки идут по ``(created_at, id)`` в обратном порядке, с фильтром по
+пользователю или без. Одиночные индексы по created_at поглощаются составными.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_users_created_id", "users", ["created_at", "id"])
+
+    op.drop_index("ix_payments_created_at", table_name="payments")
+    op.create_index("ix_payments_created_id", "payments", ["created_at", "id"])
+    op.create_index("ix_payments_user_created", "payments", ["user_id", "created_at", "id"])
+
+    op.drop_index("ix_transactions_created_at", table_name="transactions")
+    op.create_index("ix_transactions_created_id", "transactions", ["created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_created_id", table_name="transactions")
+    op.create_index("ix_transactions_created_at", "transactions", ["created_at"])
+
+    op.drop_index("ix_payments_user_created", table_name="payments")
+    op.drop_index("ix_payments_created_id", table_name="payments")
+    op.create_index("ix_payments_created_at", "payments", ["created_at"])
+
+    op.drop_index("ix_users_created_id", table_name="users")
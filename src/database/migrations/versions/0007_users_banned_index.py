@@ -0,0 +1,29 @@
+"""partial index of banned users
+
+Реестр банов (database.bans) при старте и при сверке читает только забаненных.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+# Должно совпадать с database.models.USER_BANNED, иначе SQLite не применит частичный индекс
+BANNED = sa.text("banned = true")
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_users_banned", "users", ["telegram_id"],
+        sqlite_where=BANNED, postgresql_where=BANNED,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_banned", table_name="users")
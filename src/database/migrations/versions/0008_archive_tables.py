@@ -0,0 +1,68 @@
+"""payments_archive, transactions_archive
+
+Холодные копии проведённых платежей и записей журнала старше горизонта архивации
+(database.archive). Горячие таблицы и их индексы остаются небольшими.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+IdType = sa.BigInteger().with_variant(sa.Integer, "sqlite")
+
+TRANSACTION_TYPE = ("DEPOSIT", "WITHDRAW", "REFUND", "PAYMENT")
+TRANSACTION_STATUS = ("PENDING", "COMPLETED", "FAILED", "CANCELLED")
+
+
+def _enum(name: str, values: tuple[str, ...]) -> sa.Enum:
+    # Типы уже созданы базовой миграцией
+    if op.get_bind().dialect.name == "postgresql":
+        return postgresql.ENUM(*values, name=name, create_type=False)
+    return sa.Enum(*values, name=name)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "payments_archive",
+        sa.Column("id", IdType, primary_key=True, autoincrement=False),
+        sa.Column("user_id", IdType, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("telegram_id", sa.BigInteger(), nullable=False),
+        sa.Column("platform", sa.String(50), nullable=False),
+        sa.Column("plan_id", IdType, sa.ForeignKey("plans.id", ondelete="SET NULL"), nullable=True),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("currency", sa.String(8), nullable=False),
+        sa.Column("payment_id", sa.String(255), nullable=False),
+        sa.Column("status", _enum("transaction_status", TRANSACTION_STATUS), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_payments_archive_created_id", "payments_archive", ["created_at", "id"])
+    op.create_index("ix_payments_archive_user_created", "payments_archive", ["user_id", "created_at", "id"])
+
+    op.create_table(
+        "transactions_archive",
+        sa.Column("id", IdType, primary_key=True, autoincrement=False),
+        sa.Column("user_id", IdType, sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("type", _enum("transaction_type", TRANSACTION_TYPE), nullable=False),
+        sa.Column("status", _enum("transaction_status", TRANSACTION_STATUS), nullable=False),
+        sa.Column("amount", sa.Numeric(12, 2), nullable=False),
+        sa.Column("currency", sa.String(8), nullable=False),
+        sa.Column("description", sa.String(255)),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_transactions_archive_created_id", "transactions_archive", ["created_at", "id"])
+    op.create_index("ix_transactions_archive_user_created", "transactions_archive", ["user_id", "created_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("transactions_archive")
+    op.drop_table("payments_archive")
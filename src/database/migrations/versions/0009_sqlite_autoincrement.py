@@ -0,0 +1,48 @@
+"""AUTOINCREMENT for payments and transactions on SQLite
+
+Без AUTOINCREMENT SQLite выдаёт новой строке max(rowid) + 1: после того как архивация
+(database.archive) унесла самые новые по id строки, их id достаются новым платежам, и
+в админке, выгрузках и архиве появляются две разные записи с одним id. Таблицы
+пересобираются с AUTOINCREMENT, счётчик в ``sqlite_sequence`` ставится не ниже
+максимального id из горячей и архивной таблиц. Postgres выдаёт id из последовательности
+и ничего не переиспользует - там миграция ничего не делает.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+TABLES = ("payments", "transactions")
+
+
+def _rebuild(table: str, autoincrement: bool) -> None:
+    with op.batch_alter_table(table, recreate="always", table_kwargs={"sqlite_autoincrement": autoincrement}):
+        pass
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table in TABLES:
+        _rebuild(table, True)
+        # Копирование строк уже подняло счётчик до max(id) горячей таблицы; id из архива
+        # тоже заняты
+        op.execute(sa.text("DELETE FROM sqlite_sequence WHERE name = :table").bindparams(table=table))
+        op.execute(sa.text(
+            f"INSERT INTO sqlite_sequence (name, seq) "
+            f"SELECT :table, COALESCE(MAX(id), 0) FROM (SELECT id FROM {table} UNION ALL SELECT id FROM {table}_archive)"
+        ).bindparams(table=table))
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != "sqlite":
+        return
+    for table in TABLES:
+        _rebuild(table, False)
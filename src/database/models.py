@@ -1,13 +1,14 @@
 from __future__ import annotations
 
 import datetime
-from typing import AsyncGenerator, Optional
+from typing import AsyncGenerator, Optional, Sequence
 
 from sqlalchemy import (
     BigInteger,
     Boolean,
     DateTime,
     String,
+    Text,
     func,
     ForeignKey,
     Enum,
@@ -15,6 +16,7 @@ from sqlalchemy import (
     Integer,
     CheckConstraint,
     Index,
+    text,
 )
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
@@ -24,6 +26,13 @@ from database.enum import TransactionType, TransactionStatus  # type: ignore
 
 IdType = BigInteger().with_variant(Integer, "sqlite")
 
+# Условие частичного индекса ix_payments_pending_created. SQLite применяет частичный индекс,
+# только если в запросе стоит тот же литерал (не bind-параметр), поэтому запросы по
+# PENDING-платежам, которым нужен этот индекс, используют именно это выражение.
+PAYMENT_PENDING = text("status = 'PENDING'")
+# То же для частичного индекса ix_users_banned (реестр банов, database.bans)
+USER_BANNED = text("banned = true")
+
 class Base(DeclarativeBase):
     """Base class for all database models."""
     pass
@@ -123,6 +132,13 @@ class User(Base):
 
     __table_args__ = (
         Index("ix_users_active_until", "active_until"),
+        # Keyset-пагинация админских списков
+        Index("ix_users_created_id", "created_at", "id"),
+        # Реестр банов: загрузка и сверка читают только забаненных
+        Index(
+            "ix_users_banned", "telegram_id",
+            sqlite_where=USER_BANNED, postgresql_where=USER_BANNED,
+        ),
     )
 
     @property
@@ -159,6 +175,11 @@ class Payment(Base):
     telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False, index=True)
     platform: Mapped[str] = mapped_column(String(50), nullable=False)
 
+    # Тариф, который покупается этим платежом. NULL - простое пополнение
+    plan_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey("plans.id", ondelete="SET NULL"), nullable=True
+    )
+
     amount: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
     currency: Mapped[str] = mapped_column(String(8), nullable=False, default="RUB")
 
@@ -181,7 +202,18 @@ class Payment(Base):
     __table_args__ = (
         CheckConstraint("amount >= 0", name="chk_payments_amount_nonneg"),
         Index("ix_payments_status", "status"),
-        Index("ix_payments_created_at", "created_at"),
+        # Keyset-пагинация админских списков: все платежи и платежи пользователя
+        Index("ix_payments_created_id", "created_at", "id"),
+        Index("ix_payments_user_created", "user_id", "created_at", "id"),
+        # Платежи пользователя по статусу в порядке created_at
+        Index("ix_payments_user_status_created", "user_id", "status", "created_at"),
+        # Только PENDING: поиск зависших платежей не читает проведённую историю
+        Index(
+            "ix_payments_pending_created", "created_at",
+            sqlite_where=PAYMENT_PENDING, postgresql_where=PAYMENT_PENDING,
+        ),
+        # Без AUTOINCREMENT SQLite отдал бы новым платежам id, ушедшие в архив
+        {"sqlite_autoincrement": True},
     )
 
 
@@ -221,7 +253,104 @@ class Transaction(Base):
         CheckConstraint("amount >= 0", name="chk_transactions_amount_nonneg"),
         Index("ix_transactions_status", "status"),
         Index("ix_transactions_type", "type"),
-        Index("ix_transactions_created_at", "created_at"),
+        Index("ix_transactions_created_id", "created_at", "id"),
+        # История пользователя за период
+        Index("ix_transactions_user_created", "user_id", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+
+# --- Archive (см. database.archive) ---
+# Проведённые платежи и записи журнала старше горизонта архивации. Колонки те же, id
+# сохраняется; индексы - только под историю пользователя и keyset-листание.
+class ArchivedPayment(Base):
+    __tablename__ = "payments_archive"
+
+    id: Mapped[int] = mapped_column(IdType, primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    telegram_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    platform: Mapped[str] = mapped_column(String(50), nullable=False)
+    plan_id: Mapped[Optional[int]] = mapped_column(ForeignKey("plans.id", ondelete="SET NULL"), nullable=True)
+    amount: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
+    currency: Mapped[str] = mapped_column(String(8), nullable=False)
+    payment_id: Mapped[str] = mapped_column(String(255), nullable=False)
+    status: Mapped[TransactionStatus] = mapped_column(
+        Enum(TransactionStatus, name="transaction_status"), nullable=False
+    )
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_payments_archive_created_id", "created_at", "id"),
+        Index("ix_payments_archive_user_created", "user_id", "created_at", "id"),
+    )
+
+
+class ArchivedTransaction(Base):
+    __tablename__ = "transactions_archive"
+
+    id: Mapped[int] = mapped_column(IdType, primary_key=True, autoincrement=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    type: Mapped[TransactionType] = mapped_column(Enum(TransactionType, name="transaction_type"), nullable=False)
+    status: Mapped[TransactionStatus] = mapped_column(
+        Enum(TransactionStatus, name="transaction_status"), nullable=False
+    )
+    amount: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
+    currency: Mapped[str] = mapped_column(String(8), nullable=False)
+    description: Mapped[Optional[str]] = mapped_column(String(255))
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        Index("ix_transactions_archive_created_id", "created_at", "id"),
+        Index("ix_transactions_archive_user_created", "user_id", "created_at"),
+    )
+
+
+class UserBalance(Base):
+    """Агрегаты журнала транзакций по пользователю и валюте.
+
+    Поддерживается в той же транзакции БД, что и проведённые ``Transaction`` (см. database.balances),
+    поэтому баланс читается одной строкой по первичному ключу, без суммирования журнала.
+    """
+    __tablename__ = "user_balances"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="CASCADE"), primary_key=True
+    )
+    currency: Mapped[str] = mapped_column(String(8), primary_key=True)
+
+    # balance = deposited + refunded - withdrawn
+    balance: Mapped[float] = mapped_column(Numeric(14, 2), default=0, nullable=False)
+    deposited: Mapped[float] = mapped_column(Numeric(14, 2), default=0, nullable=False)
+    withdrawn: Mapped[float] = mapped_column(Numeric(14, 2), default=0, nullable=False)
+    refunded: Mapped[float] = mapped_column(Numeric(14, 2), default=0, nullable=False)
+    paid: Mapped[float] = mapped_column(Numeric(14, 2), default=0, nullable=False)
+
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+    @property
+    def total_spent(self):
+        """Потрачено на подписки: прямые оплаты и списания с баланса."""
+        return self.paid + self.withdrawn
+
+
+class FSMState(Base):
+    """Состояние FSM aiogram (см. database.fsm): одна строка на ключ хранилища.
+
+    ``expires_at`` - unix-время, после которого состояние считается брошенным и удаляется.
+    """
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    data: Mapped[Optional[str]] = mapped_column(Text, nullable=True)  # JSON
+    expires_at: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    __table_args__ = (
+        Index("ix_fsm_states_expires_at", "expires_at"),
     )
 
 
@@ -229,31 +358,44 @@ class Transaction(Base):
 class DatabaseManager:
     """Database manager for handling database operations."""
 
-    def __init__(self, database_url: str):
+    def __init__(self, database_url: str, replica_urls: Sequence[str] = ()):
         """Initialize database manager.
 
         Args:
             database_url: Database connection URL
+            replica_urls: Read replica URLs (see ``database.routing``)
         """
+        from database.routing import ReplicaSet, RoutingSession
+
         self.engine = create_async_engine(database_url, echo=False)
+        self.replicas = ReplicaSet(replica_urls)
         self.session_factory = async_sessionmaker(
-            self.engine, class_=AsyncSession, expire_on_commit=False
+            self.engine, class_=AsyncSession, expire_on_commit=False,
+            sync_session_class=RoutingSession, primary=self.engine, replicas=self.replicas,
         )
 
     async def init_db(self) -> None:
-        """Initialize database tables."""
+        """Initialize database schema (apply Alembic migrations up to head)."""
+        from database.schema import upgrade_schema
+
         async with self.engine.begin() as conn:
-            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(upgrade_schema)
 
     async def dispose(self) -> None:
-        """Dispose database engine."""
+        """Dispose database engines."""
+        await self.replicas.dispose()
         await self.engine.dispose()
 
-    async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
+    async def get_session(self, readonly: bool = False) -> AsyncGenerator[AsyncSession, None]:
         """Get database session.
 
+        Args:
+            readonly: Route reads to a replica (writes still go to the primary)
+
         Yields:
             AsyncSession: Database session
         """
         async with self.session_factory() as session:
+            if readonly:
+                session.info["readonly"] = True
             yield session
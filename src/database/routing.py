@@ -0,0 +1,154 @@
+"""Маршрутизация запросов между основной БД и репликами чтения.
+
+Реплики задаются списком URL (``DB_REPLICA_URLS``). Без них всё работает как раньше:
+``RoutingSession`` возвращает основной движок.
+
+Куда идёт запрос:
+
+- запись (flush, ``insert``/``update``/``delete``) - всегда на основную БД;
+- чтение в сессии только для чтения (``DatabaseManager.get_session(readonly=True)``)
+  или запрос с ``.execution_options(replica=True)`` - на здоровую реплику;
+- остальное - на основную БД.
+
+Реплика выбирается по кругу один раз на сессию (``session.info["replica"]``) и
+дальше не меняется, пока жива: реплики отстают по-разному, и чтения одной сессии
+с разных реплик могли бы увидеть данные «назад во времени». К тому же сессия не
+держит открытыми соединения к нескольким репликам сразу.
+
+Как только сессия что-то записала, она «прилипает» к основной БД до закрытия:
+апдейт, который закоммитил изменения и читает дальше, видит свои записи, даже если
+реплика ещё не догнала.
+
+Здоровье реплик проверяется фоновым ``SELECT 1`` с таймаутом. Реплика, которая не
+ответила или разорвала соединение посреди запроса, выводится из ротации до
+следующей успешной проверки. Если здоровых реплик нет, чтения идут на основную БД.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+from typing import Optional, Sequence
+
+from loguru import logger
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import Session
+
+log = logger.bind(module="database", prefix="replicas")
+
+
+def _safe_url(engine: AsyncEngine) -> str:
+    return engine.url.render_as_string(hide_password=True)
+
+
+def _marked_for_replica(clause) -> bool:
+    get_options = getattr(clause, "get_execution_options", None)
+    return get_options is not None and get_options().get("replica", False)
+
+
+class ReplicaSet:
+    """Реплики чтения с проверкой здоровья и выбором по кругу."""
+
+    def __init__(self, urls: Sequence[str] = ()):
+        self.engines: list[AsyncEngine] = [create_async_engine(url, echo=False) for url in urls]
+        self._healthy: list[AsyncEngine] = list(self.engines)  # до первой проверки считаем живыми
+        self._cycle = itertools.cycle(self._healthy)
+        self._watcher: Optional[asyncio.Task] = None
+        for engine in self.engines:
+            event.listen(engine.sync_engine, "handle_error", self._on_error(engine))
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def pick(self) -> Optional[AsyncEngine]:
+        """Следующая здоровая реплика или ``None``, если таких нет."""
+        return next(self._cycle) if self._healthy else None
+
+    def is_healthy(self, engine: AsyncEngine) -> bool:
+        return engine in self._healthy
+
+    def status(self) -> list[dict]:
+        return [{"url": _safe_url(e), "healthy": e in self._healthy} for e in self.engines]
+
+    def _set_healthy(self, healthy: list[AsyncEngine]) -> None:
+        if healthy == self._healthy:
+            return
+        for engine in self.engines:
+            was, now = engine in self._healthy, engine in healthy
+            if was != now:
+                log.warning(f"[Replicas] {_safe_url(engine)} is {'back' if now else 'down'}")
+        self._healthy = healthy
+        self._cycle = itertools.cycle(healthy)
+
+    def _on_error(self, engine: AsyncEngine):
+        def handle_error(context) -> None:
+            if context.is_disconnect and engine in self._healthy:
+                self._set_healthy([e for e in self._healthy if e is not engine])
+        return handle_error
+
+    async def _ping(self, engine: AsyncEngine, timeout: float) -> bool:
+        try:
+            async with asyncio.timeout(timeout):
+                async with engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+            return True
+        except Exception as ex:
+            log.debug(f"[Replicas] {_safe_url(engine)} check failed: {ex!r}")
+            return False
+
+    async def check(self, timeout: float = 1.0) -> None:
+        results = await asyncio.gather(*(self._ping(e, timeout) for e in self.engines))
+        self._set_healthy([e for e, ok in zip(self.engines, results) if ok])
+
+    async def _watch(self, interval: float, timeout: float) -> None:
+        while True:
+            await self.check(timeout)
+            await asyncio.sleep(interval)
+
+    def start_watch(self, interval: float, timeout: float = 1.0) -> None:
+        if self._watcher is None and self.engines and interval > 0:
+            self._watcher = asyncio.create_task(self._watch(interval, timeout), name="replicas-watch")
+            log.info(f"[Replicas] {len(self.engines)} replica(s), checked every {interval}s")
+
+    async def stop(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    async def dispose(self) -> None:
+        await self.stop()
+        for engine in self.engines:
+            await engine.dispose()
+
+
+class RoutingSession(Session):
+    """``Session``, которая отправляет чтения на реплики, а запись - на основную БД."""
+
+    def __init__(self, *, primary: AsyncEngine, replicas: ReplicaSet, **kw):
+        super().__init__(**kw)
+        self.primary = primary
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, *, clause=None, **kw) -> Engine:
+        if not self.replicas or self.info.get("primary"):
+            return self.primary.sync_engine
+        if self._flushing or (clause is not None and getattr(clause, "is_dml", False)):
+            # Запись: дальше эта сессия читает только с основной БД
+            self.info["primary"] = True
+            return self.primary.sync_engine
+        if self.info.get("readonly") or _marked_for_replica(clause):
+            if (replica := self._session_replica()) is not None:
+                return replica.sync_engine
+        return self.primary.sync_engine
+
+    def _session_replica(self) -> Optional[AsyncEngine]:
+        replica = self.info.get("replica")
+        if replica is None or not self.replicas.is_healthy(replica):
+            # Первое чтение сессии или её реплику вывели из ротации
+            replica = self.info["replica"] = self.replicas.pick()
+        return replica
@@ -0,0 +1,42 @@
+"""Применение миграций Alembic при старте.
+
+Базы, созданные до миграций через ``create_all``, не имеют таблицы ``alembic_version``.
+Такие базы помечаются ревизией, которой соответствует их схема, и дальше обновляются как обычно.
+"""
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from loguru import logger
+from sqlalchemy import inspect
+from sqlalchemy.engine import Connection
+
+log = logger.bind(module="database", prefix="schema")
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+
+
+def _alembic_config(connection: Connection) -> Config:
+    cfg = Config()
+    cfg.set_main_option("script_location", str(MIGRATIONS_DIR))
+    cfg.attributes["connection"] = connection
+    return cfg
+
+
+def _legacy_revision(connection: Connection) -> str | None:
+    """Ревизия для базы без alembic_version, созданной через create_all. None - база пустая."""
+    insp = inspect(connection)
+    tables = set(insp.get_table_names())
+    if "alembic_version" in tables or "users" not in tables:
+        return None
+    columns = {c["name"] for c in insp.get_columns("payments")}
+    return "0002" if "plan_id" in columns else "0001"
+
+
+def upgrade_schema(connection: Connection) -> None:
+    """Довести схему до head. Вызывается через ``AsyncConnection.run_sync``."""
+    cfg = _alembic_config(connection)
+    if (revision := _legacy_revision(connection)) is not None:
+        log.warning(f"[Schema] Database without migration history, stamping as {revision}")
+        command.stamp(cfg, revision)
+    command.upgrade(cfg, "head")
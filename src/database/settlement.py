@@ -0,0 +1,281 @@
+"""Пакетное проведение платежей.
+
+Переводит платежи из PENDING в конечный статус набором set-based запросов:
+один ``UPDATE ... RETURNING`` по платежам, bulk ``INSERT`` транзакций, upsert балансов
+и bulk ``UPDATE`` пользователей по первичному ключу. Всё выполняется в транзакции вызывающего кода.
+Условие ``status = PENDING`` в UPDATE делает повторное проведение невозможным.
+"""
+from __future__ import annotations
+
+import asyncio
+import datetime
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, Optional
+
+from loguru import logger
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.balances import apply_ledger
+from database.catalog import plan_catalog
+from database.enum import TransactionStatus, TransactionType
+from database.models import Payment, SubscriptionPlan, Transaction, User
+
+if TYPE_CHECKING:
+    from database.models import DatabaseManager
+
+log = logger.bind(module="settlement", prefix="payments")
+
+_FINAL_FAIL_STATUSES = (TransactionStatus.FAILED, TransactionStatus.CANCELLED)
+
+_STOP = object()  # Метка в очереди: после неё фоновая задача дописывает остаток и выходит
+
+
+@dataclass
+class SettlementResult:
+    """Итог проведения пачки платежей."""
+    settled: list[str] = field(default_factory=list)    # payment_id, переведённые в COMPLETED
+    failed: list[str] = field(default_factory=list)     # payment_id, переведённые в FAILED/CANCELLED
+    skipped: list[str] = field(default_factory=list)    # неизвестные или уже проведённые
+    extended: dict[int, datetime.datetime] = field(default_factory=dict)  # user_id -> новый active_until
+
+    def merge(self, other: "SettlementResult") -> "SettlementResult":
+        self.settled.extend(other.settled)
+        self.failed.extend(other.failed)
+        self.skipped.extend(other.skipped)
+        self.extended.update(other.extended)
+        return self
+
+
+def _as_utc(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    # SQLite отдаёт naive datetime даже для DateTime(timezone=True)
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+async def settle_payments(session: AsyncSession, payment_ids: Iterable[str]) -> SettlementResult:
+    """Провести платежи (PENDING -> COMPLETED).
+
+    Для каждого проведённого платежа создаётся ``Transaction``; если платёж покупает тариф,
+    пользователю продлевается ``active_until`` и выставляется ``plan_id``.
+    Коммит остаётся за вызывающим кодом.
+
+    :param session: Сессия БД.
+    :param payment_ids: Внешние идентификаторы платежей (``Payment.payment_id``).
+    :return: SettlementResult.
+    """
+    ids = list(dict.fromkeys(payment_ids))
+    result = SettlementResult()
+    if not ids:
+        return result
+
+    # 1. Guarded UPDATE: проведёт только те платежи, что ещё в PENDING
+    rows = (await session.execute(
+        update(Payment)
+        .where(Payment.payment_id.in_(ids), Payment.status == TransactionStatus.PENDING)
+        .values(status=TransactionStatus.COMPLETED)
+        .returning(
+            Payment.id, Payment.payment_id, Payment.user_id, Payment.plan_id,
+            Payment.amount, Payment.currency, Payment.platform,
+        )
+        .execution_options(synchronize_session=False)
+    )).all()
+    if not rows:
+        result.skipped.extend(ids)
+        return result
+
+    rows.sort(key=lambda r: r.id)  # продлеваем в порядке создания платежей
+    settled = {r.payment_id for r in rows}
+    result.settled.extend(r.payment_id for r in rows)
+    result.skipped.extend(pid for pid in ids if pid not in settled)
+
+    # 2. Длительности тарифов (из каталога) и текущие сроки пользователей
+    plan_ids = {r.plan_id for r in rows if r.plan_id is not None}
+    durations: dict[int, int] = {}
+    for plan_id in plan_ids:
+        if (plan := plan_catalog.get(plan_id)) is not None:
+            durations[plan_id] = plan.duration_days
+    if missing := plan_ids - durations.keys():
+        # Неактивные тарифы в каталоге не держим - добираем из БД
+        durations.update((await session.execute(
+            select(SubscriptionPlan.id, SubscriptionPlan.duration_days)
+            .where(SubscriptionPlan.id.in_(missing))
+        )).all())
+
+    user_ids = {r.user_id for r in rows if r.plan_id in durations}
+    active_until: dict[int, Optional[datetime.datetime]] = {}
+    if user_ids:
+        active_until = {
+            uid: _as_utc(until) for uid, until in (await session.execute(
+                select(User.id, User.active_until)
+                .where(User.id.in_(user_ids))
+                .with_for_update()
+            )).all()
+        }
+
+    # 3. Считаем изменения в памяти
+    now = datetime.datetime.now(datetime.timezone.utc)
+    transactions = []
+    users: dict[int, dict] = {}
+    for r in rows:
+        is_plan = r.plan_id in durations
+        transactions.append({
+            "user_id": r.user_id,
+            "type": TransactionType.PAYMENT if is_plan else TransactionType.DEPOSIT,
+            "status": TransactionStatus.COMPLETED,
+            "amount": r.amount,
+            "currency": r.currency,
+            "description": f"{r.platform}:{r.payment_id}",
+        })
+        if not is_plan or r.user_id not in active_until:
+            continue
+        base = max(active_until[r.user_id] or now, now)
+        active_until[r.user_id] = base + datetime.timedelta(days=durations[r.plan_id])
+        users[r.user_id] = {"id": r.user_id, "active_until": active_until[r.user_id], "plan_id": r.plan_id}
+
+    # 4. Bulk INSERT транзакций с upsert балансов и bulk UPDATE пользователей по PK
+    await session.execute(insert(Transaction), transactions)
+    await apply_ledger(session, transactions)
+    if users:
+        await session.execute(update(User), list(users.values()))
+        result.extended.update({uid: u["active_until"] for uid, u in users.items()})
+
+    log.info(f"[Settlement] Settled {len(rows)} payment(s), extended {len(users)} user(s), skipped {len(result.skipped)}")
+    return result
+
+
+async def fail_payments(
+        session: AsyncSession,
+        payment_ids: Iterable[str],
+        status: TransactionStatus = TransactionStatus.FAILED,
+) -> SettlementResult:
+    """Перевести платежи из PENDING в FAILED или CANCELLED одним UPDATE."""
+    if status not in _FINAL_FAIL_STATUSES:
+        raise ValueError(f"Unsupported fail status: {status}")
+    ids = list(dict.fromkeys(payment_ids))
+    result = SettlementResult()
+    if not ids:
+        return result
+
+    updated = set((await session.execute(
+        update(Payment)
+        .where(Payment.payment_id.in_(ids), Payment.status == TransactionStatus.PENDING)
+        .values(status=status)
+        .returning(Payment.payment_id)
+        .execution_options(synchronize_session=False)
+    )).scalars())
+    result.failed.extend(pid for pid in ids if pid in updated)
+    result.skipped.extend(pid for pid in ids if pid not in updated)
+    return result
+
+
+class SettlementBatcher:
+    """Собирает переходы статусов из вебхуков и проводит их пачками.
+
+    Каждый ``submit`` ждёт проведения своей пачки и получает ``True``,
+    если именно этот вызов перевёл платёж в конечный статус.
+    """
+
+    def __init__(self, db_manager: "DatabaseManager", *, max_batch: int = 200, max_delay: float = 0.05):
+        self.db_manager = db_manager
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="settlement-batcher")
+
+    async def stop(self) -> None:
+        """Остановить фоновую задачу, предварительно проведя всё, что уже в очереди.
+
+        Задачу не отменяем: она дописывает текущую пачку, видит метку остановки и
+        проводит остаток очереди, так что ни один ``submit`` не остаётся без ответа.
+        """
+        if self._task is None:
+            return
+        self._closed = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, payment_id: str, status: TransactionStatus = TransactionStatus.COMPLETED) -> bool:
+        if self._closed:
+            raise RuntimeError("Settlement batcher is stopped")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((payment_id, status, future))
+        return await future
+
+    def _drain(self, limit: int) -> list:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+        # Остановка: проводим то, что успели положить до метки
+        while not self._queue.empty():
+            await self._flush([item for item in self._drain(self.max_batch) if item is not _STOP])
+
+    async def _flush(self, batch: list) -> None:
+        if not batch:
+            return
+        by_status: dict[TransactionStatus, list[str]] = {}
+        for payment_id, status, _ in batch:
+            by_status.setdefault(status, []).append(payment_id)
+
+        try:
+            result = SettlementResult()
+            async for session in self.db_manager.get_session():
+                for status, ids in by_status.items():
+                    if status == TransactionStatus.COMPLETED:
+                        result.merge(await settle_payments(session, ids))
+                    else:
+                        result.merge(await fail_payments(session, ids, status))
+                await session.commit()
+        except Exception as ex:
+            log.exception(f"[Settlement] Batch of {len(batch)} failed: {ex}")
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(ex)
+            return
+        except asyncio.CancelledError:
+            # Задачу отменили снаружи (закрытие loop): ждущие вебхуки получают ошибку, а не висят
+            for *_, future in batch:
+                if not future.done():
+                    future.set_exception(RuntimeError("Settlement was cancelled"))
+            raise
+
+        done = set(result.settled) | set(result.failed)
+        for payment_id, _, future in batch:
+            if not future.done():
+                future.set_result(payment_id in done)
+                done.discard(payment_id)  # дубликаты в пачке получат False
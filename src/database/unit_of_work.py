@@ -0,0 +1,33 @@
+"""Признак «в сессии есть что коммитить» для единицы работы на апдейт.
+
+Сессию апдейта открывает и закрывает ``db_session_middleware``: коммит один, в конце,
+и только если сессия что-то писала. Писала - значит либо в ней остались несброшенные
+изменения объектов, либо уже был flush (autoflush перед запросом) или DML-запрос
+(``update()``/``delete()``/``insert()`` через ``session.execute``). Последние два
+случая отмечаются в ``session.info`` событиями ниже и сбрасываются коммитом или
+откатом.
+"""
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+
+
+def has_writes(session: AsyncSession) -> bool:
+    return bool(session.new or session.dirty or session.deleted or session.info.get("writes"))
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session: Session, _flush_context) -> None:
+    session.info["writes"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dml(state: ORMExecuteState) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["writes"] = True
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _reset(session: Session) -> None:
+    session.info.pop("writes", None)
@@ -1,90 +1,288 @@
 import asyncio
+import os
+import signal
+from contextlib import suppress
 from pathlib import Path
 
-from aiogram import Bot
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
-from aiogram.utils.token import TokenValidationError
 from loguru import logger
 
-from database import DatabaseManager
-from modules import HTTPServer, webapi
-from modules.payments import yookassa_webhook
-from bot import router, dp
-from shared import config, env, storage
+from modules.startup import run, timeline
 
+if os.getenv("STARTUP_PROFILE") == "1":
+    timeline.profile_imports()
 
-async def _init_database():
-    logger.info("[init] Initializing database...")
-    db_manager = DatabaseManager(env.sql_uri())
-    await db_manager.init_db()
+# Фаза config. Всё тяжёлое (aiogram, SQLAlchemy, aiohttp) импортируется внутри своих фаз ниже
+from shared import config, env, i18n, storage  # noqa: E402
+
+
+async def _init_database(create_tables: bool = True):
+    with timeline.phase("db"):
+        from database import DatabaseManager, banned_users, plan_catalog
+
+        logger.info("[init] Initializing database...")
+        db_manager = DatabaseManager(env.sql_uri(), env.replica_uris())
+        if create_tables:
+            await db_manager.init_db()
+        await asyncio.gather(plan_catalog.load(db_manager), banned_users.load(db_manager))
     return db_manager
 
+def _start_db_watchers(db_manager):
+    # Только после проверки токена: при выходе без бота фоновым задачам некому было бы их остановить
+    from database import banned_users, plan_catalog
+
+    plan_catalog.start_watch(config.bot.plans_refresh)
+    banned_users.start_watch(config.bot.bans_refresh)
+    db_manager.replicas.start_watch(config.bot.replicas.check_interval,
+                                    config.bot.replicas.check_timeout_ms / 1000)
+
+def _init_i18n():
+    with timeline.phase("i18n"):
+        i18n.load()
+
 def _init_bot():
-    try:
-        return Bot(
-            token=config.bot.token,
-            default=DefaultBotProperties(parse_mode=ParseMode.HTML)
-        )
-    except TokenValidationError:
-        logger.error("❌ Invalid bot token. Please check your configuration.")
-        return None
+    # Импорт aiogram и хендлеров - самая тяжёлая часть старта
+    with timeline.phase("bot"):
+        from aiogram import Bot
+        from aiogram.client.default import DefaultBotProperties
+        from aiogram.enums import ParseMode
+        from aiogram.utils.token import TokenValidationError
+        from bot import dp
+        from bot.session import TunedSession
+
+        try:
+            bot = Bot(
+                token=config.bot.token,
+                session=TunedSession.from_config(config.bot.session),
+                default=DefaultBotProperties(parse_mode=ParseMode.HTML)
+            )
+        except TokenValidationError:
+            logger.error("❌ Invalid bot token. Please check your configuration.")
+            bot = None
+    return bot, dp
 
 def _init_payments_routes():
+    from modules import webapi
+    from modules.payments import YOOKASSA_NETWORKS, yookassa_webhook
+
     logger.info("[init] Initializing payment gateways...")
     payments = [
         # Telegram stars no need webhook
-        (config.payments.yookassa, yookassa_webhook),
+        (config.payments.yookassa, yookassa_webhook, YOOKASSA_NETWORKS),
     ]
     for payment in payments:
         if payment[0].enabled:
-            webapi.add_payment(payment[0].webhook_path, payment[1])
+            networks = payment[0].allowed_ips if payment[0].allowed_ips is not None else payment[2]
+            webapi.add_payment(payment[0].webhook_path, payment[1], networks)
         else:
             webapi.disabled_payment(payment[0].webhook_path)
 
+def _init_settlement(db_manager):
+    from database import SettlementBatcher
+
+    settlement = SettlementBatcher(
+        db_manager,
+        max_batch=config.payments.settlement.batch_size,
+        max_delay=config.payments.settlement.max_delay_ms / 1000,
+    )
+    settlement.start()
+    return settlement
+
+def _init_archiver(db_manager):
+    if config.payments.archive.horizon_days <= 0:
+        return None
+    from database import Archiver
+
+    archiver = Archiver(
+        db_manager,
+        horizon_days=config.payments.archive.horizon_days,
+        batch_size=config.payments.archive.batch_size,
+    )
+    archiver.start(config.payments.archive.interval)
+    return archiver
+
+async def _init_remnawave():
+    if not config.remnawave.enabled:
+        return None
+    from modules.remnawave import RemnawaveClient
+
+    logger.info("[init] Initializing Remnawave client...")
+    client = RemnawaveClient.from_config(config.remnawave)
+    await client.start()
+    return client
+
 def _init_http():
-    logger.info("[init] Initializing HTTP server...")
-    http_server = HTTPServer(host="0.0.0.0", port=config.webhooks.port)
-    webapi.register_webapi(http_server)
-    if config.webapi.fronted.serve:
-        http_server.serve_static(
-            path_prefix="/",
-            directory=Path("data/frontend/src"),
-            show_index=False
-        )
+    with timeline.phase("http"):
+        from modules import HTTPServer, webapi
+        from modules.lifecycle import lifecycle
+
+        _init_payments_routes()
+        logger.info("[init] Initializing HTTP server...")
+        http_server = HTTPServer(host="0.0.0.0", port=config.webhooks.port)
+        http_server.app.middlewares.append(lifecycle.http_middleware)
+        webapi.register_webapi(http_server)
+        if config.webapi.fronted.serve:
+            http_server.serve_static(
+                path_prefix="/",
+                directory=Path("data/frontend/src"),
+                show_index=False
+            )
     return http_server
 
+async def _startup(*, create_tables: bool = True, http: bool = True):
+    """Импорты и сборка бота и HTTP идут по очереди в главном потоке, параллельно - только ввод-вывод.
+
+    Графы импортов ``bot``, ``webapi`` и ``database`` пересекаются: первый импорт одних и тех же
+    модулей из разных потоков может упасть с ``ImportError: deadlock detected`` или отдать
+    недоинициализированный модуль, а выиграть на нём из-за GIL почти нечего. Поэтому в потоке
+    только чтение локалей (модули уже загружены), а подключение и миграции БД ждут в loop.
+    """
+    i18n_loading = asyncio.ensure_future(asyncio.to_thread(_init_i18n))
+    bot, dp = _init_bot()
+    http_server = _init_http() if http else None
+    db_manager, _ = await asyncio.gather(_init_database(create_tables), i18n_loading)
+    if bot is not None:
+        _start_db_watchers(db_manager)
+    return db_manager, bot, dp, http_server
+
+def _init_cluster():
+    if config.cluster.workers <= 0:
+        return None
+    from modules.cluster import Supervisor
+
+    logger.info(f"[init] Cluster mode: {config.cluster.workers} worker(s)")
+    return Supervisor(
+        config.cluster.workers,
+        run_worker,
+        config.cluster.socket_dir,
+        queue_size=config.cluster.queue_size,
+        restart_max=config.cluster.restart_max,
+    )
+
+async def _poll_cluster(supervisor, bot, dp) -> None:
+    await supervisor.start()
+    poller = asyncio.create_task(supervisor.poll(bot, dp.resolve_used_update_types()))
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, poller.cancel)
+    with suppress(asyncio.CancelledError):
+        await poller
+
 async def main() -> None:
     """Main application entry point."""
     logger.info("Starting Rodnulya Bot...")
 
-    db_manager = await _init_database()
-
-    if (bot := _init_bot()) is None:
+    # В кластерном режиме HTTP (вебхуки платежей, webapi) обслуживает только фронт
+    db_manager, bot, dp, http_server = await _startup()
+    if bot is None:
+        await db_manager.dispose()
         return
 
-    _init_payments_routes()
-    http_server = _init_http()
-    await http_server.start()
+    from bot import scheduler
+    from database import banned_users, plan_catalog
+    from modules.lifecycle import lifecycle
+    from modules.metrics import loop_monitor, memory_monitor
+
+    settlement = _init_settlement(db_manager)
+    archiver = _init_archiver(db_manager)
+    remnawave = await _init_remnawave()
+    supervisor = _init_cluster()
 
     storage['db_manager'] = db_manager
+    storage['settlement'] = settlement
+    dp.storage.bind(db_manager)
+    storage['fsm_storage'] = dp.storage
+    storage['remnawave'] = remnawave
     storage['http_server'] = http_server
+    storage['supervisor'] = supervisor
+    storage['scheduler'] = scheduler
     storage['bot'] = bot
+    loop_monitor.start()
+    memory_monitor.start(config.metrics.memory_interval)
+
+    # Шаги остановки выполняются после того, как дождались апдейтов и вебхуков в полёте.
+    # Пулы БД освобождаются последними
+    if supervisor is not None:
+        lifecycle.on_shutdown("workers", lambda: supervisor.stop(config.bot.drain_timeout))
+    lifecycle.on_shutdown("settlement", settlement.stop)
+    if archiver is not None:
+        lifecycle.on_shutdown("archive", archiver.stop)
+    lifecycle.on_shutdown("http", http_server.stop)
+    lifecycle.on_shutdown("metrics", loop_monitor.stop)
+    lifecycle.on_shutdown("memory", memory_monitor.stop)
+    lifecycle.on_shutdown("plans", plan_catalog.stop)
+    lifecycle.on_shutdown("bans", banned_users.stop)
+    if remnawave is not None:
+        lifecycle.on_shutdown("remnawave", remnawave.close)
+    if config.payments.yookassa.enabled:
+        from modules.payments import yookassa_api
+        lifecycle.on_shutdown("yookassa", yookassa_api.close)
+    lifecycle.on_shutdown("bot", bot.session.close)
+    lifecycle.on_shutdown("fsm", dp.storage.close)
+    lifecycle.on_shutdown("database", db_manager.dispose)
+
+    await http_server.start()
+    timeline.log_report()
 
     try:
         # Start bot polling
         logger.info("[init] Bot started successfully")
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if supervisor is not None:
+            await _poll_cluster(supervisor, bot, dp)
+        else:
+            # Не больше max_pending принятых апдейтов: дальше aiogram не забирает новые из Telegram
+            await dp.start_polling(
+                bot, allowed_updates=dp.resolve_used_update_types(),
+                tasks_concurrency_limit=config.bot.scheduler.max_pending,
+            )
     finally:
-        # Cleanup
-        await http_server.stop()
-        await db_manager.dispose()
-        await bot.session.close()
+        # Cleanup: polling уже остановлен, закрываем приём HTTP и ждём работ в полёте
+        await http_server.stop_accepting()
+        await lifecycle.shutdown(config.bot.drain_timeout)
         logger.info("[init] Bot stopped")
 
 
+async def worker(index: int, socket_path: str) -> None:
+    """Entry point of a cluster worker process: handles updates of its shard."""
+    logger.info(f"Starting worker {index}...")
+
+    # Таблицы создаёт фронт
+    db_manager, bot, dp, _ = await _startup(create_tables=False, http=False)
+    if bot is None:
+        await db_manager.dispose()
+        return
+
+    from database import banned_users, plan_catalog
+    from modules.cluster import serve_updates
+    from modules.lifecycle import lifecycle
+
+    remnawave = await _init_remnawave()
+    timeline.log_report()
+
+    storage['db_manager'] = db_manager
+    storage['remnawave'] = remnawave
+    storage['bot'] = bot
+    dp.storage.bind(db_manager)
+
+    lifecycle.on_shutdown("plans", plan_catalog.stop)
+    lifecycle.on_shutdown("bans", banned_users.stop)
+    if remnawave is not None:
+        lifecycle.on_shutdown("remnawave", remnawave.close)
+    lifecycle.on_shutdown("bot", bot.session.close)
+    lifecycle.on_shutdown("fsm", dp.storage.close)
+    lifecycle.on_shutdown("database", db_manager.dispose)
+
+    try:
+        await serve_updates(index, socket_path, bot, dp, config.bot.scheduler.max_pending)
+    finally:
+        await lifecycle.shutdown(config.bot.drain_timeout)
+        logger.info(f"[init] Worker {index} stopped")
+
+def run_worker(index: int, socket_path: str) -> None:
+    run(worker(index, socket_path), use_uvloop=config.bot.uvloop)
+
+
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        run(main(), use_uvloop=config.bot.uvloop)
     except KeyboardInterrupt:
         logger.info("[init] Bot stopped by user")
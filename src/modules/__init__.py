@@ -1,8 +1,23 @@
-from .http import HTTPServer
+# Подмодули грузятся лениво: `import modules.config` не должен тянуть aiohttp и shared
+import importlib
+
+_lazy = {
+    'HTTPServer': ('.http', 'HTTPServer'),
+    'webapi': ('.webapi', None),
+    'payments': ('.payments', None),
+}
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attr = _lazy[name]
+    module = importlib.import_module(module_name, __name__)
+    value = getattr(module, attr) if attr else module
+    globals()[name] = value
+    return value
+
 #from .config import Config, EnvConfig
 #from . import logger
-from . import webapi
-from . import payments
 #from .phraseEngine import PhraseEngine
 __all__ = [
     'HTTPServer',
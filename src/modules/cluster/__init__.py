@@ -0,0 +1,6 @@
+"""Multi-process cluster package."""
+from .ipc import shard_for, update_user_id
+from .supervisor import Supervisor
+from .worker import serve_updates
+
+__all__ = ["Supervisor", "serve_updates", "shard_for", "update_user_id"]
@@ -0,0 +1,62 @@
+"""Простой протокол между фронтом и воркерами: кадры ``<u32 длина><orjson>`` по unix-сокету."""
+import asyncio
+import struct
+import zlib
+from typing import Any, Optional
+
+import orjson
+
+_HEADER = struct.Struct("!I")
+MAX_FRAME = 16 * 1024 * 1024
+
+# Поля апдейта, в которых лежит объект с from.id. Порядок как в db_session_middleware
+_USER_FIELDS = (
+    "message",
+    "edited_message",
+    "callback_query",
+    "my_chat_member",
+    "chat_member",
+    "inline_query",
+    "chosen_inline_result",
+    "shipping_query",
+    "pre_checkout_query",
+)
+
+
+async def write_frame(writer: asyncio.StreamWriter, payload: Any) -> None:
+    data = orjson.dumps(payload)
+    writer.write(_HEADER.pack(len(data)) + data)
+    await writer.drain()
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Any]:
+    """Прочитать один кадр. ``None`` - соединение закрыто."""
+    try:
+        header = await reader.readexactly(_HEADER.size)
+        (size,) = _HEADER.unpack(header)
+        if size > MAX_FRAME:
+            raise ValueError(f"Frame too large: {size}")
+        return orjson.loads(await reader.readexactly(size))
+    except asyncio.IncompleteReadError:
+        return None
+
+
+def update_user_id(update: dict) -> Optional[int]:
+    """telegram_id отправителя из сырого апдейта."""
+    for name in _USER_FIELDS:
+        if (obj := update.get(name)) is not None:
+            if (sender := obj.get("from")) is not None:
+                return sender.get("id")
+            # апдейты из каналов - шардируем по чату
+            if (chat := obj.get("chat")) is not None:
+                return chat.get("id")
+    return None
+
+
+def shard_for(update: dict, shards: int) -> int:
+    """Номер воркера для апдейта. Все апдейты одного пользователя попадают в один воркер."""
+    user_id = update_user_id(update)
+    if user_id is None:
+        user_id = update.get("update_id", 0)
+    # crc32, а не hash(): стабилен между процессами и перезапусками
+    return zlib.crc32(str(user_id).encode()) % shards
@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import time
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from typing import Callable, Optional
+
+from loguru import logger
+
+from .ipc import read_frame, shard_for, write_frame
+
+log = logger.bind(module="cluster", prefix="front")
+
+
+class _WorkerSlot:
+    """Процесс воркера, его сокет и очередь апдейтов на отправку."""
+
+    def __init__(self, index: int, socket_path: Path, queue_size: int):
+        self.index = index
+        self.socket_path = socket_path
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(queue_size)
+        self.process: Optional[BaseProcess] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.connected = asyncio.Event()
+        self.server: Optional[asyncio.AbstractServer] = None
+        self.sender: Optional[asyncio.Task] = None
+        self.started_at = 0.0
+        self.crashes = 0  # падений подряд, для бэкоффа перезапуска
+        self.restart_at: Optional[float] = None
+
+
+class Supervisor:
+    """Фронт кластера: запускает N процессов-воркеров и раздаёт им апдейты.
+
+    Апдейты шардируются по telegram_id (см. ``shard_for``), у каждого воркера один
+    сокет и одна очередь с единственным отправителем, поэтому порядок апдейтов
+    одного пользователя сохраняется. Упавший воркер перезапускается с экспоненциальной
+    задержкой (``restart_delay`` * 2^падений подряд, не больше ``restart_max``; счётчик
+    сбрасывается, если воркер проработал ``stable_after`` секунд), накопившиеся в очереди
+    апдейты уходят в новый процесс.
+
+    Доставка - не более одного раза, как и у обычного polling aiogram: offset getUpdates
+    сдвигается, как только апдейт поставлен в очередь воркера. Апдейты, которые лежали в
+    очередях или уже ушли воркеру, но не были обработаны, теряются при падении фронта
+    или воркера; Telegram их повторно не пришлёт. Штатная остановка (``stop``) сначала
+    отправляет очереди и ждёт, пока воркеры доработают.
+    """
+
+    def __init__(
+            self,
+            workers: int,
+            target: Callable[[int, str], None],
+            socket_dir: Path,
+            *,
+            queue_size: int = 10_000,
+            restart_delay: float = 1.0,
+            restart_max: float = 60.0,
+            stable_after: float = 60.0,
+    ):
+        self.target = target
+        self.socket_dir = Path(socket_dir)
+        self.restart_delay = restart_delay
+        self.restart_max = restart_max
+        self.stable_after = stable_after
+        self._ctx = multiprocessing.get_context("spawn")
+        self._slots = [
+            _WorkerSlot(i, self.socket_dir / f"worker-{i}.sock", queue_size)
+            for i in range(workers)
+        ]
+        self._monitor: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    @property
+    def workers(self) -> int:
+        return len(self._slots)
+
+    def queue_depths(self) -> dict[int, int]:
+        return {slot.index: slot.queue.qsize() for slot in self._slots}
+
+    # -- lifecycle --
+
+    async def start(self) -> None:
+        self.socket_dir.mkdir(parents=True, exist_ok=True)
+        for slot in self._slots:
+            slot.socket_path.unlink(missing_ok=True)
+            slot.server = await asyncio.start_unix_server(
+                lambda r, w, s=slot: self._on_connect(s, r, w), path=str(slot.socket_path)
+            )
+            slot.sender = asyncio.create_task(self._send_loop(slot), name=f"cluster-send-{slot.index}")
+            self._spawn(slot)
+        self._monitor = asyncio.create_task(self._monitor_loop(), name="cluster-monitor")
+        log.info(f"[Cluster] Started {self.workers} worker(s)")
+
+    async def flush(self, timeout: float) -> int:
+        """Дождаться отправки накопленных апдейтов воркерам. Возвращает, сколько не успело уйти."""
+        try:
+            await asyncio.wait_for(asyncio.gather(*(slot.queue.join() for slot in self._slots)), timeout)
+        except asyncio.TimeoutError:
+            pass
+        left = sum(slot.queue.qsize() for slot in self._slots)
+        if left:
+            log.warning(f"[Cluster] {left} update(s) were not delivered to workers")
+        return left
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Остановить воркеров. ``timeout`` - общий бюджет на доставку очередей и выход всех
+        процессов: воркеры дорабатывают параллельно, так что остановка укладывается в
+        ``stop_grace_period`` независимо от их числа."""
+        deadline = time.monotonic() + timeout
+        self._stopping = True
+        if self._monitor is not None:
+            self._monitor.cancel()
+        await self.flush(timeout)
+        for slot in self._slots:
+            if slot.sender is not None:
+                slot.sender.cancel()
+            if slot.writer is not None:
+                # EOF на сокете - сигнал воркеру доработать текущее и выйти
+                slot.writer.close()
+            if slot.server is not None:
+                slot.server.close()
+
+        remaining = max(deadline - time.monotonic(), 0.0)
+        await asyncio.gather(*(self._join(slot, remaining) for slot in self._slots if slot.process is not None))
+        log.info("[Cluster] All workers stopped")
+
+    async def _join(self, slot: _WorkerSlot, timeout: float) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, slot.process.join, timeout)
+        if slot.process.is_alive():
+            log.warning(f"[Cluster] Worker {slot.index} did not exit in {timeout:.1f}s, terminating")
+            slot.process.terminate()
+            await loop.run_in_executor(None, slot.process.join, 1.0)
+        slot.socket_path.unlink(missing_ok=True)
+
+    def _spawn(self, slot: _WorkerSlot) -> None:
+        slot.process = self._ctx.Process(
+            target=self.target,
+            args=(slot.index, str(slot.socket_path)),
+            name=f"rodnulya-worker-{slot.index}",
+            daemon=False,
+        )
+        slot.process.start()
+        slot.started_at = time.monotonic()
+        slot.restart_at = None
+        log.info(f"[Cluster] Worker {slot.index} spawned (pid {slot.process.pid})")
+
+    def _restart_backoff(self, slot: _WorkerSlot) -> float:
+        now = time.monotonic()
+        if now - slot.started_at >= self.stable_after:
+            slot.crashes = 0
+        delay = min(self.restart_max, self.restart_delay * 2 ** slot.crashes)
+        slot.crashes += 1
+        return delay
+
+    async def _monitor_loop(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(min(self.restart_delay, 1.0))
+            now = time.monotonic()
+            for slot in self._slots:
+                if self._stopping or slot.process is None or slot.process.is_alive():
+                    continue
+                if slot.restart_at is None:
+                    delay = self._restart_backoff(slot)
+                    slot.restart_at = now + delay
+                    log.error(f"[Cluster] Worker {slot.index} exited with code {slot.process.exitcode}, "
+                              f"restarting in {delay:.1f}s")
+                elif now >= slot.restart_at:
+                    self._spawn(slot)
+
+    # -- IPC --
+
+    async def _on_connect(self, slot: _WorkerSlot, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        if slot.writer is not None:
+            slot.writer.close()
+        slot.writer = writer
+        slot.connected.set()
+        log.debug(f"[Cluster] Worker {slot.index} connected")
+        # Воркер ничего не шлёт; EOF означает, что процесс ушёл
+        await read_frame(reader)
+        if slot.writer is writer:
+            slot.writer = None
+            slot.connected.clear()
+            log.debug(f"[Cluster] Worker {slot.index} disconnected")
+
+    async def _send_loop(self, slot: _WorkerSlot) -> None:
+        pending: Optional[dict] = None
+        while True:
+            if pending is None:
+                pending = await slot.queue.get()
+            await slot.connected.wait()
+            if slot.writer is None:
+                # воркер отвалился, пока ждали - повторим после переподключения
+                slot.connected.clear()
+                continue
+            try:
+                await write_frame(slot.writer, pending)
+                pending = None
+                slot.queue.task_done()
+            except ConnectionError:
+                slot.connected.clear()
+
+    async def dispatch(self, update: dict) -> None:
+        """Отдать сырой апдейт воркеру его пользователя."""
+        await self._slots[shard_for(update, self.workers)].queue.put(update)
+
+    async def poll(self, bot, allowed_updates: list[str], *, timeout: int = 30) -> None:
+        """Long polling в фронте: получаем апдейты и раздаём их воркерам без обработки.
+
+        Останавливается отменой задачи; апдейты, уже отданные в ``dispatch``, остаются в очередях.
+        Offset подтверждается сразу после постановки в очередь - доставка не более одного раза.
+        """
+        offset: Optional[int] = None
+        log.info("[Cluster] Polling started")
+        while not self._stopping:
+            try:
+                updates = await bot.get_updates(
+                    offset=offset, timeout=timeout, allowed_updates=allowed_updates,
+                    request_timeout=timeout + 10,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as ex:
+                log.warning(f"[Cluster] get_updates failed: {ex!r}")
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                await self.dispatch(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+                offset = update.update_id + 1
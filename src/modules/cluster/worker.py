@@ -0,0 +1,64 @@
+import asyncio
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from loguru import logger
+
+from modules.lifecycle import lifecycle
+from .ipc import read_frame
+
+log = logger.bind(module="cluster", prefix="worker")
+
+
+async def serve_updates(index: int, socket_path: str, bot: Bot, dp: Dispatcher, max_pending: int = 1000) -> None:
+    """Получать апдейты от фронта и обрабатывать их отдельными задачами.
+
+    Порядок внутри пользователя и общий лимит параллельности обеспечивает планировщик
+    диспетчера (``bot.scheduler``). Если принятых и ещё не обработанных апдейтов
+    ``max_pending``, чтение сокета приостанавливается - очередь копится у фронта.
+
+    Возвращается, когда фронт закрыл сокет или процессу пришёл SIGTERM. Обработку
+    принятых апдейтов дожидается ``lifecycle.shutdown`` (с дедлайном остановки): задача
+    апдейта учитывается в ``lifecycle`` в момент создания, а не когда дойдёт до планировщика.
+    """
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    log.info(f"[Cluster] Worker {index} connected to {socket_path}")
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    loop.add_signal_handler(signal.SIGTERM, stop.set)
+    # Ctrl+C в терминале получают все процессы группы; воркер останавливает фронт через EOF
+    loop.add_signal_handler(signal.SIGINT, lambda: None)
+    stopper = asyncio.create_task(stop.wait())
+    pending: set[asyncio.Task] = set()
+
+    async def handle(update: Update) -> None:
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as ex:
+            log.exception(f"[Cluster] Worker {index} failed on update {update.update_id}: {ex}")
+
+    # По сигналу перестаём читать новые кадры, но принятые апдейты дорабатываем
+    while True:
+        if len(pending) >= max_pending:
+            await asyncio.wait(pending | {stopper}, return_when=asyncio.FIRST_COMPLETED)
+            if stopper.done():
+                break
+            continue
+        read = asyncio.create_task(read_frame(reader))
+        await asyncio.wait({read, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        if not read.done():
+            read.cancel()
+            break
+        if (data := read.result()) is None:
+            break
+        update = Update.model_validate(data, context={"bot": bot})
+        task = asyncio.create_task(handle(update))
+        lifecycle.adopt("update", task)
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    stopper.cancel()
+    writer.close()
+    log.info(f"[Cluster] Worker {index} stopped receiving updates, {len(pending)} in progress")
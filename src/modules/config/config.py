@@ -1,5 +1,6 @@
+import os
 from pathlib import Path
-from typing import Literal
+from typing import Literal, Optional, Union
 
 from loguru import logger
 from pydantic import BaseModel, HttpUrl, PositiveInt
@@ -8,10 +9,39 @@ from pydantic_settings import BaseSettings
 log = logger.bind(module="config", prefix="misc")
 
  # == == == config.bot == == == #
+class _FsmConfig(BaseModel):
+    ttl: PositiveInt = 86400  # Через сколько секунд без изменений состояние сценария удаляется
+    cache_size: PositiveInt = 50000  # Сколько состояний держать в памяти
+    flush_ms: PositiveInt = 500  # Окно, за которое изменения копятся перед записью в БД
+
+class _BotSessionConfig(BaseModel):
+    limit: PositiveInt = 100  # Соединений к Bot API одновременно
+    limit_per_host: int = 0  # 0 - без отдельного лимита на хост
+    keepalive: PositiveInt = 60  # Сколько держать простаивающее соединение, сек
+    dns_ttl: int = 300  # Кэш DNS, сек (0 - не кэшировать)
+    timeout: PositiveInt = 60  # Таймаут запроса по умолчанию, сек
+    method_timeouts: dict[str, PositiveInt] = {}  # Таймауты по методам: {"sendMessage": 10}
+
+class _SchedulerConfig(BaseModel):
+    concurrency: PositiveInt = 64  # Сколько апдейтов обрабатывать одновременно (апдейты одного пользователя - по очереди)
+    max_pending: PositiveInt = 1000  # Сколько принятых апдейтов держать (в очереди и в работе), прежде чем перестать забирать новые
+
+class _ReplicasConfig(BaseModel):
+    check_interval: PositiveInt = 5  # Как часто проверять реплики чтения, сек
+    check_timeout_ms: PositiveInt = 1000  # Дольше - реплика выводится из ротации
+
 class _BotConfig(BaseModel):
     token: str
     admins: list[int]
     database: str
+    plans_refresh: int = 60
+    bans_refresh: int = 60  # Как часто сверять реестр банов с БД, сек (0 - только баны из этого процесса)
+    drain_timeout: PositiveInt = 25
+    fsm: _FsmConfig = _FsmConfig()
+    replicas: _ReplicasConfig = _ReplicasConfig()
+    session: _BotSessionConfig = _BotSessionConfig()
+    scheduler: _SchedulerConfig = _SchedulerConfig()
+    uvloop: bool = False  # Запускать на uvloop (нужен pip install uvloop)
 
 # == == == config.i18n == == == #
 
@@ -19,6 +49,7 @@ class _I18nConfig(BaseModel):
     enabled: bool
     directory: Path
     default: str
+    fallbacks: dict[str, Union[str, list[str]]] = {}  # Цепочки запасных локалей; "*" - для остальных
 
 # == == == config.webhooks == == == #
 
@@ -43,9 +74,49 @@ class _YooKassaConfig(BaseModel):
     max_amount: int
 
     webhook_path: str
+    api_url: str = "https://api.yookassa.ru/v3"  # Откуда перечитывать платёж при уведомлении
+    allowed_ips: Optional[list[str]] = None  # Откуда принимать вебхуки; None - опубликованные сети YooKassa, [] - откуда угодно
+
+class _SettlementConfig(BaseModel):
+    batch_size: PositiveInt = 200
+    max_delay_ms: PositiveInt = 50
+
+class _ArchiveConfig(BaseModel):
+    horizon_days: int = 180  # Завершённые платежи и транзакции старше - в архивные таблицы (0 - не архивировать)
+    batch_size: PositiveInt = 500  # Строк за одну транзакцию
+    interval: PositiveInt = 3600  # Как часто запускать проход, сек
 
 class _PaymentsConfig(BaseModel):
     yookassa: _YooKassaConfig
+    settlement: _SettlementConfig = _SettlementConfig()
+    archive: _ArchiveConfig = _ArchiveConfig()
+
+# == == == config.remnawave == == == #
+
+class _RemnawaveConfig(BaseModel):
+    enabled: bool = False
+    url: str = "http://127.0.0.1:3000"
+    token: str = ""
+
+    max_connections: PositiveInt = 50
+    concurrency: PositiveInt = 20
+    keepalive: PositiveInt = 30
+    timeout: PositiveInt = 10
+
+    retries: int = 3
+    backoff_base: float = 0.2
+    backoff_max: float = 5.0
+
+    breaker_threshold: PositiveInt = 5
+    breaker_cooldown: PositiveInt = 30
+
+# == == == config.cluster == == == #
+
+class _ClusterConfig(BaseModel):
+    workers: int = 0
+    socket_dir: Path = Path("data/run")
+    queue_size: PositiveInt = 10000
+    restart_max: PositiveInt = 60  # Потолок задержки перезапуска падающего воркера, сек
 
 # == == == config.webapi == == == #
 
@@ -63,14 +134,43 @@ class _WebApiCors(BaseModel):
 class _WebApiSecurity(BaseModel):
     token_ttl: PositiveInt = 900  # noqa
     allowed_ips: list[str] = []
+    trusted_proxies: list[str] = []  # Прокси, которым верим в X-Forwarded-For
+    admin_token: str = ""  # Сервисный bearer-токен с правами админа; пустой - выключен
+    init_data_ttl: PositiveInt = 86400  # Максимальный возраст initData mini-app
     cors: _WebApiCors
 
 
+class _WebApiHealth(BaseModel):
+    # Пороги /api/health?deep=1: при превышении любого ответ 503
+    max_loop_lag_ms: PositiveInt = 250  # p99 задержки event loop
+    max_db_ms: PositiveInt = 500  # Отклик SELECT 1
+    db_timeout_ms: PositiveInt = 2000  # Дольше - БД считается недоступной
+    max_pool_usage: float = 0.9  # Доля занятых соединений пула
+    max_queue: PositiveInt = 1000  # Глубина любой внутренней очереди
+    allowed_ips: list[str] = []  # Откуда пускать на /api/health; пустой - откуда угодно (security.allowed_ips не действует)
+    details_ips: list[str] = []  # Кому без токена админа отдавать замеры ?deep=1 (остальным - только healthy и failures)
+
+
 class _WebApiConfig(BaseModel):
     enabled: bool
     jwt_secret: str
     fronted: _WebApiFronted
     security: _WebApiSecurity
+    health: _WebApiHealth = _WebApiHealth()
+
+# == == == config.logging == == == #
+
+class _LoggingConfig(BaseModel):
+    # Доля успешных записей, которые попадают в лог; ошибки и медленные - всегда
+    access_sample: float = 1.0  # HTTP-запросы
+    update_sample: float = 1.0  # Апдейты бота
+    slow_ms: PositiveInt = 1000  # Дольше - пишется всегда
+
+# == == == config.metrics == == == #
+
+class _MetricsConfig(BaseModel):
+    memory_interval: int = 60  # Как часто записывать RSS и счётчики GC, сек (0 - не записывать)
+    trace_frames: PositiveInt = 10  # Глубина стека tracemalloc по умолчанию (включается из админки)
 
 # == == == config == == == #
 
@@ -79,7 +179,11 @@ class Config(BaseModel):
     i18n: _I18nConfig
     webhooks: _WebhooksConfig
     payments: _PaymentsConfig
+    remnawave: _RemnawaveConfig = _RemnawaveConfig()
+    cluster: _ClusterConfig = _ClusterConfig()
     webapi: _WebApiConfig
+    logging: _LoggingConfig = _LoggingConfig()
+    metrics: _MetricsConfig = _MetricsConfig()
 
     @classmethod
     def from_file(cls, file):
@@ -88,14 +192,48 @@ class Config(BaseModel):
         :param file: Path to the configuration file.
         :return: Config object.
         """
-        import json5
         log.debug(f"[Config] Loading configuration from file: {file}")
-        with open(file, 'r', encoding='utf-8') as f:
-            data = json5.load(f)
+        data = _load_json5_cached(Path(file))
         config = cls(**data)
         log.success("[Config] Configuration loaded successfully.")
         return config
 
+
+def _load_json5_cached(file: Path) -> dict:
+    """
+    Разбор JSON5 (чистый Python) - заметная часть холодного старта, поэтому результат
+    кэшируется рядом с файлом в JSON и перечитывается через orjson, пока файл не изменился.
+    В кэше те же секреты, что и в конфиге (токен бота, ключи), поэтому он доступен только
+    владельцу (0600) независимо от umask.
+    """
+    import orjson
+
+    stat = file.stat()
+    key = [stat.st_mtime_ns, stat.st_size]
+    cache = file.with_name(f".{file.name}.cache")
+    try:
+        cached = orjson.loads(cache.read_bytes())
+        if cached["key"] == key:
+            if cache.stat().st_mode & 0o077:
+                os.chmod(cache, 0o600)  # кэш от старых версий, созданный с umask
+            return cached["data"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    import json5
+    with open(file, 'r', encoding='utf-8') as f:
+        data = json5.load(f)
+    tmp = cache.with_name(f"{cache.name}.{os.getpid()}")
+    try:
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(orjson.dumps({"key": key, "data": data}))
+        os.replace(tmp, cache)
+    except OSError as e:
+        tmp.unlink(missing_ok=True)
+        log.debug(f"[Config] Can't write config cache {cache}: {e}")
+    return data
+
 class EnvConfig(BaseSettings):
     BOT_CONFIG_PATH: Path
     BOT_DB_MODE: Literal['sqlite', 'postgres'] = 'sqlite'
@@ -105,11 +243,13 @@ class EnvConfig(BaseSettings):
     POSTGRES_DB: str = 'rodnulya'
     POSTGRES_HOST: str = 'localhost'
     POSTGRES_PORT: int = 5432
+    DB_REPLICA_URLS: str = ''  # Реплики чтения через запятую (полные URL SQLAlchemy)
 
     LOG_DIR: Path = Path('data/logs/')
     LOG_LEVEL: Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"] = "INFO"
     LOG_FILE: str = "info.log"
     LOG_DEBUG_FILE: str = "debug.log"
+    LOG_FORMAT: Literal["text", "json"] = "text"  # json - одна строка JSON на запись (для сборщиков логов)
 
     def sql_uri(self):
         match self.BOT_DB_MODE:
@@ -120,6 +260,9 @@ class EnvConfig(BaseSettings):
             case _:
                 raise ValueError(f"Unsupported BOT_DB_MODE: {self.BOT_DB_MODE}")
 
+    def replica_uris(self) -> list[str]:
+        return [url.strip() for url in self.DB_REPLICA_URLS.split(",") if url.strip()]
+
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
@@ -3,10 +3,20 @@ from enum import StrEnum, IntEnum
 
 class ApiErrors(StrEnum):
     INTERNAL_SERVER_ERROR = "Internal server error"
+    UNAUTHORIZED = "Authorization required"
+    FORBIDDEN = "Access denied"
+    INVALID_PARAMETER = "Invalid query parameter"
+    INVALID_CURSOR = "Invalid pagination cursor"
+    TRACING_DISABLED = "Memory tracing is not running"
 
 
 class ApiErrorCodes(IntEnum):
     INTERNAL_SERVER_ERROR = 1
+    UNAUTHORIZED = 2
+    FORBIDDEN = 3
+    INVALID_PARAMETER = 4
+    INVALID_CURSOR = 5
+    TRACING_DISABLED = 6
 
 def _get_code(name: str) -> int:
     try:
@@ -0,0 +1,149 @@
+"""Фильтр входящих запросов по IP: белые списки CIDR для групп маршрутов.
+
+Списки сетей компилируются при старте в префиксное дерево (отдельно IPv4 и IPv6):
+узел - пара потомков по очередному биту адреса, ``True`` вместо узла - «вся
+подсеть разрешена». Проверка адреса идёт по его битам от старшего и
+останавливается на первой разрешённой подсети, то есть стоит O(длины префикса)
+независимо от количества диапазонов. Вложенные диапазоны схлопываются при сборке.
+
+Группа маршрутов - точный путь или префикс пути со своим списком сетей; для
+запроса берётся первая подходящая группа (точные пути раньше префиксов). Пути вне
+групп не проверяются.
+
+Если запрос пришёл от доверенного прокси (``trusted_proxies``), адрес клиента
+берётся из ``X-Forwarded-For``: цепочка читается справа налево, доверенные хопы
+пропускаются, первый недоверенный адрес и есть клиент.
+"""
+from __future__ import annotations
+
+import ipaddress
+from typing import Iterable, Optional, Union
+
+from aiohttp import hdrs, web
+from loguru import logger
+
+from .enum import ApiErrors
+from .utils import build_error
+
+log = logger.bind(module="http", prefix="ipfilter")
+
+IPAddress = Union[ipaddress.IPv4Address, ipaddress.IPv6Address]
+
+
+class NetworkSet:
+    """Множество IPv4/IPv6 сетей с проверкой принадлежности адреса за O(длины префикса)."""
+
+    def __init__(self, networks: Iterable[str] = ()):
+        self._roots = {4: [None, None], 6: [None, None]}
+        self.size = 0
+        for network in networks:
+            self.add(network)
+
+    def add(self, network: str) -> None:
+        """Добавить сеть (``10.0.0.0/8``, ``2a02:5180::/32``) или одиночный адрес."""
+        net = ipaddress.ip_network(network.strip(), strict=False)
+        if isinstance(net, ipaddress.IPv6Network) and net.prefixlen >= 96 and net.network_address.ipv4_mapped:
+            net = ipaddress.IPv4Network((net.network_address.ipv4_mapped, net.prefixlen - 96))
+        root = self._roots[net.version]
+        self.size += 1
+        if net.prefixlen == 0:
+            root[0] = root[1] = True
+            return
+
+        value, width = int(net.network_address), net.max_prefixlen
+        node = root
+        for i in range(net.prefixlen - 1):
+            bit = (value >> (width - 1 - i)) & 1
+            child = node[bit]
+            if child is True:
+                return  # уже покрыто более широкой сетью
+            if child is None:
+                child = node[bit] = [None, None]
+            node = child
+        node[(value >> (width - net.prefixlen)) & 1] = True
+
+    def __contains__(self, address: IPAddress) -> bool:
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        value, width = int(address), address.max_prefixlen
+        node = self._roots[address.version]
+        for shift in range(width - 1, -1, -1):
+            node = node[(value >> shift) & 1]
+            if node is True:
+                return True
+            if node is None:
+                return False
+        return False
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+
+def parse_ip(value: Optional[str]) -> Optional[IPAddress]:
+    if not value:
+        return None
+    try:
+        return ipaddress.ip_address(value.strip().split("%", 1)[0])
+    except ValueError:
+        return None
+
+
+class IPFilter:
+    """Белые списки по группам маршрутов + разбор адреса клиента за прокси."""
+
+    def __init__(self, trusted_proxies: Iterable[str] = ()):
+        self.trusted = NetworkSet(trusted_proxies)
+        self._exact: dict[str, tuple[str, NetworkSet]] = {}
+        self._prefixes: list[tuple[str, str, NetworkSet]] = []
+
+    def add_group(self, name: str, networks: Iterable[str], *, path: str = None, prefix: str = None) -> None:
+        """Разрешить маршрутам группы только ``networks``. Пустой список - группа без ограничений."""
+        allowed = NetworkSet(networks)
+        if path is not None:
+            self._exact[path] = (name, allowed)
+        else:
+            self._prefixes.append((prefix, name, allowed))
+            # Длинные префиксы проверяются первыми
+            self._prefixes.sort(key=lambda item: len(item[0]), reverse=True)
+        log.info(f"[IPFilter] Group {name!r} ({path or prefix + '*'}): "
+                 f"{allowed.size or 'any'} network(s)")
+
+    def group(self, path: str) -> Optional[tuple[str, NetworkSet]]:
+        group = self._exact.get(path)
+        if group is not None:
+            return group
+        for prefix, name, allowed in self._prefixes:
+            if path.startswith(prefix):
+                return name, allowed
+        return None
+
+    def client_ip(self, request: web.Request) -> Optional[IPAddress]:
+        """Адрес клиента с учётом ``X-Forwarded-For`` от доверенных прокси."""
+        peer = parse_ip(request.remote)
+        if peer is None or not self.trusted or peer not in self.trusted:
+            return peer
+        forwarded = request.headers.getall(hdrs.X_FORWARDED_FOR, ())
+        hops = [hop for header in forwarded for hop in header.split(",")]
+        for hop in reversed(hops):
+            address = parse_ip(hop)
+            if address is None:
+                return None  # подделанная или битая цепочка
+            if address not in self.trusted:
+                return address
+            peer = address
+        return peer
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler):
+        group = self.group(request.path)
+        if group is None:
+            return await handler(request)
+
+        name, allowed = group
+        address = self.client_ip(request)
+        request["client_ip"] = str(address) if address is not None else request.remote
+        if allowed and (address is None or address not in allowed):
+            log.warning(f"[IPFilter] {request.method} {request.path} from {request['client_ip']} "
+                        f"rejected: not in {name!r} allowlist")
+            return build_error(ApiErrors.FORBIDDEN, 403)
+        return await handler(request)
@@ -8,12 +8,17 @@ from typing import Callable, Awaitable, Optional
 from aiohttp import web
 from loguru import logger
 
+from modules.logger import Sampler
+from shared import config
 from .enum import ApiErrors
 from .static_handler import apply_routing_from_json
 from .utils import build_error
 
 Handler = Callable[[web.Request], Awaitable[web.Response]]
 
+_access_log = logger.bind(module="http", prefix="access")
+_access_sampler = Sampler(config.logging.access_sample, config.logging.slow_ms)
+
 @web.middleware
 async def response_middleware(request: web.Request, handler: Handler) -> web.Response:
     """Catch unhandled exceptions and return unified JSON error."""
@@ -37,22 +42,36 @@ async def request_id_middleware(request: web.Request, handler: Handler) -> web.R
 
 @web.middleware
 async def access_log_middleware(request: web.Request, handler: Handler) -> web.Response:
-    """Minimal access log tailored for payment callbacks."""
-    start = asyncio.get_event_loop().time()
+    """Access log: ошибки и медленные запросы - всегда, успешные - с долей ``logging.access_sample``."""
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    status = 500
     try:
         resp = await handler(request)
+        status = resp.status
         return resp
+    except web.HTTPException as ex:
+        status = ex.status
+        raise
+    except asyncio.CancelledError:
+        status = 499  # клиент ушёл, не дождавшись ответа
+        raise
     finally:
-        dur_ms = int((asyncio.get_event_loop().time() - start) * 1000)
-        logger.info(
-            "[HTTP] {method} {path_qs} -> {status} {ms}ms ip={ip} rid={rid}",
-            method=request.method,
-            path_qs=request.path_qs,
-            status=getattr(request, "response", None).status if hasattr(request, "response") else getattr(locals().get('resp', None), 'status', 'unknown'),
-            ms=dur_ms,
-            ip=request.remote,
-            rid=request.get("request_id", "-"),
-        )
+        dur_ms = (loop.time() - start) * 1000
+        if _access_sampler.keep(dur_ms, status >= 400):
+            resource = request.match_info.route.resource
+            auth = request.get("auth") or {}
+            level = "ERROR" if status >= 500 else "WARNING" if dur_ms >= _access_sampler.slow_ms else "INFO"
+            _access_log.bind(
+                request_id=request.get("request_id"),
+                method=request.method,
+                route=resource.canonical if resource is not None else None,
+                status=status,
+                duration_ms=round(dur_ms, 1),
+                ip=request.remote,
+                telegram_id=auth.get("tid"),
+            ).log(level, f"[HTTP] {request.method} {request.path_qs} -> {status} {dur_ms:.0f}ms "
+                         f"ip={request.remote} rid={request.get('request_id', '-')}")
 
 
 class HTTPServer:
@@ -94,9 +113,16 @@ class HTTPServer:
         await self.site.start()
         logger.info(f"[HTTP] HTTP server started on {self.host}:{self.port}")
 
-    async def stop(self) -> None:
+    async def stop_accepting(self) -> None:
+        """Перестать принимать новые соединения; запросы в обработке продолжают работу."""
         if self.site:
             await self.site.stop()
+            self.site = None
+            logger.info("[HTTP] HTTP server stopped accepting connections")
+
+    async def stop(self) -> None:
+        await self.stop_accepting()
         if self.runner:
             await self.runner.cleanup()
+            self.runner = None
         logger.info("[HTTP] HTTP server stopped")
@@ -6,13 +6,13 @@ from .enum import ApiErrors, _get_code
 _headers = {
     'Access-Control-Allow-Origin': config.webapi.security.cors.origin,
     'Access-Control-Allow-Methods': ", ".join(config.webapi.security.cors.methods),
-    'Access-Control-Allow-Headers': 'Content-Type, X-YooKassa-Signature',
+    'Access-Control-Allow-Headers': 'Content-Type, Authorization, X-YooKassa-Signature',
 }
 
 def build_error(message: ApiErrors, status_code=500):
     body = {
         'error': {
-            'code': _get_code(message),
+            'code': _get_code(message.name),
             'message': message.value
         }
     }
@@ -0,0 +1,4 @@
+"""Application lifecycle package."""
+from .manager import LifecycleManager, DrainReport, lifecycle
+
+__all__ = ["LifecycleManager", "DrainReport", "lifecycle"]
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from aiohttp import web
+from loguru import logger
+
+log = logger.bind(module="lifecycle", prefix="shutdown")
+
+
+@dataclass
+class DrainReport:
+    """Что успело завершиться за время остановки, а что пришлось бросить."""
+    drained: dict[str, int] = field(default_factory=dict)
+    abandoned: dict[str, int] = field(default_factory=dict)
+    hooks_failed: list[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def clean(self) -> bool:
+        return not any(self.abandoned.values()) and not self.hooks_failed
+
+
+class LifecycleManager:
+    """Отслеживает обработку апдейтов и HTTP-запросов и аккуратно останавливает приложение.
+
+    Порядок остановки: прекратить приём нового, дождаться работ в полёте (до дедлайна),
+    затем по очереди выполнить зарегистрированные хуки - сброс очередей, закрытие клиентов
+    и только в самом конце освобождение пулов БД.
+    """
+
+    def __init__(self):
+        self.accepting = True
+        self._inflight: dict[str, set[asyncio.Task]] = defaultdict(set)
+        self._hooks: list[tuple[str, Callable[[], Awaitable]]] = []
+
+    def in_flight(self) -> dict[str, int]:
+        return {kind: len(tasks) for kind, tasks in self._inflight.items()}
+
+    @asynccontextmanager
+    async def track(self, kind: str):
+        """Пометить текущую задачу как работу в полёте вида ``kind``. Вложенный вызов ничего не меняет."""
+        task = asyncio.current_task()
+        tasks = self._inflight[kind]
+        if task in tasks:
+            yield
+            return
+        tasks.add(task)
+        try:
+            yield
+        finally:
+            tasks.discard(task)
+
+    def adopt(self, kind: str, task: asyncio.Task) -> None:
+        """Учесть задачу как работу в полёте сразу при создании, ещё до её первого шага."""
+        tasks = self._inflight[kind]
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    def on_shutdown(self, name: str, callback: Callable[[], Awaitable]) -> None:
+        """Зарегистрировать шаг остановки. Шаги выполняются в порядке регистрации."""
+        self._hooks.append((name, callback))
+
+    def stop_intake(self) -> None:
+        if self.accepting:
+            self.accepting = False
+            log.info(f"[Lifecycle] Intake stopped, in flight: {self.in_flight()}")
+
+    async def drain(self, deadline: float) -> DrainReport:
+        """Дождаться завершения работ в полёте; что не успело за ``deadline`` секунд - отменить."""
+        report = DrainReport()
+        started = time.monotonic()
+        seen: dict[asyncio.Task, str] = {}
+        while True:
+            for kind, tasks in self._inflight.items():
+                seen.update((t, kind) for t in tasks)
+            pending = {t for t in seen if not t.done()}
+            remaining = deadline - (time.monotonic() - started)
+            if not pending or remaining <= 0:
+                break
+            # новые задачи могут появиться, пока ждём - поэтому ждём кусками
+            await asyncio.wait(pending, timeout=min(remaining, 0.5))
+
+        for task, kind in seen.items():
+            bucket = report.abandoned if not task.done() else report.drained
+            bucket[kind] = bucket.get(kind, 0) + 1
+            if not task.done():
+                task.cancel()
+        if report.abandoned:
+            # даём отменённым задачам откатить сессии
+            await asyncio.wait([t for t in seen if not t.done()], timeout=1.0)
+        report.elapsed = time.monotonic() - started
+        return report
+
+    async def shutdown(self, deadline: float) -> DrainReport:
+        self.stop_intake()
+        report = await self.drain(deadline)
+        for name, callback in self._hooks:
+            try:
+                await callback()
+            except Exception as ex:
+                report.hooks_failed.append(name)
+                log.exception(f"[Lifecycle] Shutdown step '{name}' failed: {ex}")
+        self._hooks.clear()
+
+        summary = f"drained={report.drained} abandoned={report.abandoned} in {report.elapsed:.2f}s"
+        if report.clean:
+            log.success(f"[Lifecycle] Shutdown complete: {summary}")
+        else:
+            log.warning(f"[Lifecycle] Shutdown with losses: {summary}, failed steps={report.hooks_failed}")
+        await logger.complete()
+        return report
+
+    @web.middleware
+    async def http_middleware(self, request: web.Request, handler):
+        """Во время остановки отвечает 503, чтобы платёжки повторили вебхук позже."""
+        if not self.accepting:
+            return web.json_response(
+                {"error": {"code": 503, "message": "Shutting down"}},
+                status=503,
+                headers={"Retry-After": "5"},
+            )
+        async with self.track("http"):
+            return await handler(request)
+
+
+lifecycle = LifecycleManager()
@@ -1,3 +1,4 @@
 from .setup import LoggerConfiguration
 from .setup import setup as setup_logger
 from .setup import zip_logs
+from .structured import Sampler, json_format
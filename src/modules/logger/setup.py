@@ -11,6 +11,8 @@ from pathlib import Path
 
 from loguru import logger
 
+from .structured import json_format
+
 @dataclass
 class LoggerConfiguration:
     directory: Path | str
@@ -28,6 +30,7 @@ class LoggerConfiguration:
     prefix_set: str = "<12"
     # format: str = "<green>{elapsed} -- {time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level:<8}</level> | {extra[module]:%s} | {extra[prefix]:%s} | {message}"
     format: str = "<green>{elapsed} -- {time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level:<8}</level> | [{module:^10}] {message}"
+    json: bool = False  # Одна строка JSON на запись вместо format (LOG_FORMAT=json)
 
     def __post_init__(self):
         if isinstance(self.directory, str):
@@ -95,7 +98,7 @@ def hook_logging():
 
 def setup(config: LoggerConfiguration, hook_logger: bool = False):
     logger.remove()
-    fmt = config.format # % (config.module_set, config.prefix_set)
+    fmt = json_format if config.json else config.format # % (config.module_set, config.prefix_set)
     if sys.stdout:
         logger.add(sys.stdout, level=config.mode, format=fmt, backtrace=True, diagnose=True)
     logger.add(config.log_path, level=config.mode, format=fmt, backtrace=False, diagnose=False, rotation="25 MB")
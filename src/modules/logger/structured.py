@@ -0,0 +1,55 @@
+"""Структурированные логи и семплирование access-логов.
+
+``LOG_FORMAT=json`` переключает все sink'и на одну строку JSON на запись (orjson):
+время, уровень, ``module``/``prefix`` из ``bind`` и все остальные поля ``extra`` -
+у access-логов это ``request_id``, ``route``, ``status``, ``duration_ms``,
+``telegram_id``. Запись сериализуется один раз и переиспользуется всеми sink'ами.
+
+``Sampler`` решает, писать ли строку access-лога: ошибки и медленные запросы пишутся
+всегда, успешные - с долей ``rate``. Отброшенная строка не форматируется вовсе.
+"""
+from __future__ import annotations
+
+import random
+import traceback
+
+import orjson
+
+# Поля, которые и так есть в записи под своими именами
+_SKIP_EXTRA = frozenset({"module", "prefix", "_json"})
+
+
+def json_format(record) -> str:
+    """``format`` для ``logger.add``: запись целиком в ``extra[_json]``, в шаблоне только она."""
+    extra = record["extra"]
+    if "_json" not in extra:  # у всех sink'ов общий extra: сериализуем один раз
+        doc = {
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "module": extra.get("module", record["module"]),
+            "prefix": extra.get("prefix"),
+            "message": record["message"],
+            "source": f"{record['name']}:{record['line']}",
+        }
+        for key, value in extra.items():
+            if key not in _SKIP_EXTRA:
+                doc[key] = value
+        if record["exception"] is not None:
+            doc["exception"] = "".join(traceback.format_exception(*record["exception"]))
+        extra["_json"] = orjson.dumps(doc, default=str).decode()
+    return "{extra[_json]}\n"
+
+
+class Sampler:
+    """Доля ``rate`` успешных записей; ошибки и всё дольше ``slow_ms`` - всегда."""
+
+    __slots__ = ("rate", "slow_ms")
+
+    def __init__(self, rate: float = 1.0, slow_ms: float = 1000):
+        self.rate = rate
+        self.slow_ms = slow_ms
+
+    def keep(self, duration_ms: float, error: bool = False) -> bool:
+        if error or duration_ms >= self.slow_ms:
+            return True
+        return self.rate >= 1 or random.random() < self.rate
@@ -0,0 +1,5 @@
+"""Runtime metrics package."""
+from .loop_lag import LoopLagMonitor, loop_monitor
+from .memory import MemoryMonitor, MemoryProfiler, memory_monitor, memory_profiler
+
+__all__ = ["LoopLagMonitor", "loop_monitor", "MemoryMonitor", "MemoryProfiler", "memory_monitor", "memory_profiler"]
@@ -0,0 +1,74 @@
+"""Монитор задержки event loop.
+
+Фоновая задача засыпает на ``interval`` и меряет, насколько позже срока она
+проснулась. Это и есть задержка планирования: сколько ждал бы любой готовый
+колбэк (апдейт, HTTP-запрос), пока loop занят синхронной работой. Последние
+``window`` замеров хранятся в кольцевом буфере, перцентили считаются по запросу.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections import deque
+from typing import Optional
+
+from loguru import logger
+
+log = logger.bind(module="metrics", prefix="loop")
+
+
+class LoopLagMonitor:
+    """Непрерывные замеры задержки планирования event loop."""
+
+    def __init__(self, interval: float = 0.1, window: int = 600, *, warn_after: float = 1.0):
+        self.interval = interval
+        self.warn_after = warn_after
+        self._samples: deque[float] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def percentiles(self) -> dict[str, float]:
+        """p50/p95/p99/max задержки за окно, в миллисекундах."""
+        if not self._samples:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0, "samples": 0}
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+
+        def pick(pct: float) -> float:
+            return round(ordered[min(last, int(pct / 100 * len(ordered)))] * 1000, 2)
+
+        return {
+            "p50": pick(50),
+            "p95": pick(95),
+            "p99": pick(99),
+            "max": round(ordered[-1] * 1000, 2),
+            "samples": len(ordered),
+        }
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self._samples.append(lag)
+            if lag >= self.warn_after:
+                log.warning(f"[LoopLag] Event loop was blocked for {lag * 1000:.0f}ms")
+
+
+loop_monitor = LoopLagMonitor()
@@ -0,0 +1,311 @@
+"""Память процесса: периодические RSS/GC и tracemalloc по запросу админа.
+
+``MemoryMonitor`` раз в ``interval`` секунд записывает RSS и счётчики сборщика мусора;
+по окну замеров видно, растёт ли процесс и с какой скоростью. Чтение ``/proc`` и
+``gc.get_stats()`` раз в минуту ничего не стоит.
+
+``MemoryProfiler`` - поиск утечки на живом процессе. Пока его не включили, tracemalloc
+не запущен и не добавляет ни одной инструкции к аллокациям. Сценарий:
+
+1. ``start(frames)`` - включить трассировку (каждая аллокация дорожает, память под трассы);
+2. ``snapshot()`` - снимок сейчас и ещё один через время под нагрузкой;
+3. ``diff(a, b, group)`` - прирост между снимками, сгруппированный по подсистеме
+   (fsm, i18n, sqlalchemy, aiohttp...), модулю или строке;
+4. ``stop()`` - выключить и отдать память трасс.
+
+Аллокация относится к самому глубокому кадру, который попадает в группу: при
+``frames`` > 1 строка, выделенная в ``json`` по просьбе ``modules.phraseEngine``,
+считается за i18n, а не за stdlib.
+
+Снимок и разница считаются в потоке (webapi), а ``start``/``stop``/``status`` - в
+event loop, поэтому список снимков под ``threading.Lock``; сама тяжёлая работа идёт
+вне блокировки. Если трассировку выключили посреди снимка, ``snapshot``, ``top`` и
+``diff`` возвращают ``None``.
+
+Профилируется текущий процесс. В кластере HTTP обслуживает фронт, а апдейты -
+воркеры, так что из админки видна только память фронта.
+"""
+from __future__ import annotations
+
+import asyncio
+import gc
+import os
+import sys
+import sysconfig
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Optional
+
+from loguru import logger
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+log = logger.bind(module="metrics", prefix="memory")
+
+_MB = 1024 * 1024
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+# Подсистема по префиксу модуля; первое совпадение выигрывает, поэтому FSM раньше aiogram
+SUBSYSTEMS: tuple[tuple[str, tuple[str, ...]], ...] = (
+    ("fsm", ("aiogram.fsm", "database.fsm")),
+    ("aiogram", ("aiogram",)),
+    ("sqlalchemy", ("sqlalchemy",)),
+    ("aiohttp", ("aiohttp", "multidict", "yarl")),
+    ("i18n", ("modules.phraseEngine",)),
+    ("database", ("database",)),
+    ("bot", ("bot",)),
+    ("app", ("modules", "shared", "main")),
+)
+GROUPS = ("subsystem", "module", "line")
+
+# Служебные трассы: сам tracemalloc и импорт модулей
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+_STDLIB = os.path.normcase(sysconfig.get_paths()["stdlib"])
+
+
+def rss_bytes() -> Optional[int]:
+    """Текущий RSS процесса (Linux), иначе ``None``."""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # Linux отдаёт килобайты
+
+
+def gc_stats() -> dict:
+    stats = gc.get_stats()
+    return {
+        "counts": list(gc.get_count()),
+        "collections": [s["collections"] for s in stats],
+        "collected": [s["collected"] for s in stats],
+        "uncollectable": sum(s["uncollectable"] for s in stats),
+        "garbage": len(gc.garbage),
+    }
+
+
+def _mb(value: Optional[float]) -> Optional[float]:
+    return round(value / _MB, 2) if value is not None else None
+
+
+class MemoryMonitor:
+    """Периодические замеры RSS; рост считается по окну последних ``window`` замеров."""
+
+    def __init__(self, window: int = 60):
+        self.interval = 0.0
+        self._samples: deque[tuple[float, int]] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, interval: float) -> None:
+        """Замеры раз в ``interval`` секунд (0 - выключено)."""
+        if self._task is None and interval > 0 and rss_bytes() is not None:
+            self.interval = interval
+            self._task = asyncio.create_task(self._run(), name="memory-monitor")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        """RSS сейчас и пиковый, прирост за окно замеров, счётчики GC."""
+        report = {"rss_mb": _mb(rss_bytes()), "peak_rss_mb": _mb(peak_rss_bytes())}
+        if len(self._samples) > 1:
+            (first_at, first), (last_at, last) = self._samples[0], self._samples[-1]
+            report["growth_mb"] = _mb(last - first)
+            report["window_s"] = round(last_at - first_at)
+        report["gc"] = gc_stats()
+        return report
+
+    async def _run(self) -> None:
+        while True:
+            rss = rss_bytes()
+            self._samples.append((time.monotonic(), rss))
+            log.debug(f"[Memory] rss={_mb(rss)}MB gc={gc.get_count()}")
+            await asyncio.sleep(self.interval)
+
+
+@lru_cache(maxsize=4096)
+def _module_name(filename: str) -> str:
+    """``.../site-packages/aiogram/fsm/context.py`` -> ``aiogram.fsm.context``."""
+    path = os.path.normcase(os.path.abspath(filename))
+    roots = sorted((os.path.normcase(os.path.abspath(p or ".")) for p in sys.path), key=len, reverse=True)
+    for root in roots:
+        if path.startswith(root + os.sep):
+            rel = os.path.splitext(path[len(root) + 1:])[0]
+            parts = rel.split(os.sep)
+            if parts[-1] == "__init__":
+                parts.pop()
+            return ".".join(parts)
+    return os.path.basename(filename)
+
+
+@lru_cache(maxsize=4096)
+def _is_stdlib(filename: str) -> bool:
+    path = os.path.normcase(os.path.abspath(filename))
+    return filename.startswith("<") or (path.startswith(_STDLIB) and "site-packages" not in path)
+
+
+@lru_cache(maxsize=4096)
+def _subsystem(filename: str) -> Optional[str]:
+    module = _module_name(filename)
+    for name, prefixes in SUBSYSTEMS:
+        if any(module == p or module.startswith(p + ".") for p in prefixes):
+            return name
+    return None
+
+
+def _group_key(traceback: tracemalloc.Traceback, group: str) -> str:
+    # Кадры от старого к новому: идём с самого глубокого
+    frames = list(reversed(traceback))
+    if group == "line":
+        return f"{_module_name(frames[0].filename)}:{frames[0].lineno}"
+    if group == "module":
+        for frame in frames:
+            if not _is_stdlib(frame.filename):
+                return _module_name(frame.filename)
+        return _module_name(frames[0].filename)
+    for frame in frames:
+        if (name := _subsystem(frame.filename)) is not None:
+            return name
+    if all(_is_stdlib(frame.filename) for frame in frames):
+        return "stdlib"
+    return _module_name(next(f.filename for f in frames if not _is_stdlib(f.filename))).split(".")[0]
+
+
+def _aggregate(stats, group: str, limit: int, *, diff: bool) -> list[dict]:
+    groups: dict[str, list[int]] = {}
+    for stat in stats:
+        row = groups.setdefault(_group_key(stat.traceback, group), [0, 0, 0, 0])
+        row[0] += stat.size
+        row[1] += stat.count
+        if diff:
+            row[2] += stat.size_diff
+            row[3] += stat.count_diff
+    ordered = sorted(groups.items(), key=lambda kv: abs(kv[1][2]) if diff else kv[1][0], reverse=True)
+    result = []
+    for key, (size, count, size_diff, count_diff) in ordered[:limit]:
+        item = {"group": key, "size_kb": round(size / 1024, 1), "count": count}
+        if diff:
+            item.update(size_diff_kb=round(size_diff / 1024, 1), count_diff=count_diff)
+        result.append(item)
+    return result
+
+
+class MemoryProfiler:
+    """tracemalloc по запросу: снимки и их разница по группам. Выключен - ничего не стоит."""
+
+    def __init__(self, max_snapshots: int = 5):
+        self.max_snapshots = max_snapshots
+        self.frames = 0
+        self._snapshots: OrderedDict[int, tuple[float, int, tracemalloc.Snapshot]] = OrderedDict()
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10) -> bool:
+        """Включить трассировку. ``False``, если уже включена."""
+        with self._lock:
+            if self.tracing:
+                return False
+            tracemalloc.start(frames)
+            self.frames = frames
+        log.warning(f"[Memory] tracemalloc started ({frames} frame(s)), allocations are slower until stopped")
+        return True
+
+    def stop(self) -> bool:
+        with self._lock:
+            if not self.tracing:
+                return False
+            tracemalloc.stop()
+            self._snapshots.clear()
+            self.frames = 0
+        log.info("[Memory] tracemalloc stopped")
+        return True
+
+    def status(self) -> dict:
+        with self._lock:
+            snapshots = [
+                {"id": sid, "time": taken_at, "size_mb": _mb(size)}
+                for sid, (taken_at, size, _) in self._snapshots.items()
+            ]
+        report = {"tracing": self.tracing, "frames": self.frames, "snapshots": snapshots}
+        if self.tracing:
+            traced, peak = tracemalloc.get_traced_memory()
+            report.update(traced_mb=_mb(traced), peak_mb=_mb(peak),
+                          overhead_mb=_mb(tracemalloc.get_tracemalloc_memory()))
+        return report
+
+    def snapshot(self) -> Optional[int]:
+        """Снять снимок; самый старый вытесняется после ``max_snapshots``.
+
+        Возвращает id или ``None``, если трассировка выключена (в том числе посреди снимка).
+        """
+        try:
+            snap = tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+        except RuntimeError:  # stop() успел раньше
+            return None
+        size = sum(t.size for t in snap.traces)
+        with self._lock:
+            if not self.tracing:  # stop() пришёл, пока снимок считался: он уже не нужен
+                return None
+            self._seq += 1
+            self._snapshots[self._seq] = (time.time(), size, snap)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+            return self._seq
+
+    def snapshot_ids(self) -> list[int]:
+        with self._lock:
+            return list(self._snapshots)
+
+    def _get(self, *snapshot_ids: int) -> Optional[list[tracemalloc.Snapshot]]:
+        with self._lock:
+            if not all(sid in self._snapshots for sid in snapshot_ids):
+                return None
+            return [self._snapshots[sid][2] for sid in snapshot_ids]
+
+    def top(self, snapshot_id: int, group: str = "subsystem", limit: int = 20) -> Optional[list[dict]]:
+        """Что занимает память в снимке, по группам. ``None`` - снимка уже нет."""
+        if (snaps := self._get(snapshot_id)) is None:
+            return None
+        return _aggregate(snaps[0].statistics("traceback"), group, limit, diff=False)
+
+    def diff(self, old_id: int, new_id: int, group: str = "subsystem", limit: int = 20) -> Optional[list[dict]]:
+        """Прирост между снимками по группам, крупнейшие изменения первыми. ``None`` - снимков уже нет."""
+        if (snaps := self._get(old_id, new_id)) is None:
+            return None
+        old, new = snaps
+        return _aggregate(new.compare_to(old, "traceback"), group, limit, diff=True)
+
+
+memory_monitor = MemoryMonitor()
+memory_profiler = MemoryProfiler()
@@ -1 +1 @@
-from .yookassa import yookassa_webhook
\ No newline at end of file
+from .yookassa import yookassa_api, yookassa_webhook, NETWORKS as YOOKASSA_NETWORKS
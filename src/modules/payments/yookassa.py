@@ -1,7 +1,139 @@
+"""Уведомления YooKassa.
+
+Тело уведомления ничем не подписано, поэтому ему не верим: статус, ``paid``, сумму и
+валюту платежа перечитываем из API YooKassa (``GET /v3/payments/{id}``) и сверяем с
+нашей строкой ``Payment``. Проводится только то, что подтвердил API.
+"""
+import asyncio
+from decimal import Decimal, InvalidOperation
+from typing import Optional
+
+import aiohttp
 from aiohttp import web
+from loguru import logger
+from sqlalchemy import select
 
+from database import Payment
+from database.enum import TransactionStatus
 from modules.http.utils import build_response
+from shared import config, storage
+
+log = logger.bind(module="yookassa", prefix="webhook")
+
+# Событие YooKassa -> конечный статус платежа
+_EVENTS = {
+    "payment.succeeded": TransactionStatus.COMPLETED,
+    "payment.canceled": TransactionStatus.CANCELLED,
+}
+
+# Статус платежа в API, который подтверждает событие
+_API_STATUSES = {
+    TransactionStatus.COMPLETED: "succeeded",
+    TransactionStatus.CANCELLED: "canceled",
+}
+
+# Сети, с которых YooKassa шлёт уведомления
+# https://yookassa.ru/developers/using-api/webhooks#ip
+NETWORKS = [
+    "185.71.76.0/27",
+    "185.71.77.0/27",
+    "77.75.153.0/25",
+    "77.75.156.11",
+    "77.75.156.35",
+    "77.75.154.128/25",
+    "2a02:5180::/32",
+]
+
+
+class YooKassaAPI:
+    """Минимальный клиент API YooKassa: только чтение платежа. Сессия создаётся при первом запросе."""
+
+    def __init__(self, shop_id: str, secret_key: str, api_url: str, timeout: float = 10):
+        self.auth = aiohttp.BasicAuth(shop_id, secret_key)
+        self.api_url = api_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def get_payment(self, payment_id: str) -> Optional[dict]:
+        """Платёж из API или ``None``, если YooKassa его не знает. Сетевые ошибки и 5xx - исключение."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(auth=self.auth, timeout=self.timeout)
+        async with self._session.get(f"{self.api_url}/payments/{payment_id}") as resp:
+            if resp.status == 404:
+                return None
+            resp.raise_for_status()
+            return await resp.json()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+yookassa_api = YooKassaAPI(
+    config.payments.yookassa.shop_id,
+    config.payments.yookassa.secret_key,
+    config.payments.yookassa.api_url,
+)
+
+
+async def _stored_payment(payment_id: str) -> Optional[Payment]:
+    # С основной БД: только что созданный платёж реплика может ещё не видеть
+    async for session in storage['db_manager'].get_session():
+        return (await session.execute(
+            select(Payment).where(Payment.payment_id == payment_id)
+        )).scalar_one_or_none()
+
+
+def _confirmed(remote: dict, payment: Payment, status: TransactionStatus) -> Optional[str]:
+    """Причина, по которой API не подтверждает событие, или ``None``."""
+    if remote.get("status") != _API_STATUSES[status]:
+        return f"API status is {remote.get('status')!r}"
+    if status is not TransactionStatus.COMPLETED:
+        return None
+    if remote.get("paid") is not True:
+        return "payment is not paid"
+    amount = remote.get("amount") or {}
+    try:
+        value = Decimal(str(amount.get("value")))
+    except InvalidOperation:
+        return f"bad amount {amount!r}"
+    if value != Decimal(payment.amount) or amount.get("currency") != payment.currency:
+        return f"amount {value} {amount.get('currency')} != {payment.amount} {payment.currency}"
+    return None
+
+
+async def yookassa_webhook(result: web.Request):
+    try:
+        body = await result.json()
+        event = body["event"]
+        payment_id = body["object"]["id"]
+    except (ValueError, KeyError, TypeError):
+        log.warning(f"[YooKassa] Malformed notification from {result.remote}")
+        raise web.HTTPBadRequest()
+
+    status = _EVENTS.get(event)
+    if status is None or not isinstance(payment_id, str):
+        log.debug(f"[YooKassa] Ignored event {event} for {payment_id}")
+        return build_response("ok")
+
+    payment = await _stored_payment(payment_id)
+    if payment is None:
+        log.warning(f"[YooKassa] {event} for unknown payment {payment_id} from {result.remote}")
+        return build_response("ok")
 
+    # Недоступность API -> 500, YooKassa повторит уведомление
+    try:
+        remote = await yookassa_api.get_payment(payment_id)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+        log.error(f"[YooKassa] Can't verify {payment_id}: {ex!r}")
+        raise web.HTTPInternalServerError()
+    reason = "unknown to YooKassa" if remote is None else _confirmed(remote, payment, status)
+    if reason is not None:
+        log.warning(f"[YooKassa] Rejected {event} {payment_id} from {result.remote}: {reason}")
+        return build_response("ok")
 
-def yookassa_webhook(result: web.Request):
+    # Ошибка проведения -> 500, YooKassa повторит уведомление
+    applied = await storage['settlement'].submit(payment_id, status)
+    log.info(f"[YooKassa] {event} {payment_id} -> {'applied' if applied else 'already processed'}")
     return build_response("ok")
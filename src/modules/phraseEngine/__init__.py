@@ -3,4 +3,4 @@
 # Written by: SantaSpeen
 # Licence: MIT
 # (c) SantaSpeen 2025
-from .engine import PhraseEngine
\ No newline at end of file
+from .engine import PhraseEngine, LazyPhraseEngine
\ No newline at end of file
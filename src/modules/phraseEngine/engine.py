@@ -5,6 +5,7 @@
 # (c) SantaSpeen 2025
 import builtins
 import html
+import threading
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -93,14 +94,22 @@ class _LangSettings:
 
 class PhraseEngine:
 
-    def __init__(self, locale_dir: Path, escape_html=False):
-        """Load the language file and set the locales directory. Use JSON5 format for the language file."""
+    def __init__(self, locale_dir: Path, escape_html=False, fallbacks: dict = None, default: str = None):
+        """Load the language file and set the locales directory. Use JSON5 format for the language file.
+
+        :param fallbacks: Цепочки запасных локалей: ``{"uk": ["ru"], "*": ["en"]}``. ``*`` - для всех
+            остальных; если его нет, запасной будет ``default``.
+        :param default: Локаль по умолчанию (``config.i18n.default``).
+        """
         self._locale_dir: Path = locale_dir
         self._escape_html: bool = escape_html
+        self._fallbacks: dict = fallbacks or {}
+        self._default: str | None = default
 
         self._locales = []
         self._locales_map = {}
         self._locales_data = {}
+        self._coverage: dict[str, dict[str, str]] = {}  # lang -> {key: локаль, из которой взят ключ}
 
         log.debug("[PhraseEngine] Injecting to builtins")
         builtins.i18n = self
@@ -140,6 +149,60 @@ class PhraseEngine:
             self._locales.append(lang)
             log_load.info(f"[PhraseEngine] Loaded locale: {lang_settings.flag} {lang_settings.name} from {locale_path}")
 
+        self._apply_fallbacks()
+
+    def fallback_chain(self, lang: str) -> list[str]:
+        """Запасные локали для ``lang`` по порядку, с раскрытием цепочек (uk -> ru -> en)."""
+        chain, queue = [], [lang]
+        while queue:
+            current = queue.pop(0)
+            explicit = self._fallbacks.get(current)
+            if explicit is None:
+                explicit = self._fallbacks.get("*", [self._default] if self._default else [])
+            if isinstance(explicit, str):
+                explicit = [explicit]
+            for nxt in explicit:
+                if nxt != lang and nxt not in chain and nxt in self._locales_data:
+                    chain.append(nxt)
+                    queue.append(nxt)
+        return chain
+
+    def _apply_fallbacks(self):
+        # Таблицы сливаются один раз при загрузке: поиск фразы - всё так же одно обращение к dict
+        own = {lang: self._locales_data[lang] for lang in self._locales}
+        for lang in self._locales:
+            chain = self.fallback_chain(lang)
+            if not chain:
+                continue
+            merged, source = {}, {}
+            for fallback in reversed(chain):
+                merged.update(own[fallback])
+                source.update(dict.fromkeys(own[fallback], fallback))
+            merged.update(own[lang])
+            for key in own[lang]:
+                source.pop(key, None)
+            self._locales_data[lang] = merged
+            self._coverage[lang] = source
+            self._report(lang, chain, own[lang], source)
+
+    def _report(self, lang: str, chain: list[str], own: dict, source: dict):
+        total = len(own) + len(source)
+        if not source:
+            log_load.debug(f"[PhraseEngine] {lang}: {total}/{total} keys translated")
+            return
+        by_locale = {}
+        for key, fallback in source.items():
+            by_locale.setdefault(fallback, []).append(key)
+        details = ", ".join(f"{len(keys)} from {fallback}" for fallback, keys in by_locale.items())
+        log_load.warning(f"[PhraseEngine] {lang}: {len(own)}/{total} keys translated, {details} "
+                         f"(fallback {' -> '.join([lang, *chain])})")
+        for fallback, keys in by_locale.items():
+            log_load.debug(f"[PhraseEngine] {lang} <- {fallback}: {', '.join(sorted(keys))}")
+
+    def coverage(self) -> dict[str, dict[str, str]]:
+        """Ключи, взятые из запасных локалей: ``{lang: {key: fallback_lang}}``."""
+        return {lang: dict(source) for lang, source in self._coverage.items()}
+
     def get_phrase(self, lang: str, key: str, **kwargs) -> str:
         """
         Get the phrase from the locales file. If the phrase is not found, return the key in uppercase.
@@ -190,3 +253,37 @@ class PhraseEngine:
         if lang not in self._locales_data:
             raise KeyError(f"Language not loaded: {lang}")
         return LangAccessor(self, lang)
+
+
+class LazyPhraseEngine:
+    """Откладывает загрузку локалей до первого обращения или явного ``load()``.
+
+    Позволяет импортировать ``i18n`` из shared на уровне модуля, а саму загрузку
+    выполнить отдельной фазой старта (в том числе в потоке, параллельно с БД).
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._args = args
+        self._kwargs = kwargs
+        self._engine: PhraseEngine | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._engine is not None
+
+    def load(self) -> PhraseEngine:
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = PhraseEngine(*self._args, **self._kwargs)
+        return self._engine
+
+    def __getattr__(self, item):
+        return getattr(self.load(), item)
+
+    def __getitem__(self, lang: str):
+        return self.load()[lang]
+
+    def __call__(self, lang: str, key: str, **kwargs):
+        return self.load().get_phrase(lang, key, **kwargs)
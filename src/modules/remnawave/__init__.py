@@ -0,0 +1,5 @@
+"""Remnawave panel client package."""
+from .breaker import CircuitBreaker, BreakerState
+from .client import RemnawaveClient, RemnawaveError, CircuitOpenError
+
+__all__ = ["RemnawaveClient", "RemnawaveError", "CircuitOpenError", "CircuitBreaker", "BreakerState"]
@@ -0,0 +1,48 @@
+import time
+from enum import StrEnum
+
+
+class BreakerState(StrEnum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Простой circuit breaker: после ``threshold`` ошибок подряд размыкается на ``cooldown`` секунд,
+    затем пропускает один пробный запрос (half-open)."""
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe = False
+
+    @property
+    def state(self) -> BreakerState:
+        if self._failures < self.threshold:
+            return BreakerState.CLOSED
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return BreakerState.HALF_OPEN
+        return BreakerState.OPEN
+
+    def allow(self) -> bool:
+        match self.state:
+            case BreakerState.CLOSED:
+                return True
+            case BreakerState.HALF_OPEN if not self._probe:
+                self._probe = True
+                return True
+            case _:
+                return False
+
+    def success(self) -> None:
+        self._failures = 0
+        self._probe = False
+
+    def failure(self) -> None:
+        self._failures += 1
+        self._probe = False
+        if self._failures >= self.threshold:
+            self._opened_at = time.monotonic()
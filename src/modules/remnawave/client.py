@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import random
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Optional
+
+import aiohttp
+import orjson
+from loguru import logger
+
+from .breaker import CircuitBreaker
+
+log = logger.bind(module="remnawave", prefix="client")
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RemnawaveError(Exception):
+    """Ошибка ответа панели Remnawave."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class CircuitOpenError(RemnawaveError):
+    """Панель считается недоступной, запрос не отправлялся."""
+
+
+class RemnawaveClient:
+    """Асинхронный клиент API панели Remnawave.
+
+    Один общий пул keep-alive соединений, ограничение одновременных запросов,
+    повторы с джиттером, circuit breaker и склейка одинаковых запросов в полёте.
+    """
+
+    def __init__(
+            self,
+            base_url: str,
+            token: str,
+            *,
+            max_connections: int = 50,
+            concurrency: int = 20,
+            keepalive: float = 30,
+            timeout: float = 10,
+            retries: int = 3,
+            backoff_base: float = 0.2,
+            backoff_max: float = 5.0,
+            breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.max_connections = max_connections
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._inflight: dict[Hashable, asyncio.Future] = {}
+        self._user_locks: dict[int, tuple[asyncio.Lock, int]] = {}  # telegram_id -> (lock, ждущих)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    def from_config(cls, cfg) -> "RemnawaveClient":
+        return cls(
+            cfg.url,
+            cfg.token,
+            max_connections=cfg.max_connections,
+            concurrency=cfg.concurrency,
+            keepalive=cfg.keepalive,
+            timeout=cfg.timeout,
+            retries=cfg.retries,
+            backoff_base=cfg.backoff_base,
+            backoff_max=cfg.backoff_max,
+            breaker=CircuitBreaker(cfg.breaker_threshold, cfg.breaker_cooldown),
+        )
+
+    # -- lifecycle --
+
+    async def start(self) -> None:
+        if self._session is not None:
+            return
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=self.keepalive),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"Authorization": f"Bearer {self.token}"},
+            json_serialize=lambda obj: orjson.dumps(obj).decode(),
+        )
+        log.info(f"[Remnawave] Client started for {self.base_url}")
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+            log.info("[Remnawave] Client closed")
+
+    async def __aenter__(self) -> "RemnawaveClient":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    # -- transport --
+
+    def _backoff(self, attempt: int) -> float:
+        # full jitter: равномерно от 0 до экспоненциального потолка
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _request(self, method: str, path: str, *, json: Any = None, idempotent: bool = True) -> Any:
+        if self._session is None:
+            raise RemnawaveError("Client is not started")
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Remnawave is unavailable: {method} {path}")
+            sent, status = False, None
+            try:
+                async with self._semaphore:
+                    sent = True
+                    async with self._session.request(method, self.base_url + path, json=json) as resp:
+                        status, body = resp.status, await resp.read()
+                if status in _RETRY_STATUSES:
+                    raise RemnawaveError(f"{method} {path} -> {status}", status)
+                # Тело разбирается до success(): битый ответ - ошибка панели, а не успех
+                result = orjson.loads(body).get("response") if body and status < 400 else None
+            except RemnawaveError as ex:
+                error = ex
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                error = ex
+                # неидемпотентный запрос повторяем, только если он точно не ушёл в панель
+                if not idempotent and sent and not isinstance(ex, aiohttp.ClientConnectorError):
+                    self.breaker.failure()
+                    raise RemnawaveError(f"{method} {path} failed: {ex!r}") from ex
+            except (ValueError, AttributeError) as ex:
+                self.breaker.failure()
+                raise RemnawaveError(f"{method} {path} -> {status}: malformed response ({ex!r})", status) from ex
+            except BaseException:
+                # Отмена или непредвиденная ошибка: без failure() пробный запрос half-open
+                # остался бы занятым, и breaker больше не пропустил бы ни одного запроса
+                self.breaker.failure()
+                raise
+            else:
+                self.breaker.success()
+                if status >= 400:
+                    # 4xx - ошибка запроса, а не панели: не повторяем и не размыкаем
+                    raise RemnawaveError(f"{method} {path} -> {status}: {body[:200]!r}", status)
+                return result
+
+            self.breaker.failure()
+            if attempt >= self.retries:
+                raise RemnawaveError(f"{method} {path} failed after {attempt + 1} attempt(s): {error!r}") from error
+            delay = self._backoff(attempt)
+            attempt += 1
+            log.warning(f"[Remnawave] {method} {path} failed ({error!r}), retry {attempt}/{self.retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    async def _coalesce(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Одинаковые запросы, пришедшие пока первый ещё в полёте, получают его результат."""
+        if (future := self._inflight.get(key)) is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            # Отменили первого, а не ждущих: им обычная ошибка, а не чужой CancelledError
+            future.set_exception(RemnawaveError(f"Request {key!r} was cancelled"))
+            future.exception()
+            raise
+        except Exception as ex:
+            future.set_exception(ex)
+            # чтобы asyncio не ругался на неполученное исключение, если никто не ждал
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    @asynccontextmanager
+    async def _user_lock(self, telegram_id: int) -> AsyncIterator[None]:
+        lock, waiters = self._user_locks.get(telegram_id, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._user_locks[telegram_id] = (lock, waiters + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, waiters = self._user_locks[telegram_id]
+            if waiters > 1:
+                self._user_locks[telegram_id] = (lock, waiters - 1)
+            else:
+                del self._user_locks[telegram_id]
+
+    # -- API --
+
+    async def get_users_by_telegram_id(self, telegram_id: int) -> list[dict]:
+        return await self._coalesce(
+            ("by_tg", telegram_id),
+            lambda: self._request("GET", f"/api/users/by-telegram-id/{telegram_id}"),
+        ) or []
+
+    async def get_user(self, uuid: str) -> dict:
+        return await self._coalesce(("user", uuid), lambda: self._request("GET", f"/api/users/{uuid}"))
+
+    async def create_user(self, **fields) -> dict:
+        return await self._request("POST", "/api/users", json=fields, idempotent=False)
+
+    async def update_user(self, uuid: str, **fields) -> dict:
+        return await self._request("PATCH", "/api/users", json={"uuid": uuid, **fields})
+
+    async def provision(
+            self,
+            telegram_id: int,
+            *,
+            expire_at: datetime.datetime,
+            squad_uuids: list[str],
+            username: Optional[str] = None,
+    ) -> dict:
+        """Создать пользователя в панели или продлить существующего.
+
+        Поиск и создание для одного ``telegram_id`` идут под его блокировкой: параллельные
+        вызовы с разными аргументами (например, ``expire_at``) выполняются по очереди, и
+        второй уже находит пользователя, созданного первым, вместо создания дубликата.
+        Одинаковые вызовы, пришедшие, пока первый в полёте, получают его результат.
+        """
+        key = ("provision", telegram_id, expire_at, tuple(squad_uuids), username)
+        return await self._coalesce(
+            key, lambda: self._provision(telegram_id, expire_at, squad_uuids, username),
+        )
+
+    async def _provision(
+            self,
+            telegram_id: int,
+            expire_at: datetime.datetime,
+            squad_uuids: list[str],
+            username: Optional[str],
+    ) -> dict:
+        fields = {
+            "expireAt": expire_at.isoformat(),
+            "activeInternalSquads": squad_uuids,
+            "status": "ACTIVE",
+        }
+        async with self._user_lock(telegram_id):
+            # Без склейки GET: чужой запрос, начатый до создания пользователя, вернул бы устаревший ответ
+            if users := await self._request("GET", f"/api/users/by-telegram-id/{telegram_id}"):
+                return await self.update_user(users[0]["uuid"], **fields)
+            return await self.create_user(
+                username=username or f"tg_{telegram_id}",
+                telegramId=telegram_id,
+                **fields,
+            )
@@ -0,0 +1,5 @@
+"""Startup timeline package."""
+from .runtime import run
+from .timeline import Timeline, timeline
+
+__all__ = ["Timeline", "timeline", "run"]
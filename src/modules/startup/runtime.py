@@ -0,0 +1,30 @@
+"""Запуск корневой корутины процесса на выбранном event loop.
+
+``uvloop`` включается в конфиге (``bot.uvloop``) и ставится отдельно
+(``pip install uvloop``, только Linux/macOS). Если пакета нет, процесс
+работает на стандартном asyncio и пишет об этом предупреждение.
+"""
+import asyncio
+from typing import Callable, Coroutine, Optional
+
+from loguru import logger
+
+log = logger.bind(module="startup", prefix="runtime")
+
+
+def loop_factory(use_uvloop: bool) -> Optional[Callable[[], asyncio.AbstractEventLoop]]:
+    if not use_uvloop:
+        return None
+    try:
+        import uvloop
+    except ImportError:
+        log.warning("[Runtime] uvloop is enabled in config but not installed, using asyncio loop")
+        return None
+    log.info(f"[Runtime] Using uvloop {uvloop.__version__}")
+    return uvloop.new_event_loop
+
+
+def run(main: Coroutine, *, use_uvloop: bool = False):
+    """Аналог ``asyncio.run`` с опциональным uvloop."""
+    with asyncio.Runner(loop_factory=loop_factory(use_uvloop)) as runner:
+        return runner.run(main)
@@ -0,0 +1,106 @@
+"""Таймлайн запуска: длительность фаз и (по желанию) время импортов.
+
+Модуль намеренно зависит только от stdlib и loguru - его импортируют первым делом.
+"""
+import builtins
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from loguru import logger
+
+log = logger.bind(module="startup", prefix="timeline")
+
+
+@dataclass
+class _Phase:
+    name: str
+    start: float
+    end: float = 0.0
+    thread: str = ""
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class Timeline:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.phases: list[_Phase] = []
+        self._imports: dict[str, list[float]] = {}  # модуль -> [cumulative, self]
+        self._stack = threading.local()
+        self._orig_import = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Засечь фазу. Работает и вокруг ``await`` - фаза длится до выхода из блока."""
+        item = _Phase(name, time.perf_counter(), thread=threading.current_thread().name)
+        try:
+            yield item
+        finally:
+            item.end = time.perf_counter()
+            with self._lock:
+                self.phases.append(item)
+            log.debug(f"[Startup] Phase '{name}' took {item.duration * 1000:.1f}ms")
+
+    # -- профилирование импортов --
+
+    def profile_imports(self) -> None:
+        """Перехватить ``__import__`` и считать время загрузки модулей (cumulative и self)."""
+        if self._orig_import is not None:
+            return
+        self._orig_import = orig = builtins.__import__
+
+        def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level or name in sys.modules:
+                return orig(name, globals, locals, fromlist, level)
+            stack = getattr(self._stack, "frames", None)
+            if stack is None:
+                stack = self._stack.frames = []
+            stack.append(0.0)  # сюда дочерние импорты складывают своё время
+            start = time.perf_counter()
+            try:
+                return orig(name, globals, locals, fromlist, level)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with self._lock:
+                    stat = self._imports.setdefault(name, [0.0, 0.0])
+                    stat[0] += elapsed
+                    stat[1] += elapsed - children
+
+        builtins.__import__ = _timed_import
+
+    def stop_profiling(self) -> None:
+        if self._orig_import is not None:
+            builtins.__import__ = self._orig_import
+            self._orig_import = None
+
+    # -- отчёт --
+
+    def report(self, top: int = 15) -> str:
+        total = time.perf_counter() - self.t0
+        lines = [f"Startup finished in {total * 1000:.1f}ms"]
+        for p in sorted(self.phases, key=lambda p: p.start):
+            lines.append(
+                f"  {p.name:<12} +{(p.start - self.t0) * 1000:>8.1f}ms  {p.duration * 1000:>8.1f}ms  [{p.thread}]"
+            )
+        if self._imports:
+            lines.append(f"  top {top} imports by self time (self / cumulative):")
+            heavy = sorted(self._imports.items(), key=lambda kv: kv[1][1], reverse=True)[:top]
+            for name, (cumulative, own) in heavy:
+                lines.append(f"    {name:<40} {own * 1000:>8.1f}ms / {cumulative * 1000:>8.1f}ms")
+        return "\n".join(lines)
+
+    def log_report(self) -> None:
+        self.stop_profiling()
+        log.info("[Startup] " + self.report())
+
+
+timeline = Timeline()
@@ -0,0 +1,278 @@
+"""Админские списки пользователей, платежей и транзакций.
+
+Пагинация keyset по ``(created_at, id)`` от новых к старым: страница - это
+``WHERE (created_at, id) < (:cursor) ORDER BY created_at DESC, id DESC LIMIT n``
+по составному индексу, поэтому время ответа не зависит от глубины листания.
+Выбираются только колонки ответа, без ORM-сущностей. Курсор непрозрачен для клиента.
+
+Платежи и транзакции с ``?archive=1`` листаются вместе с архивом (database.archive):
+каждая таблица отдаёт свою страницу по своему индексу, страницы сливаются в одну.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import datetime
+import enum
+from decimal import Decimal
+from functools import wraps
+from typing import Any, Callable, Optional
+
+import orjson
+from aiohttp import web
+from sqlalchemy import Select, String, literal, select, tuple_, union_all
+
+from database import ARCHIVE, Payment, Transaction, User
+from database.enum import TransactionStatus, TransactionType
+from modules.http.enum import ApiErrors
+from modules.http.utils import build_error, build_response
+from shared import storage
+from .auth import request_claims, tokens
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class BadRequest(Exception):
+    """Некорректный параметр запроса; ``admin_required`` превращает его в 400."""
+
+    def __init__(self, error: ApiErrors):
+        self.error = error
+
+
+async def _still_admin(user_id: int) -> bool:
+    # С основной БД: реплика может ещё не знать о снятии прав или бане
+    async for session in storage['db_manager'].get_session():
+        row = (await session.execute(
+            select(User.is_admin, User.banned).where(User.id == user_id)
+        )).one_or_none()
+    return row is not None and row.is_admin and not row.banned
+
+
+async def is_admin_request(request: web.Request) -> bool:
+    """Запрос от админа - в том числе на публичном пути, где токен необязателен."""
+    auth = request.get("auth") or request_claims(request)
+    if auth is None or not auth.get("adm"):
+        return False
+    return auth["sub"] == "service" or await _still_admin(int(auth["sub"]))
+
+
+def admin_required(handler):
+    """Пускать только админов: JWT с флагом ``adm`` или сервисный ``webapi.security.admin_token``.
+
+    Сам токен проверяет ``auth_middleware``; здесь права. Флаг ``adm`` в JWT сверяется
+    с БД на каждый запрос: если админа сняли или забанили, все его токены отзываются.
+    """
+    @wraps(handler)
+    async def wrapper(request: web.Request) -> web.Response:
+        auth = request.get("auth")
+        if auth is None:
+            return build_error(ApiErrors.UNAUTHORIZED, 401)
+        if not auth.get("adm"):
+            return build_error(ApiErrors.FORBIDDEN, 403)
+        if auth["sub"] != "service" and not await _still_admin(int(auth["sub"])):
+            tokens.revoke_user(int(auth["sub"]))
+            return build_error(ApiErrors.FORBIDDEN, 403)
+        try:
+            return await handler(request)
+        except BadRequest as ex:
+            return build_error(ex.error, 400)
+    return wrapper
+
+
+# -- курсор --
+
+def encode_cursor(created_at: datetime.datetime, row_id: int) -> str:
+    raw = orjson.dumps([created_at.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, row_id = orjson.loads(raw)
+        return datetime.datetime.fromisoformat(created_at), int(row_id)
+    except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError):
+        raise BadRequest(ApiErrors.INVALID_CURSOR)
+
+
+def _created_bound(dialect: str, value: datetime.datetime):
+    # SQLite хранит даты строками: CURRENT_TIMESTAMP пишет "YYYY-MM-DD HH:MM:SS", а bind-параметр
+    # DateTime рендерится с микросекундами - строки одной секунды сравнились бы неверно.
+    # Передаём границу в том же виде, в каком она лежит в базе.
+    if dialect != "sqlite":
+        return value
+    value = value.replace(tzinfo=None)
+    fmt = "%Y-%m-%d %H:%M:%S" if not value.microsecond else "%Y-%m-%d %H:%M:%S.%f"
+    return literal(value.strftime(fmt), String)
+
+
+# -- разбор параметров --
+
+def query_param(request: web.Request, name: str, parse: Callable[[str], Any]) -> Optional[Any]:
+    value = request.query.get(name)
+    if value is None or value == "":
+        return None
+    try:
+        return parse(value)
+    except (ValueError, KeyError):
+        raise BadRequest(ApiErrors.INVALID_PARAMETER)
+
+
+def _bool(value: str) -> bool:
+    if value.lower() in ("1", "true", "yes"):
+        return True
+    if value.lower() in ("0", "false", "no"):
+        return False
+    raise ValueError(value)
+
+
+def _datetime(value: str) -> datetime.datetime:
+    # Время без зоны - UTC; с зоной (+03:00) переводится в UTC: драйвер SQLite зону отбрасывает
+    parsed = datetime.datetime.fromisoformat(value)
+    return parsed.astimezone(datetime.timezone.utc) if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+def date_range(request: web.Request, column) -> list:
+    filters = []
+    # Граница в том же виде, что и у курсора: иначе since на целой секунде пропустит её строки
+    dialect = storage['db_manager'].engine.dialect.name
+    if (since := query_param(request, "since", _datetime)) is not None:
+        filters.append(column >= _created_bound(dialect, since))
+    if (until := query_param(request, "until", _datetime)) is not None:
+        filters.append(column < _created_bound(dialect, until))
+    return filters
+
+
+def _limit(request: web.Request) -> int:
+    limit = query_param(request, "limit", int) or DEFAULT_LIMIT
+    if limit < 1:
+        raise BadRequest(ApiErrors.INVALID_PARAMETER)
+    return min(limit, MAX_LIMIT)
+
+
+def plain_value(value: Any) -> Any:
+    """Значение колонки в JSON-совместимом виде: Decimal и datetime строками, enum значением."""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return (value if value.tzinfo else value.replace(tzinfo=datetime.timezone.utc)).isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+async def _page(request: web.Request, *branches: tuple[Any, Select, list]) -> web.Response:
+    """Страница по одной таблице или по нескольким (горячая + архив) - ветки ``(model, stmt, filters)``."""
+    limit = _limit(request)
+    cursor = query_param(request, "cursor", str)
+
+    async for session in storage['db_manager'].get_session(readonly=True):
+        dialect = session.get_bind().dialect.name
+        bound = None
+        if cursor is not None:
+            created_at, row_id = decode_cursor(cursor)
+            bound = tuple_(_created_bound(dialect, created_at), row_id)
+        pages = []
+        for model, stmt, filters in branches:
+            if bound is not None:
+                filters = [*filters, tuple_(model.created_at, model.id) < bound]
+            pages.append(stmt.where(*filters).order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1))
+        if len(pages) == 1:
+            stmt = pages[0]
+        else:
+            # Каждая ветка берёт не больше limit + 1 строк по своему индексу, общий порядок - снаружи
+            merged = union_all(*(select(page.subquery()) for page in pages)).subquery()
+            stmt = select(merged).order_by(merged.c.created_at.desc(), merged.c.id.desc()).limit(limit + 1)
+        rows = (await session.execute(stmt)).mappings().all()
+
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = [{key: plain_value(value) for key, value in row.items()} for row in rows]
+    next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"]) if more else None
+    return build_response({"items": items, "next_cursor": next_cursor})
+
+
+# -- колонки и фильтры (общие со стриминговой выгрузкой) --
+
+USER_COLUMNS = (
+    User.id, User.telegram_id, User.username, User.first_name, User.last_name, User.locale,
+    User.is_admin, User.banned, User.plan_id, User.active_until, User.created_at,
+)
+PAYMENT_COLUMNS = (
+    Payment.id, Payment.user_id, Payment.telegram_id, Payment.platform, Payment.plan_id,
+    Payment.amount, Payment.currency, Payment.payment_id, Payment.status, Payment.created_at,
+)
+TRANSACTION_COLUMNS = (
+    Transaction.id, Transaction.user_id, Transaction.type, Transaction.status,
+    Transaction.amount, Transaction.currency, Transaction.description, Transaction.created_at,
+)
+
+
+def payment_filters(request: web.Request, model=Payment) -> list:
+    filters = date_range(request, model.created_at)
+    if (user_id := query_param(request, "user_id", int)) is not None:
+        filters.append(model.user_id == user_id)
+    if (status := query_param(request, "status", TransactionStatus)) is not None:
+        filters.append(model.status == status)
+    if (platform := query_param(request, "platform", str)) is not None:
+        filters.append(model.platform == platform)
+    return filters
+
+
+def transaction_filters(request: web.Request, model=Transaction) -> list:
+    filters = date_range(request, model.created_at)
+    if (user_id := query_param(request, "user_id", int)) is not None:
+        filters.append(model.user_id == user_id)
+    if (kind := query_param(request, "type", TransactionType)) is not None:
+        filters.append(model.type == kind)
+    if (status := query_param(request, "status", TransactionStatus)) is not None:
+        filters.append(model.status == status)
+    return filters
+
+
+def history(request: web.Request, model, columns, filters: Callable[[web.Request, Any], list]) -> list:
+    """Ветки запроса ``(model, select, filters)``: горячая таблица и, при ``?archive=1``, её архив."""
+    branches = [(model, select(*columns), filters(request, model))]
+    if query_param(request, "archive", _bool):
+        archived = ARCHIVE[model]
+        archived_columns = (getattr(archived, column.key) for column in columns)
+        branches.append((archived, select(*archived_columns), filters(request, archived)))
+    return branches
+
+
+# -- эндпоинты --
+
+@admin_required
+async def list_users(request: web.Request) -> web.Response:
+    """GET /api/admin/users?banned=&admin=&locale=&telegram_id=&since=&until=&limit=&cursor="""
+    stmt = select(*USER_COLUMNS)
+    filters = date_range(request, User.created_at)
+    if (telegram_id := query_param(request, "telegram_id", int)) is not None:
+        filters.append(User.telegram_id == telegram_id)
+    if (banned := query_param(request, "banned", _bool)) is not None:
+        filters.append(User.banned == banned)
+    if (is_admin := query_param(request, "admin", _bool)) is not None:
+        filters.append(User.is_admin == is_admin)
+    if (locale := query_param(request, "locale", str)) is not None:
+        filters.append(User.locale == locale)
+    return await _page(request, (User, stmt, filters))
+
+
+@admin_required
+async def list_payments(request: web.Request) -> web.Response:
+    """GET /api/admin/payments?user_id=&status=&platform=&since=&until=&archive=&limit=&cursor="""
+    return await _page(request, *history(request, Payment, PAYMENT_COLUMNS, payment_filters))
+
+
+@admin_required
+async def list_transactions(request: web.Request) -> web.Response:
+    """GET /api/admin/transactions?user_id=&type=&status=&since=&until=&archive=&limit=&cursor="""
+    return await _page(request, *history(request, Transaction, TRANSACTION_COLUMNS, transaction_filters))
+
+
+admin_routes = [
+    ('GET', '/api/admin/users', list_users),
+    ('GET', '/api/admin/payments', list_payments),
+    ('GET', '/api/admin/transactions', list_transactions),
+]
@@ -0,0 +1,265 @@
+"""Авторизация webapi: JWT по initData Telegram WebApp.
+
+Mini-app присылает ``initData``; подпись проверяется ключом бота (HMAC-SHA256 по
+схеме Telegram), после чего выдаётся JWT (HS256, ``webapi.jwt_secret``) на
+``security.token_ttl`` секунд. В токене лежит всё, что нужно обработчикам
+(id пользователя, telegram_id, флаг админа), поэтому проверка запроса не ходит в БД;
+исключение - админские эндпоинты: права и бан перечитываются из БД на каждый запрос
+(``admin.admin_required``), чтобы снятие админа или бан действовали сразу, а не через TTL.
+
+Проверенные токены кэшируются до своего ``exp``: повторный запрос с тем же токеном
+не пересчитывает подпись и не разбирает claims. Отзыв идёт через небольшой
+deny-list в памяти - по ``jti`` или по пользователю целиком; записи живут не дольше
+TTL токена. HTTP обслуживает один процесс (в кластере - фронт), так что списка
+в памяти достаточно; после рестарта он пуст, токены живут не дольше ``token_ttl``.
+
+Секрет короче ``MIN_SECRET_LENGTH`` или заглушка из примера конфига позволяют подделать
+токен, поэтому с ним init_webapi не регистрирует эндпоинты, требующие токена.
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import parse_qsl
+
+import jwt
+import orjson
+from aiohttp import hdrs, web
+from loguru import logger
+from sqlalchemy import select
+
+from database import User, banned_users
+from modules.http.enum import ApiErrors
+from modules.http.utils import build_error, build_response
+from shared import config, storage
+
+log = logger.bind(module="webapi", prefix="auth")
+
+ALGORITHM = "HS256"
+MIN_SECRET_LENGTH = 32  # HS256: ключ не короче выхода SHA-256
+_PLACEHOLDER_SECRETS = {"YOUR_SECRET"}
+
+
+class AuthError(Exception):
+    pass
+
+
+# -- initData --
+
+def validate_init_data(init_data: str, bot_token: str, max_age: int) -> dict:
+    """Проверить подпись ``initData`` и вернуть разобранные поля (``user`` - уже dict).
+
+    https://core.telegram.org/bots/webapps#validating-data-received-via-the-mini-app
+    """
+    fields = dict(parse_qsl(init_data, keep_blank_values=True, strict_parsing=False))
+    received = fields.pop("hash", None)
+    if not received:
+        raise AuthError("hash is missing")
+
+    check_string = "\n".join(f"{k}={v}" for k, v in sorted(fields.items()))
+    secret = hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+    expected = hmac.new(secret, check_string.encode(), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(expected, received):
+        raise AuthError("bad signature")
+
+    try:
+        auth_date = int(fields.get("auth_date", "0"))
+        user = orjson.loads(fields["user"])
+    except (KeyError, ValueError, orjson.JSONDecodeError):
+        raise AuthError("malformed payload")
+    if time.time() - auth_date > max_age:
+        raise AuthError("init data expired")
+    fields["user"] = user
+    return fields
+
+
+# -- токены --
+
+def weak_secret(secret: str) -> bool:
+    """Пустой, заглушка из примера конфига или короче ``MIN_SECRET_LENGTH``."""
+    return secret in _PLACEHOLDER_SECRETS or len(secret) < MIN_SECRET_LENGTH
+
+
+class TokenService:
+    """Выдача и проверка JWT с кэшем проверенных токенов и deny-list."""
+
+    def __init__(self, secret: str, ttl: int, *, cache_size: int = 10_000):
+        self.secret = secret
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self._verified: OrderedDict[str, dict] = OrderedDict()  # token -> claims (LRU)
+        self._denied_jti: dict[str, float] = {}                 # jti -> exp
+        self._denied_users: dict[int, float] = {}               # user id -> отозвать токены с iat <= значения
+
+    def issue(self, user: User) -> tuple[str, int]:
+        now = int(time.time())
+        exp = now + self.ttl
+        claims = {
+            "sub": str(user.id),
+            "tid": user.telegram_id,
+            "adm": bool(user.is_admin),
+            "iat": now,
+            "exp": exp,
+            "jti": uuid.uuid4().hex,
+        }
+        return jwt.encode(claims, self.secret, algorithm=ALGORITHM), exp
+
+    def verify(self, token: str) -> dict:
+        if weak_secret(self.secret):
+            raise AuthError("jwt_secret is too weak, tokens are not accepted")
+        now = time.time()
+        claims = self._verified.get(token)
+        if claims is not None and claims["exp"] > now:
+            self._verified.move_to_end(token)
+        else:
+            if claims is not None:
+                del self._verified[token]
+            try:
+                claims = jwt.decode(
+                    token, self.secret, algorithms=[ALGORITHM],
+                    options={"require": ["exp", "iat", "sub", "tid", "jti"]},
+                )
+            except jwt.PyJWTError as ex:
+                raise AuthError(str(ex))
+            self._verified[token] = claims
+            if len(self._verified) > self.cache_size:
+                self._verified.popitem(last=False)
+
+        # Deny-list проверяется всегда: отзыв действует и на закэшированные токены
+        if claims["jti"] in self._denied_jti:
+            raise AuthError("token revoked")
+        if claims["iat"] <= self._denied_users.get(int(claims["sub"]), -1):
+            raise AuthError("token revoked")
+        return claims
+
+    def revoke(self, claims: dict) -> None:
+        self._prune()
+        self._denied_jti[claims["jti"]] = claims["exp"]
+
+    def revoke_user(self, user_id: int) -> None:
+        """Отозвать все выданные пользователю токены (бан, смена прав)."""
+        self._prune()
+        self._denied_users[user_id] = time.time()
+
+    def _prune(self) -> None:
+        now = time.time()
+        self._denied_jti = {jti: exp for jti, exp in self._denied_jti.items() if exp > now}
+        self._denied_users = {uid: at for uid, at in self._denied_users.items() if at + self.ttl > now}
+
+
+tokens = TokenService(config.webapi.jwt_secret, config.webapi.security.token_ttl)
+
+# Пути /api/*, доступные без токена (вебхуки платежей добавляет init_webapi)
+public_paths: set[str] = {"/api/health", "/api/auth/telegram"}
+
+
+def _bearer(request: web.Request) -> Optional[str]:
+    scheme, _, value = request.headers.get(hdrs.AUTHORIZATION, "").partition(" ")
+    return value if scheme.lower() == "bearer" and value else None
+
+
+def _is_service_token(token: str) -> bool:
+    service_token = config.webapi.security.admin_token
+    return bool(service_token) and hmac.compare_digest(token.encode(), service_token.encode())
+
+
+def request_claims(request: web.Request) -> Optional[dict]:
+    """Claims токена запроса на публичном пути, где ``auth_middleware`` их не проверяет.
+
+    ``None`` - токена нет, он неверный, отозван или пользователь забанен.
+    """
+    token = _bearer(request)
+    if token is None:
+        return None
+    if _is_service_token(token):
+        return {"sub": "service", "adm": True}
+    try:
+        claims = tokens.verify(token)
+    except AuthError:
+        return None
+    return None if claims["tid"] in banned_users else claims
+
+
+@web.middleware
+async def auth_middleware(request: web.Request, handler):
+    """Проверка JWT для /api/*. Claims кладутся в ``request["auth"]``."""
+    if (
+        request.method == hdrs.METH_OPTIONS
+        or not request.path.startswith("/api/")
+        or request.path in public_paths
+    ):
+        return await handler(request)
+
+    token = _bearer(request)
+    if token is None:
+        return build_error(ApiErrors.UNAUTHORIZED, 401)
+
+    if _is_service_token(token):
+        request["auth"] = {"sub": "service", "adm": True}
+        return await handler(request)
+
+    try:
+        claims = tokens.verify(token)
+    except AuthError as ex:
+        log.debug(f"[Auth] Rejected token from {request.remote}: {ex}")
+        return build_error(ApiErrors.UNAUTHORIZED, 401)
+    if claims["tid"] in banned_users:
+        tokens.revoke_user(int(claims["sub"]))
+        return build_error(ApiErrors.FORBIDDEN, 403)
+    request["auth"] = claims
+    return await handler(request)
+
+
+# -- эндпоинты --
+
+async def auth_telegram(request: web.Request) -> web.Response:
+    """POST /api/auth/telegram {"init_data": "..."} -> {"token", "expires_at", "user"}"""
+    try:
+        body = await request.json()
+        init_data = body["init_data"]
+    except (ValueError, KeyError, TypeError):
+        return build_error(ApiErrors.INVALID_PARAMETER, 400)
+
+    try:
+        data = validate_init_data(init_data, config.bot.token, config.webapi.security.init_data_ttl)
+    except AuthError as ex:
+        log.info(f"[Auth] Invalid initData from {request.remote}: {ex}")
+        return build_error(ApiErrors.UNAUTHORIZED, 401)
+
+    async for session in storage['db_manager'].get_session():
+        user = (await session.execute(
+            select(User).where(User.telegram_id == data["user"]["id"])
+        )).scalar_one_or_none()
+    # Пользователь появляется в БД после /start в боте
+    if user is None or user.banned:
+        return build_error(ApiErrors.FORBIDDEN, 403)
+
+    token, exp = tokens.issue(user)
+    return build_response({
+        "token": token,
+        "expires_at": exp,
+        "user": {
+            "id": user.id,
+            "telegram_id": user.telegram_id,
+            "locale": user.locale,
+            "is_admin": user.is_admin,
+        },
+    })
+
+
+async def auth_logout(request: web.Request) -> web.Response:
+    """POST /api/auth/logout - отозвать текущий токен."""
+    claims = request["auth"]
+    if "jti" in claims:
+        tokens.revoke(claims)
+    return build_response("ok")
+
+
+auth_routes = [
+    ('POST', '/api/auth/telegram', auth_telegram),
+    ('POST', '/api/auth/logout', auth_logout),
+]
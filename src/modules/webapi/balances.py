@@ -0,0 +1,56 @@
+"""Балансы пользователей для админов (database.balances).
+
+    GET  /api/admin/balance?user_id=42&currency=RUB       # баланс одной строкой
+    POST /api/admin/balances/rebuild?user_id=42            # сверить с журналом и починить
+    POST /api/admin/balances/rebuild?fix=0                 # только сверить, по всем
+
+Починка блокирует строки балансов до коммита (см. ``rebuild_balances``); по всем
+пользователям это заметная пауза для проведения платежей - лучше по одному.
+"""
+from __future__ import annotations
+
+from aiohttp import web
+
+from database import get_balance, rebuild_balances
+from modules.http.enum import ApiErrors
+from modules.http.utils import build_response
+from shared import storage
+from .admin import BadRequest, admin_required, plain_value, query_param
+
+_BALANCE_COLUMNS = ("balance", "deposited", "withdrawn", "refunded", "paid", "updated_at")
+
+
+@admin_required
+async def user_balance(request: web.Request) -> web.Response:
+    """GET /api/admin/balance?user_id=&currency="""
+    user_id = query_param(request, "user_id", int)
+    if user_id is None:
+        raise BadRequest(ApiErrors.INVALID_PARAMETER)
+    currency = query_param(request, "currency", str) or "RUB"
+    async for session in storage['db_manager'].get_session(readonly=True):
+        balance = await get_balance(session, user_id, currency)
+    body = {"user_id": user_id, "currency": currency}
+    # Строки нет - операций в этой валюте ещё не было
+    body.update({c: plain_value(getattr(balance, c)) if balance is not None else None for c in _BALANCE_COLUMNS})
+    return build_response(body)
+
+
+@admin_required
+async def balances_rebuild(request: web.Request) -> web.Response:
+    """POST /api/admin/balances/rebuild?user_id=&fix= - по умолчанию чинит расхождения."""
+    user_id = query_param(request, "user_id", int)
+    fix = request.query.get("fix", "1").lower() not in ("0", "false", "no")
+    async for session in storage['db_manager'].get_session():
+        check = await rebuild_balances(session, [user_id] if user_id is not None else None, fix=fix)
+        await session.commit()
+    return build_response({
+        "checked": check.checked,
+        "mismatched": [{"user_id": uid, "currency": currency} for uid, currency in check.mismatched],
+        "fixed": check.fixed,
+    })
+
+
+balance_routes = [
+    ('GET', '/api/admin/balance', user_balance),
+    ('POST', '/api/admin/balances/rebuild', balances_rebuild),
+]
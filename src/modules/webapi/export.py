@@ -0,0 +1,127 @@
+"""Потоковая выгрузка платежей и транзакций в NDJSON или CSV.
+
+Строки читаются серверным курсором (``AsyncSession.stream`` + ``yield_per``) пачками
+по ``CHUNK_ROWS`` и сразу пишутся в ``StreamResponse``. В памяти одновременно
+живёт не больше одной пачки, и ``write`` ждёт, пока клиент её заберёт, поэтому
+расход памяти не зависит от размера выгрузки. Если клиент принимает gzip,
+ответ сжимается на лету (``Content-Encoding: gzip``).
+
+    GET /api/admin/export/payments?format=csv&status=completed&since=2025-01-01
+    GET /api/admin/export/transactions?format=ndjson&user_id=42
+    GET /api/admin/export/payments?archive=1    # вместе с архивом (database.archive)
+"""
+from __future__ import annotations
+
+import csv
+import datetime
+import io
+
+import orjson
+from aiohttp import hdrs, web
+from loguru import logger
+
+from database import Payment, Transaction
+from modules.http.enum import ApiErrors
+from shared import storage
+from .admin import (
+    BadRequest, PAYMENT_COLUMNS, TRANSACTION_COLUMNS, admin_required, history, payment_filters, plain_value,
+    query_param, transaction_filters,
+)
+
+log = logger.bind(module="webapi", prefix="export")
+
+CHUNK_ROWS = 1000
+
+_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+
+
+def _encode_ndjson(names: list[str], rows) -> bytes:
+    return b"".join(
+        orjson.dumps({name: plain_value(value) for name, value in zip(names, row)}) + b"\n"
+        for row in rows
+    )
+
+
+class _CsvEncoder:
+    """csv.writer поверх переиспользуемого буфера: на выходе байты одной пачки."""
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def encode(self, rows) -> bytes:
+        self._writer.writerows(rows)
+        data = self._buffer.getvalue().encode()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return data
+
+
+async def _export(request: web.Request, name: str, branches: list) -> web.StreamResponse:
+    fmt = query_param(request, "format", str) or "ndjson"
+    if fmt not in _FORMATS:
+        raise BadRequest(ApiErrors.INVALID_PARAMETER)
+    content_type, extension = _FORMATS[fmt]
+
+    # Архив (если запрошен) содержит более старые строки - выгружается первым
+    statements = [
+        stmt.where(*filters).order_by(model.id).execution_options(yield_per=CHUNK_ROWS)
+        for model, stmt, filters in reversed(branches)
+    ]
+    names = [column.key for column in branches[0][1].selected_columns]
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%d-%H%M%S")
+
+    response = web.StreamResponse(headers={
+        hdrs.CONTENT_TYPE: content_type,
+        hdrs.CONTENT_DISPOSITION: f'attachment; filename="{name}-{stamp}.{extension}"',
+        hdrs.CACHE_CONTROL: "no-store",
+    })
+    if "gzip" in request.headers.get(hdrs.ACCEPT_ENCODING, ""):
+        response.enable_compression(web.ContentCoding.gzip)
+    await response.prepare(request)
+
+    csv_encoder = _CsvEncoder() if fmt == "csv" else None
+    if csv_encoder is not None:
+        await response.write(csv_encoder.encode([names]))
+
+    total = 0
+    async for session in storage['db_manager'].get_session(readonly=True):
+        for stmt in statements:
+            result = await session.stream(stmt)
+            try:
+                async for partition in result.partitions():
+                    rows = [[plain_value(v) for v in row] for row in partition] if csv_encoder else partition
+                    chunk = csv_encoder.encode(rows) if csv_encoder else _encode_ndjson(names, rows)
+                    await response.write(chunk)
+                    total += len(partition)
+            except ConnectionResetError:
+                log.info(f"[Export] Client disconnected from {name} export after {total} row(s)")
+                return response
+            finally:
+                await result.close()
+
+    await response.write_eof()
+    log.info(f"[Export] {name}: {total} row(s) as {fmt}")
+    return response
+
+
+@admin_required
+async def export_payments(request: web.Request) -> web.StreamResponse:
+    """GET /api/admin/export/payments?format=ndjson|csv + фильтры /api/admin/payments (и archive=)"""
+    return await _export(request, "payments", history(request, Payment, PAYMENT_COLUMNS, payment_filters))
+
+
+@admin_required
+async def export_transactions(request: web.Request) -> web.StreamResponse:
+    """GET /api/admin/export/transactions?format=ndjson|csv + фильтры /api/admin/transactions (и archive=)"""
+    return await _export(request, "transactions",
+                         history(request, Transaction, TRANSACTION_COLUMNS, transaction_filters))
+
+
+export_routes = [
+    ('GET', '/api/admin/export/payments', export_payments),
+    ('GET', '/api/admin/export/transactions', export_transactions),
+]
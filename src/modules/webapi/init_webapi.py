@@ -1,18 +1,61 @@
+from loguru import logger
+
+from shared import config
+from .admin import admin_routes
+from .auth import MIN_SECRET_LENGTH, auth_middleware, auth_routes, public_paths, weak_secret
+from .balances import balance_routes
+from .export import export_routes
+from .memory import memory_routes
 from .utils import health_check, _callback_enabled, _callback_disabled
+from ..http.ipfilter import IPFilter
 from ..http.server import HTTPServer
 
 routes = [
     ('GET', '/api/health', health_check),
 ]
 
-def add_payment(path, callback):
+# Выдают или требуют JWT - регистрируются только с надёжным webapi.jwt_secret
+token_routes = [
+    *auth_routes,
+    *admin_routes,
+    *balance_routes,
+    *export_routes,
+    *memory_routes,
+]
+
+# Белые списки сетей: вебхуки платёжек - свой список на путь, /api/health - health.allowed_ips,
+# остальное /api/* - security.allowed_ips
+payment_networks: dict[str, list[str]] = {}
+
+def add_payment(path, callback, networks=()):
+    # Платёжки не присылают наш JWT - вебхуки доступны без токена
+    public_paths.add(path)
+    payment_networks[path] = list(networks)
     routes.append(('POST', path, callback))
     routes.append(('GET', path, _callback_enabled))
 
 def disabled_payment(path):
+    public_paths.add(path)
     routes.append(('GET', path, _callback_disabled))
 
 def register_webapi(server: HTTPServer) -> None:
     """Register web API routes and middleware."""
+    secure = not weak_secret(config.webapi.jwt_secret)
+    if not secure:
+        logger.error(
+            f"[WebAPI] webapi.jwt_secret is empty, a placeholder or shorter than {MIN_SECRET_LENGTH} chars: "
+            "tokens could be forged, auth/admin endpoints are NOT registered"
+        )
+    ip_filter = IPFilter(config.webapi.security.trusted_proxies)
+    for path, networks in payment_networks.items():
+        ip_filter.add_group(path, networks, path=path)
+    # Точный путь важнее префикса: пробы здоровья не упираются в список для webapi
+    ip_filter.add_group("health", config.webapi.health.allowed_ips, path="/api/health")
+    if config.webapi.security.allowed_ips:
+        ip_filter.add_group("webapi", config.webapi.security.allowed_ips, prefix="/api/")
+    server.app.middlewares.append(ip_filter.middleware)
+    server.app.middlewares.append(auth_middleware)
     server.add_routes(routes)
+    if secure:
+        server.add_routes(token_routes)
 
@@ -0,0 +1,113 @@
+"""Память процесса для админов: RSS/GC и tracemalloc по запросу (modules.metrics.memory).
+
+    GET  /api/admin/memory                         # RSS, прирост, GC, состояние tracemalloc
+    POST /api/admin/memory/start?frames=25         # включить tracemalloc
+    POST /api/admin/memory/snapshot?group=module   # снимок и что в нём занимает память
+    GET  /api/admin/memory/diff?from=1&to=2&group=subsystem&limit=20
+    POST /api/admin/memory/stop                    # выключить, снимки удаляются
+
+Снимок и разница считаются в потоке: на большом процессе это секунды работы. Если
+трассировку выключили, пока они считались, ответ - 409, как и без трассировки.
+
+В кластере (``cluster.workers`` > 0) HTTP обслуживает фронт, и всё это - про его
+память: приём апдейтов и HTTP. Обработчики апдейтов работают в воркерах, их рост
+виден только по RSS процессов снаружи.
+"""
+from __future__ import annotations
+
+import asyncio
+
+from aiohttp import web
+
+from modules.http.enum import ApiErrors
+from modules.http.utils import build_error, build_response
+from modules.metrics import memory_monitor, memory_profiler
+from modules.metrics.memory import GROUPS
+from shared import config
+from .admin import BadRequest, admin_required, query_param
+
+MAX_FRAMES = 100
+DEFAULT_TOP = 20
+MAX_TOP = 200
+
+
+def _group(request: web.Request) -> str:
+    group = request.query.get("group") or "subsystem"
+    if group not in GROUPS:
+        raise BadRequest(ApiErrors.INVALID_PARAMETER)
+    return group
+
+
+def _limit(request: web.Request) -> int:
+    limit = query_param(request, "limit", int) or DEFAULT_TOP
+    if not 0 < limit <= MAX_TOP:
+        raise BadRequest(ApiErrors.INVALID_PARAMETER)
+    return limit
+
+
+def _snapshot_id(request: web.Request, name: str, default: int) -> int:
+    snapshot_id = query_param(request, name, int) or default
+    if snapshot_id not in memory_profiler.snapshot_ids():
+        raise BadRequest(ApiErrors.INVALID_PARAMETER)
+    return snapshot_id
+
+
+@admin_required
+async def memory_status(request: web.Request) -> web.Response:
+    """GET /api/admin/memory"""
+    return build_response({"process": memory_monitor.stats(), "tracemalloc": memory_profiler.status()})
+
+
+@admin_required
+async def memory_start(request: web.Request) -> web.Response:
+    """POST /api/admin/memory/start?frames="""
+    frames = query_param(request, "frames", int) or config.metrics.trace_frames
+    if not 0 < frames <= MAX_FRAMES:
+        raise BadRequest(ApiErrors.INVALID_PARAMETER)
+    memory_profiler.start(frames)
+    return build_response(memory_profiler.status())
+
+
+@admin_required
+async def memory_stop(request: web.Request) -> web.Response:
+    """POST /api/admin/memory/stop"""
+    memory_profiler.stop()
+    return build_response(memory_profiler.status())
+
+
+@admin_required
+async def memory_snapshot(request: web.Request) -> web.Response:
+    """POST /api/admin/memory/snapshot?group=&limit="""
+    group, limit = _group(request), _limit(request)
+    if not memory_profiler.tracing:
+        return build_error(ApiErrors.TRACING_DISABLED, 409)
+    snapshot_id = await asyncio.to_thread(memory_profiler.snapshot)
+    top = await asyncio.to_thread(memory_profiler.top, snapshot_id, group, limit) if snapshot_id is not None else None
+    if top is None:
+        return build_error(ApiErrors.TRACING_DISABLED, 409)
+    return build_response({"id": snapshot_id, "group": group, "top": top})
+
+
+@admin_required
+async def memory_diff(request: web.Request) -> web.Response:
+    """GET /api/admin/memory/diff?from=&to=&group=&limit= - по умолчанию от первого снимка к последнему."""
+    if not memory_profiler.tracing:
+        return build_error(ApiErrors.TRACING_DISABLED, 409)
+    ids = memory_profiler.snapshot_ids()
+    if len(ids) < 2:
+        raise BadRequest(ApiErrors.INVALID_PARAMETER)
+    old_id, new_id = _snapshot_id(request, "from", ids[0]), _snapshot_id(request, "to", ids[-1])
+    group, limit = _group(request), _limit(request)
+    diff = await asyncio.to_thread(memory_profiler.diff, old_id, new_id, group, limit)
+    if diff is None:
+        return build_error(ApiErrors.TRACING_DISABLED, 409)
+    return build_response({"from": old_id, "to": new_id, "group": group, "diff": diff})
+
+
+memory_routes = [
+    ('GET', '/api/admin/memory', memory_status),
+    ('POST', '/api/admin/memory/start', memory_start),
+    ('POST', '/api/admin/memory/stop', memory_stop),
+    ('POST', '/api/admin/memory/snapshot', memory_snapshot),
+    ('GET', '/api/admin/memory/diff', memory_diff),
+]
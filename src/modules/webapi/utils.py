@@ -1,19 +1,151 @@
+import asyncio
 import datetime
+import time
 
 from aiohttp import web
+from sqlalchemy import text
 
+from modules.http.ipfilter import NetworkSet, parse_ip
 from modules.http.utils import build_response
+from modules.lifecycle import lifecycle
+from modules.metrics import loop_monitor, memory_monitor
+from shared import config, storage
+from .admin import is_admin_request
 
 
-async def health_check(_) -> web.Response:
+# Кому подробный отчёт ?deep=1 отдаётся без токена админа (мониторинг)
+_details_networks = NetworkSet(config.webapi.health.details_ips)
+
+
+async def health_check(request: web.Request) -> web.Response:
+    """GET /api/health - liveness; GET /api/health?deep=1 - readiness с проверками (503, если не готов).
+
+    Путь публичный, поэтому всем отдаются только ``healthy`` и имена нарушенных проверок;
+    сами замеры (``checks``: БД, пул, очереди, реплики, память) - админу или адресу
+    из ``webapi.health.details_ips``.
+    """
     now = datetime.datetime.now(datetime.timezone.utc)
     body = {
         "healthy": True,
         "time_iso": now.isoformat(),
         "time_unix": now.timestamp(),
     }
+    if request.query.get("deep", "") not in ("", "0", "false"):
+        checks, failures = await deep_health()
+        body.update(healthy=not failures, failures=failures)
+        if await _may_see_details(request):
+            body["checks"] = checks
+        return build_response(body, status_code=200 if not failures else 503)
     return build_response(body)
 
+
+async def _may_see_details(request: web.Request) -> bool:
+    # client_ip кладёт IPFilter (у /api/health своя группа) - с учётом доверенных прокси
+    address = parse_ip(request.get("client_ip", request.remote))
+    if _details_networks and address is not None and address in _details_networks:
+        return True
+    return await is_admin_request(request)
+
+
+async def deep_health() -> tuple[dict, list[str]]:
+    """Состояние процесса для readiness: задержка loop, пул и отклик БД, сессия Telegram, очереди.
+
+    Возвращает отчёт по проверкам и список нарушенных порогов (``webapi.health``).
+    """
+    limits = config.webapi.health
+    checks, failures = {}, []
+
+    if not lifecycle.accepting:
+        failures.append("shutting_down")
+
+    lag = loop_monitor.percentiles()
+    checks["loop_lag_ms"] = lag
+    if not loop_monitor.running:
+        failures.append("loop_monitor_stopped")
+    elif lag["p99"] > limits.max_loop_lag_ms:
+        failures.append("loop_lag")
+
+    checks["database"] = db = await _check_database(limits.db_timeout_ms / 1000)
+    if not db["ok"]:
+        failures.append("database")
+    elif db["ping_ms"] > limits.max_db_ms:
+        failures.append("database_slow")
+    if db.get("pool_usage", 0) > limits.max_pool_usage:
+        failures.append("database_pool")
+
+    checks["telegram"] = _telegram_state()
+    if checks["telegram"]["session"] == "closed":
+        failures.append("telegram_session")
+
+    checks["queues"] = queues = _queue_depths()
+    if overloaded := [name for name, depth in queues.items() if depth > limits.max_queue]:
+        failures.extend(f"queue:{name}" for name in overloaded)
+    checks["in_flight"] = lifecycle.in_flight()
+    checks["memory"] = memory_monitor.stats()
+    return checks, failures
+
+
+async def _check_database(timeout: float) -> dict:
+    db_manager = storage.get('db_manager')
+    if db_manager is None:
+        return {"ok": False, "error": "not initialized"}
+    result = {"ok": True, **_pool_stats(db_manager.engine.pool)}
+    start = time.perf_counter()
+    try:
+        async with asyncio.timeout(timeout):
+            async with db_manager.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+    except TimeoutError:
+        result.update(ok=False, error=f"timeout after {timeout * 1000:.0f}ms")
+    except Exception as ex:
+        result.update(ok=False, error=type(ex).__name__)
+    result["ping_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    if db_manager.replicas:
+        # Упавшая реплика не роняет readiness: её чтения уходят на основную БД
+        result["replicas"] = db_manager.replicas.status()
+    return result
+
+
+def _pool_stats(pool) -> dict:
+    # QueuePool (Postgres, файловый SQLite); у NullPool/StaticPool этих счётчиков нет
+    if not hasattr(pool, "checkedout"):
+        return {"pool": type(pool).__name__}
+    capacity = pool.size() + max(getattr(pool, "_max_overflow", 0), 0)
+    return {
+        "pool": type(pool).__name__,
+        "pool_size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "pool_usage": round(pool.checkedout() / capacity, 3) if capacity else 0,
+    }
+
+
+def _telegram_state() -> dict:
+    bot = storage.get('bot')
+    if bot is None:
+        return {"session": "none"}
+    # AiohttpSession создаёт ClientSession лениво, при первом запросе
+    client = getattr(bot.session, "_session", None)
+    if client is None:
+        return {"session": "not_created"}
+    state = {"session": "closed" if client.closed else "open"}
+    if not client.closed and client.connector is not None:
+        state["connections_limit"] = client.connector.limit
+    return state
+
+
+def _queue_depths() -> dict[str, int]:
+    queues = {}
+    if (settlement := storage.get('settlement')) is not None:
+        queues["settlement"] = settlement.pending
+    if (scheduler := storage.get('scheduler')) is not None:
+        queues["updates"] = scheduler.waiting
+    if (fsm := storage.get('fsm_storage')) is not None:
+        queues["fsm_flush"] = fsm.pending
+    if (supervisor := storage.get('supervisor')) is not None:
+        queues.update({f"worker_{i}": depth for i, depth in supervisor.queue_depths().items()})
+    return queues
+
 async def _callback_enabled(result: web.Request) -> web.Response:
     body = {
         "message": "Enabled!",
@@ -5,7 +5,8 @@ from pydantic import ValidationError
 
 from modules.config.config import Config, EnvConfig
 from modules.logger import setup
-from modules.phraseEngine.engine import PhraseEngine
+from modules.phraseEngine.engine import LazyPhraseEngine
+from modules.startup import timeline
 
 # Глобальные объекты. Что бы их инжектировать в хендлеры
 storage = {
@@ -19,16 +20,18 @@ def _setup_logger():
         "log_file": env.LOG_FILE,
         "file_debug": env.LOG_LEVEL == "DEBUG",
         "file_debug_name": env.LOG_DEBUG_FILE,
-        "file_low_debug": env.LOG_LEVEL == "DEBUG"
+        "file_low_debug": env.LOG_LEVEL == "DEBUG",
+        "json": env.LOG_FORMAT == "json"
     }
     log_config = setup.LoggerConfiguration(**data)
     setup.setup(log_config, False)
 
 
 try:
-    env = EnvConfig()  # noqa: оно грузится из .env файла
-    _setup_logger()
-    config = Config.from_file(env.BOT_CONFIG_PATH)
+    with timeline.phase("config"):
+        env = EnvConfig()  # noqa: оно грузится из .env файла
+        _setup_logger()
+        config = Config.from_file(env.BOT_CONFIG_PATH)
 except ValidationError as e:
     logger.error("❌ Invalid configuration file. Please check your .env and config.yaml files.")
     logger.error("Validation errors:")
@@ -37,4 +40,5 @@ except ValidationError as e:
         logger.error(f"  • {loc}: {err['msg']} ({err['type']})")
     sys.exit(1)
 
-i18n = PhraseEngine(config.i18n.directory)
+# Локали грузятся при первом обращении или фазой i18n в main
+i18n = LazyPhraseEngine(config.i18n.directory, fallbacks=config.i18n.fallbacks, default=config.i18n.default)